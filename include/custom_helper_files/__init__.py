@@ -1,17 +1,27 @@
 from include.custom_helper_files.colour_palettes import *
+from include.custom_helper_files.custom_dispersion_fitting import *
 from include.custom_helper_files.custom_dispersion_relations import *
+from include.custom_helper_files.custom_drive_monitor import *
 from include.custom_helper_files.custom_image_processing import *
+from include.custom_helper_files.custom_odt_reader import *
 from include.custom_helper_files.custom_physics_equations import *
+from include.custom_helper_files.custom_spectral_ridges import *
 from include.custom_helper_files.custom_system_properties import *
 from custom_helper_files.custom_temporal_field_tcl_scripts import *
 from include.custom_helper_files.convert_field_units import *
+from include.custom_helper_files.custom_vtk_export import *
 
 __all__ = [
     "colour_palettes",
     "custom_system_properties",
+    "custom_dispersion_fitting",
+    "custom_drive_monitor",
     "custom_image_processing",
+    "custom_odt_reader",
     "custom_physics_equations",
+    "custom_spectral_ridges",
     "custom_system_properties",
     "custom_temporal_field_tcl_scripts",
-    "convert_field_units"
+    "convert_field_units",
+    "custom_vtk_export"
 ]
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import inspect
+import logging as lg
+# import os as os
+from concurrent.futures import ProcessPoolExecutor
+
+# 3rd Party packages
+from datetime import datetime
+import micromagneticmodel as mm
+
+import numpy as np
+from scipy.optimize import least_squares
+
+# My packages/Header files
+import include.custom_helper_files.custom_dispersion_relations as cdr
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Least-squares fitting of the analytical dispersion relations (`custom_dispersion_relations.py`) to (k, f) points
+extracted from simulated spectra (e.g. the `Ridge`s of `custom_spectral_ridges.py`). Replaces tuning A, D, Ms and K
+by hand until the analytical curves line up with the simulations.
+
+Any subset of the model parameters can be free; the others are held fixed. The residuals are evaluated for all the
+points at once, the generalised models use analytic Jacobians, and several starting points can be run in a process
+pool. The uncertainties come from the covariance of the fit at the best solution.
+"""
+PROGRAM_NAME = "custom_dispersion_fitting.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+__all__ = [
+    "DispersionFit",
+    "FIT_MODELS",
+    "FIT_PARAMETERS",
+    "fit_dispersion"
+]
+
+
+# ---------------------------- Function Declarations ---------------------------
+
+def loggingSetup():
+    """
+    Minimum Working Example (MWE) for logging. Pre-defined levels are:
+
+        Highest               ---->            Lowest
+        CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET
+    """
+    today_date = datetime.now().strftime("%y%m%d")
+    current_time = datetime.now().strftime("%H%M")
+
+    lg.basicConfig(filename=f'./{today_date}-{current_time}.log',
+                   filemode='w',
+                   level=lg.INFO,
+                   format='%(asctime)s | %(module)s::%(funcName)s | %(levelname)s | %(message)s',
+                   datefmt='%Y-%m-%d %H:%M:%S',
+                   force=True)
+
+
+# ------------------------------ Implementations ------------------------------
+
+FIT_MODELS = {
+    'generalised_with_ua': cdr.Omega_generalised_with_ua,
+    'generalised': cdr.Omega_generalised,
+    'moon': cdr.Omega_Moon,
+    'moon_large_k': cdr.Omega_Moon_large_k,
+    'moon_small_k': cdr.Omega_Moon_small_k,
+    'moon_custom': cdr.Omega_Moon_custom,
+}
+
+# Parameters which can be fitted (if the model has them)
+FIT_PARAMETERS = ('H0', 'Ms', 'A', 'D', 'K1', 'K2', 'gamma')
+
+# Values of the model settings which are not usually given
+_SETTING_DEFAULTS = {'d': 1e-9, 'K1': 0., 'K2': 0., 'aniso_axis': (0, 0, 1), 'p': 1, 'has_demag': 1, 'has_dmi': 1,
+                     'has_aniso': 1, 'demag': 1}
+
+
+# Parameter names of every model, looked up once rather than at every residual evaluation
+_MODEL_PARAMETERS = {model: tuple(inspect.signature(function).parameters) for model, function in FIT_MODELS.items()}
+
+
+def _model_arguments(model):
+    return [name for name in _MODEL_PARAMETERS[model] if name != 'system_prop']
+
+
+def _evaluate(model, values, k):
+    kwargs = {name: values[name] for name in _model_arguments(model) if name in values}
+    kwargs['k'] = k
+    if 'system_prop' in _MODEL_PARAMETERS[model]:
+        # The geometry only enters through the demag factors, which are computed once in `fit_dispersion`
+        kwargs['system_prop'] = None
+    return FIT_MODELS[model](**kwargs)
+
+
+def _generalised_jacobian(values, k, free):
+    """
+    Analytic derivatives of Omega_generalised(_with_ua) with respect to the `free` parameters, shape (n_k, n_free).
+
+    With c = H0 + J k^2 + K_a, X = c + Ms (N_x - N_z), Y = c + Ms (N_y - N_z) and S = sqrt(X Y):
+        om = gamma mu0 (S + p DM k),  dS = (dX Y + X dY) / (2 S)
+    """
+    mu0 = mm.consts.mu0
+    H0, Ms, A, D = (values[name] for name in ('H0', 'Ms', 'A', 'D'))
+    K1, K2, gamma = values.get('K1', 0.), values.get('K2', 0.), values['gamma']
+    demag = values['demag_factors']
+    has_aniso = values.get('has_aniso', 0)
+    az2 = values.get('aniso_axis', (0, 0, 1))[2] ** 2
+    dmi = values['has_dmi'] * values['p']
+
+    J = 2 * A / (mu0 * Ms)
+    DM = -2 * D / (mu0 * Ms)
+    K_a = has_aniso * (2 * az2 / (Ms * mu0)) * (K1 + 2 * K2 * az2)
+    D_x = values['has_demag'] * (demag['N_x'] - demag['N_z'])
+    D_y = values['has_demag'] * (demag['N_y'] - demag['N_z'])
+
+    c = H0 + J * k ** 2 + K_a
+    X, Y = c + Ms * D_x, c + Ms * D_y
+    S = np.sqrt(X * Y)
+    scale = gamma * mu0
+    # Derivative of om with respect to c (both factors depend on c in the same way)
+    d_c = scale * (X + Y) / (2 * S)
+
+    columns = {
+        'H0': lambda: d_c,
+        'A': lambda: d_c * 2 * k ** 2 / (mu0 * Ms),
+        'K1': lambda: d_c * has_aniso * 2 * az2 / (Ms * mu0),
+        'K2': lambda: d_c * has_aniso * 4 * az2 ** 2 / (Ms * mu0),
+        'D': lambda: scale * dmi * (-2 / (mu0 * Ms)) * k,
+        'Ms': lambda: scale * ((((-(J * k ** 2 + K_a) / Ms) + D_x) * Y + X * ((-(J * k ** 2 + K_a) / Ms) + D_y))
+                               / (2 * S) - dmi * DM / Ms * k),
+        'gamma': lambda: mu0 * (S + dmi * DM * k),
+    }
+    return np.column_stack([np.broadcast_to(columns[name](), k.shape) for name in free])
+
+
+_ANALYTIC_JACOBIANS = {'generalised_with_ua': _generalised_jacobian,
+                       'generalised': _generalised_jacobian}
+
+
+class _Problem:
+    """Everything a (possibly remote) worker needs for one least-squares run; picklable."""
+
+    def __init__(self, model, k, f, sigma, values, free, scales, bounds, loss):
+        self.model = model
+        self.k = k
+        self.f = f
+        self.sigma = sigma
+        self.values = values
+        self.free = free
+        self.scales = scales
+        self.bounds = bounds
+        self.loss = loss
+
+    def parameters(self, x):
+        values = dict(self.values)
+        values.update(zip(self.free, x * self.scales))
+        if self.model == 'generalised':
+            values['has_aniso'] = 0
+        return values
+
+    def residuals(self, x):
+        return (_evaluate(self.model, self.parameters(x), self.k) - self.f) / self.sigma
+
+    def jacobian(self, x):
+        jac = _ANALYTIC_JACOBIANS[self.model](self.parameters(x), self.k, self.free)
+        return jac * (self.scales / self.sigma[:, np.newaxis])
+
+
+def _fit_once(problem, x0):
+    jac = problem.jacobian if problem.model in _ANALYTIC_JACOBIANS else '2-point'
+    return least_squares(problem.residuals, x0, jac=jac, bounds=problem.bounds, loss=problem.loss)
+
+
+class DispersionFit:
+    """
+    Result of `fit_dispersion`.
+
+    :ivar params: All the parameter values of the model at the best fit (fixed and free).
+    :ivar errors: One standard deviation uncertainty of every free parameter.
+    :ivar covariance: Covariance matrix of the free parameters (in the order of `free`).
+    """
+
+    def __init__(self, model, free, params, errors, covariance, cost, residuals, success, message, n_starts):
+        self.model = model
+        self.free = free
+        self.params = params
+        self.errors = errors
+        self.covariance = covariance
+        self.cost = cost
+        self.residuals = residuals
+        self.success = success
+        self.message = message
+        self.n_starts = n_starts
+
+    def __repr__(self):
+        fitted = ', '.join(f"{name}={self.params[name]:.4g}±{self.errors[name]:.2g}" for name in self.free)
+        return f"DispersionFit({self.model}: {fitted}; cost={self.cost:.4g})"
+
+    def evaluate(self, k, k_scale=1e9):
+        """Model frequencies at the wavevectors `k` (in the units passed to `fit_dispersion`)."""
+        return _evaluate(self.model, self.params, np.asarray(k, dtype=float) * k_scale)
+
+
+def fit_dispersion(k, f, params, free, model='generalised_with_ua', system_prop=None, bounds=None, sigma=None,
+                   k_scale=1e9, n_starts=1, workers=1, seed=None, loss='linear'):
+    """
+    Fit an analytical dispersion relation to (k, f) points.
+
+    :param k: Wavevectors of the points, e.g. `ridge.k` in rad/nm.
+    :param f: Frequencies of the points, in the units the model returns for the given `gamma` (GHz for the templates'
+              `gamma0 / (2 * np.pi * 1e9)`).
+    :param params: Values of every model parameter (H0, Ms, A, D, gamma, ...): the initial values of the free ones,
+                   and the values of the fixed ones. Settings such as `d`, `p`, `aniso_axis` and `has_*` use the
+                   defaults of the models if not given.
+    :param free: Names of the fitted parameters; a subset of FIT_PARAMETERS.
+    :param model: A key of FIT_MODELS. The generalised models use analytic Jacobians, the others finite differences.
+    :param system_prop: Sample geometry, for the demag factors of the generalised models (computed once per fit).
+    :param bounds: {name: (low, high)} for the free parameters. Unbounded if not given.
+    :param sigma: Uncertainty of each f (scalar or per point); weights the residuals.
+    :param k_scale: Converts `k` to the rad/m the models use.
+    :param n_starts: Number of starting points. The first is `params`, the others are drawn uniformly within the
+                     bounds (or within ±50% of the initial value for unbounded parameters).
+    :param workers: Size of the process pool running the starts. Serial if 1.
+    :param seed: Seed of the random starting points.
+    :param loss: Loss of `scipy.optimize.least_squares` ('linear', 'soft_l1', ... for robust fits to noisy ridges).
+
+    :return: DispersionFit of the start with the lowest cost.
+
+    Example
+    -------
+    >>> ridge = extract_ridges(spectrum, freqs, ks, f_range=(1, 30))[0]
+    >>> fit = fit_dispersion(ridge.k, ridge.f, system_prop=system_prop, free=('A', 'D'),
+    ...                      params=dict(H0=zeeman_static[2], Ms=sat_mag, A=exchange_stiffness, D=D_ij, K1=K_1,
+    ...                                  K2=K_2, aniso_axis=aniso_axis, d=system_prop.cell[0],
+    ...                                  gamma=gamma0 / (2 * np.pi * 1e9)),
+    ...                      bounds={'A': (1e-12, 5e-11), 'D': (-5e-3, 5e-3)}, n_starts=8, workers=4)
+    """
+    if model not in FIT_MODELS:
+        raise ValueError(f"{PROGRAM_NAME}: unknown model '{model}'; use one of {list(FIT_MODELS)}")
+
+    arguments = _model_arguments(model)
+    free = tuple(free)
+    for name in free:
+        if name not in FIT_PARAMETERS or name not in arguments:
+            raise ValueError(f"{PROGRAM_NAME}: '{name}' can't be fitted with the '{model}' model")
+
+    values = {name: value for name, value in _SETTING_DEFAULTS.items() if name in arguments}
+    values.update(params)
+    missing = [name for name in arguments if name not in values and name not in ('k', 'demag_factors')]
+    if missing:
+        raise ValueError(f"{PROGRAM_NAME}: no value given for {missing}")
+
+    if 'demag_factors' in arguments and values.get('demag_factors') is None:
+        if system_prop is None:
+            raise ValueError(f"{PROGRAM_NAME}: the '{model}' model needs `system_prop` (or `demag_factors`)")
+        values['demag_factors'] = {name: float(value)
+                                   for name, value in cdr.geometry_demag_factors(system_prop).items()}
+
+    k = np.asarray(k, dtype=float) * k_scale
+    f = np.asarray(f, dtype=float)
+    sigma = np.broadcast_to(np.asarray(1. if sigma is None else sigma, dtype=float), f.shape)
+
+    # The free parameters are fitted in units of their initial values, so they are all of order 1
+    bounds = bounds if bounds is not None else {}
+    initial = np.array([values[name] for name in free], dtype=float)
+    scales = np.where(initial != 0, np.abs(initial), 1.)
+    for i, name in enumerate(free):
+        if initial[i] == 0 and name in bounds and np.all(np.isfinite(bounds[name])):
+            scales[i] = max(abs(bounds[name][0]), abs(bounds[name][1])) or 1.
+    low = np.array([bounds.get(name, (-np.inf, np.inf))[0] for name in free], dtype=float) / scales
+    high = np.array([bounds.get(name, (-np.inf, np.inf))[1] for name in free], dtype=float) / scales
+
+    problem = _Problem(model, k, f, sigma, values, free, scales, (low, high), loss)
+
+    rng = np.random.default_rng(seed)
+    x0 = initial / scales
+    starts = [np.clip(x0, low, high)]
+    for _ in range(n_starts - 1):
+        start = np.where(np.isfinite(low) & np.isfinite(high), rng.uniform(np.where(np.isfinite(low), low, 0),
+                                                                            np.where(np.isfinite(high), high, 1)),
+                         x0 * rng.uniform(0.5, 1.5, size=x0.shape))
+        starts.append(np.clip(start, low, high))
+
+    if workers > 1 and n_starts > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_fit_once, [problem] * len(starts), starts))
+    else:
+        results = [_fit_once(problem, start) for start in starts]
+
+    best = min(results, key=lambda result: result.cost)
+    lg.info(f"{PROGRAM_NAME}: best of {len(results)} starts has cost {best.cost}")
+
+    # Covariance from the Jacobian at the solution, scaled by the reduced chi-square
+    # (in the fitted units, then converted back to the units of the parameters)
+    dof = max(len(f) - len(free), 1)
+    covariance = np.linalg.pinv(best.jac.T @ best.jac) * (2 * best.cost / dof)
+    covariance = covariance * np.outer(scales, scales)
+    errors = dict(zip(free, np.sqrt(np.abs(np.diag(covariance)))))
+
+    fitted = problem.parameters(best.x)
+    return DispersionFit(model, free, fitted, errors, covariance, best.cost, best.fun, best.success, best.message,
+                         len(results))
@@ -33,10 +33,49 @@ __all__ = [
     "Omega_Moon_small_k",
     "Omega_Moon_custom",
     "Omega_generalised",
-    "Omega_generalised_with_ua"
+    "Omega_generalised_with_ua",
+    "geometry_demag_factors",
+    "parameter_grid"
 ]
 
 # ---------------------------- Function Declarations ---------------------------
+
+def parameter_grid(**params):
+    """
+    Reshape 1D parameter arrays so they broadcast into an outer-product grid, with one axis per parameter in the
+    order given. Scalars are left as they are.
+
+    Every `Omega_*` function broadcasts over arrays of its material and field parameters (H0, Ms, A, D, K1, K2) and of
+    k, following the numpy rules, so the grid can be passed to them directly.
+
+    Example
+    -------
+    >>> grid = parameter_grid(H0=H0_values, D=D_values, k=k_values)
+    >>> om = Omega_generalised(system_prop, Ms=Ms, A=A, d=d, gamma=gamma, **grid)  # om.shape == (n_H0, n_D, n_k)
+    """
+    arrays = {name: np.asarray(value, dtype=float) for name, value in params.items()}
+    n_axes = sum(array.ndim > 0 for array in arrays.values())
+
+    grid, axis = {}, 0
+    for name, array in arrays.items():
+        if array.ndim == 0:
+            grid[name] = array
+            continue
+        shape = [1] * n_axes
+        shape[axis] = array.size
+        grid[name] = array.reshape(shape)
+        axis += 1
+    return grid
+
+
+def geometry_demag_factors(system_prop):
+    """
+    Demagnetising factors of the sample of `system_prop` (the length excludes the 2 nm at the ends). Computed once
+    per geometry (cached by `calculate_demag_factor_uniform_prism`), and then reused by every dispersion evaluation.
+    """
+    return cpe.calculate_demag_factor_uniform_prism(system_prop.length - 2e-9, system_prop.width, system_prop.thickness)
+
+
 def Omega_Moon(H0, Ms, A, D, k, d, gamma, p=1, demag=1, has_dmi=1):
     mu0 = 4 * np.pi * 1e-7
     J = 2 * A / (mu0 * Ms)
@@ -45,7 +84,7 @@ def Omega_Moon(H0, Ms, A, D, k, d, gamma, p=1, demag=1, has_dmi=1):
     om = np.sqrt((H0 + 0.25 * Ms + J * (k ** 2)) * (H0 + 3 * Ms * 0.25 + J * (k ** 2))
                  - (1 + 2 * np.exp(2 * abs(k) * d)) * np.exp(-4 * abs(k) * d) * (Ms ** 2) / 16
                  )
-    om += p * DM * k
+    om = om + p * DM * k
 
     # the mu0 factor shown in the paper is not necessary if we use gamma
     # in Hz / (A / m)
@@ -60,11 +99,11 @@ def Omega_Moon_large_k(H0, Ms, A, D, k, d, gamma, p=1, demag=1, has_dmi=1):
     DM = 2 * D / (mm.consts.mu0 * Ms)
 
     om = np.sqrt((H0 + J * (k ** 2)) * (H0 + demag * Ms + J * (k ** 2)))
-    om += p * DM * k * has_dmi
+    om = om + p * DM * k * has_dmi
 
     # the mu0 factor shown in the paper is not necessary if we use gamma
     # in Hz / (A / m)
-    om *= (gamma * mm.consts.mu0)
+    om = om * (gamma * mm.consts.mu0)
 
     return om
 
@@ -74,11 +113,11 @@ def Omega_Moon_small_k(H0, Ms, A, D, k, d, gamma, p=1, demag=1, has_dmi=1):
     DM = 2 * D / (mm.consts.mu0 * Ms)
 
     om = np.sqrt(H0 * (H0 + demag * Ms)) + ((Ms ** 2) + abs(k) * d) / (4 * np.sqrt(H0 * (H0 + demag * Ms)))
-    om += p * DM * k * has_dmi
+    om = om + p * DM * k * has_dmi
 
     # the mu0 factor shown in the paper is not necessary if we use gamma
     # in Hz / (A / m)
-    om *= (gamma * mm.consts.mu0)
+    om = om * (gamma * mm.consts.mu0)
 
     return om
 
@@ -92,45 +131,46 @@ def Omega_Moon_custom(H0, Ms, A, D, k, d, gamma, p=1, demag=1, has_dmi=1):
     Nz = 0.5
 
     om = np.sqrt((H0 + J * (k ** 2) + Ms * (Nx - Nz)) * (H0 + J * (k ** 2) + Ms * (Ny - Nz)))
-    om += p * DM * k * has_dmi
+    om = om + p * DM * k * has_dmi
 
     # the mu0 factor shown in the paper is not necessary if we use gamma
     # in Hz / (A / m)
-    om *= (gamma * mm.consts.mu0)
+    om = om * (gamma * mm.consts.mu0)
 
     return om
 
 
-def Omega_generalised(system_prop, H0, Ms, A, D, k, d, gamma, p=1, has_demag=1, has_dmi=1):
+def Omega_generalised(system_prop, H0, Ms, A, D, k, d, gamma, p=1, has_demag=1, has_dmi=1, demag_factors=None):
+    H0, Ms, A, D, k = (np.asarray(value, dtype=float) for value in (H0, Ms, A, D, k))
     J = 2 * A / (mm.consts.mu0 * Ms)
     DM = -2 * D / (mm.consts.mu0 * Ms)
 
-    demag_factors = cpe.calculate_demag_factor_uniform_prism(system_prop.length - 2e-9,
-                                                             system_prop.width,
-                                                             system_prop.thickness)
+    if demag_factors is None:
+        demag_factors = geometry_demag_factors(system_prop)
     # print(demag_factors)
 
-    om = np.sqrt((H0 + J * (k ** 2) + has_demag * Ms * (demag_factors['N_x'] - demag_factors['N_z']))
-                 * (H0 + J * (k ** 2) + has_demag * Ms * (demag_factors['N_y'] - demag_factors['N_z']))
+    common = H0 + J * (k ** 2)
+    om = np.sqrt((common + has_demag * Ms * (demag_factors['N_x'] - demag_factors['N_z']))
+                 * (common + has_demag * Ms * (demag_factors['N_y'] - demag_factors['N_z']))
                  )
 
-    om += p * DM * k * has_dmi
+    om = om + p * DM * k * has_dmi
 
     # the mu0 factor shown in the paper is not necessary if we use gamma
     # in Hz / (A / m)
-    om *= (gamma * mm.consts.mu0)
+    om = om * (gamma * mm.consts.mu0)
 
     return om
 
 
 def Omega_generalised_with_ua(system_prop, H0, Ms, A, D, k, d, K1, K2, aniso_axis, gamma, p=1,
-                              has_demag=1, has_dmi=1, has_aniso=1):
+                              has_demag=1, has_dmi=1, has_aniso=1, demag_factors=None):
+    H0, Ms, A, D, k, K1, K2 = (np.asarray(value, dtype=float) for value in (H0, Ms, A, D, k, K1, K2))
     J = 2 * A / (mm.consts.mu0 * Ms)
     DM = -2 * D / (mm.consts.mu0 * Ms)
 
-    demag_factors = cpe.calculate_demag_factor_uniform_prism(system_prop.length - 2e-9,
-                                                             system_prop.width,
-                                                             system_prop.thickness)
+    if demag_factors is None:
+        demag_factors = geometry_demag_factors(system_prop)
     # print(demag_factors)
 
     #om = np.sqrt((H0 + J * (k ** 2) + has_demag * Ms * (demag_factors['N_x'] - demag_factors['N_z']))
@@ -142,23 +182,20 @@ def Omega_generalised_with_ua(system_prop, H0, Ms, A, D, k, d, K1, K2, aniso_axi
     #             * (1 * K1 ** 2 + 4 * K1 * K2 * aniso_axis[2] ** 2 + 4 * K2 ** 2 * aniso_axis[2] ** 2)
     #             )
 
-    om = np.sqrt((H0
-                  + J * (k ** 2)
-                  + has_aniso * ((2 * (aniso_axis[2] ** 2)) / (Ms * mm.consts.mu0)
-                                 * (K1 + 2 * K2 * aniso_axis[2] ** 2))
-                  + has_demag * Ms * (demag_factors['N_x'] - demag_factors['N_z']))
-                 * (H0
-                    + J * (k ** 2)
-                    + has_aniso * ((2 * (aniso_axis[2] ** 2)) / (Ms * mm.consts.mu0)
-                                   * (K1 + 2 * K2 * aniso_axis[2] ** 2))
-                    + has_demag * Ms * (demag_factors['N_y'] - demag_factors['N_z'])
-                    )
+    # Terms shared by both factors
+    common = (H0
+              + J * (k ** 2)
+              + has_aniso * ((2 * (aniso_axis[2] ** 2)) / (Ms * mm.consts.mu0)
+                             * (K1 + 2 * K2 * aniso_axis[2] ** 2)))
+
+    om = np.sqrt((common + has_demag * Ms * (demag_factors['N_x'] - demag_factors['N_z']))
+                 * (common + has_demag * Ms * (demag_factors['N_y'] - demag_factors['N_z']))
                  )
 
-    om += has_dmi * p * DM * k
+    om = om + has_dmi * p * DM * k
 
     # the mu0 factor shown in the paper is not necessary if we use gamma
     # in Hz / (A / m)
-    om *= (gamma * mm.consts.mu0)
+    om = om * (gamma * mm.consts.mu0)
 
     return om
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import json
+import logging as lg
+import os as os
+import re
+import time
+
+# 3rd Party packages
+from datetime import datetime
+
+import discretisedfield as df
+import matplotlib.pyplot as plt
+import numpy as np
+
+# My packages/Header files
+# Here
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Live monitoring of a running `oc.TimeDriver` drive. OOMMF writes one `.omf` file per saved step into `drive-N/`, but
+the only feedback during the run is the `verbose=2` progress bar. The `DriveMonitor` in this file tails that directory,
+appends the midline of every new snapshot to a growing space-time buffer, and periodically refreshes an amplitude map
+and a partial FFT; so a bad run (e.g. waves reflecting off the absorbing layers) can be killed early.
+"""
+PROGRAM_NAME = "custom_drive_monitor.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+__all__ = [
+    "DriveMonitor",
+    "list_drive_snapshots"
+]
+
+
+# ---------------------------- Function Declarations ---------------------------
+
+def loggingSetup():
+    """
+    Minimum Working Example (MWE) for logging. Pre-defined levels are:
+
+        Highest               ---->            Lowest
+        CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET
+    """
+    today_date = datetime.now().strftime("%y%m%d")
+    current_time = datetime.now().strftime("%H%M")
+
+    lg.basicConfig(filename=f'./{today_date}-{current_time}.log',
+                   filemode='w',
+                   level=lg.INFO,
+                   format='%(asctime)s | %(module)s::%(funcName)s | %(levelname)s | %(message)s',
+                   datefmt='%Y-%m-%d %H:%M:%S',
+                   force=True)
+
+
+# ------------------------------ Implementations ------------------------------
+
+def list_drive_snapshots(drive_dir):
+    """
+    Sorted paths of the magnetisation snapshots OOMMF has written to a drive directory. The initial state (`m0.omf`)
+    is excluded.
+
+    Files are named `<system>-Oxs_TimeDriver-Magnetization-<stage>-<iteration>.omf`, so they are sorted by their
+    (stage, iteration) numbers.
+    """
+    pattern = re.compile(r'-Magnetization-(\d+)-(\d+)\.omf$')
+
+    snapshots = []
+    for filename in os.listdir(drive_dir):
+        match = pattern.search(filename)
+        if match:
+            snapshots.append(((int(match.group(1)), int(match.group(2))), os.path.join(drive_dir, filename)))
+
+    return [path for _, path in sorted(snapshots)]
+
+
+def _is_complete(path):
+    """OVF files end with `# End: Segment`; anything else is still being written by OOMMF."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(os.path.getsize(path) - 64, 0))
+            return b'End: Segment' in f.read()
+    except OSError:
+        return False
+
+
+class DriveMonitor:
+    """
+    Tail a drive directory while OOMMF writes to it.
+
+    Every new (complete) snapshot is read once; the magnetisation along the x-axis at the centre of the y-z
+    cross-section (the same midline as the template's `data_mx`) is normalised by `Ms`, the initial state is
+    subtracted, and the row is appended to a space-time buffer which grows by doubling. Every `refresh_every` new
+    rows the figure is refreshed with:
+        - the amplitude map |m_i(x, t)|, to see where the waves have travelled to;
+        - the partial dispersion |FFT2| of the rows received so far.
+
+    Example
+    -------
+    >>> monitor = DriveMonitor(data_output + f'/drive-{system.drive_number}', Ms=sat_mag,
+    ...                        time_step=stepsize_between_datapoints, n_expected=num_datapoints)
+    >>> monitor.run()  # In another process/kernel than the one calling `td.drive`
+    """
+
+    def __init__(self, drive_dir, Ms, component='x', m_pos=None, time_step=None, n_expected=None,
+                 refresh_every=10, window='hanning', ax=None, figs_output=None):
+        """
+        :param drive_dir: The `drive-N` directory being written to.
+        :param Ms: Saturation magnetisation used to normalise the snapshots.
+        :param component: Magnetisation component to monitor ('x', 'y' or 'z').
+        :param m_pos: (y, z) cell indices of the midline. Defaults to the centre of the cross-section.
+        :param time_step: Time between saved snapshots [s], used for the frequency axis. Index units if None.
+        :param n_expected: Number of snapshots the drive will save (`n` of `td.drive`). Used to stop `run`.
+        :param refresh_every: Number of new snapshots between refreshes of the figure.
+        :param window: Numpy window function applied along both axes before the FFT.
+        :param ax: Two axes (amplitude map, spectrum) to draw into. A new figure is created if None.
+        :param figs_output: If given, the figure is also saved to this directory at every refresh.
+        """
+        self.drive_dir = drive_dir
+        self.Ms = Ms
+        self.component = {'x': 0, 'y': 1, 'z': 2}[component]
+        self.m_pos = m_pos
+        self.time_step = time_step
+        self.n_expected = n_expected
+        self.refresh_every = refresh_every
+        self.window = window
+        self.figs_output = figs_output
+
+        self._seen = set()
+        self._m0 = None
+        self._cell = None
+        self._buffer = None
+        self._n_rows = 0
+        self._n_since_refresh = 0
+
+        self._ax = ax
+        self._fig = None
+        self._images = None
+
+    # Data -------------------------------------------------------------------
+
+    @property
+    def data(self):
+        """Space-time matrix received so far: one row per snapshot, one column per cell along x."""
+        if self._buffer is None:
+            return np.empty((0, 0))
+        return self._buffer[:self._n_rows]
+
+    def _midline(self, path):
+        field = df.Field.from_file(path)
+        array = field.array
+
+        if self.m_pos is None:
+            ny, nz = array.shape[1:3]
+            self.m_pos = (min(int(round(ny * 0.5)), ny - 1), min(int(round(nz * 0.5)), nz - 1))
+        if self._cell is None:
+            self._cell = field.mesh.cell
+
+        return array[:, self.m_pos[0], self.m_pos[1], self.component] / self.Ms
+
+    def _append(self, row):
+        if self._buffer is None:
+            capacity = self.n_expected if self.n_expected else 64
+            self._buffer = np.zeros((capacity, row.size))
+        elif self._n_rows == len(self._buffer):
+            grown = np.zeros((2 * len(self._buffer), row.size))
+            grown[:self._n_rows] = self._buffer
+            self._buffer = grown
+
+        self._buffer[self._n_rows] = row
+        self._n_rows += 1
+
+    def poll(self):
+        """Read every complete snapshot that has not been read yet. Returns the number of new rows."""
+        if self._m0 is None:
+            m0_path = os.path.join(self.drive_dir, 'm0.omf')
+            if not (os.path.exists(m0_path) and _is_complete(m0_path)):
+                return 0
+            self._m0 = self._midline(m0_path)
+
+        n_new = 0
+        for path in list_drive_snapshots(self.drive_dir):
+            if path in self._seen:
+                continue
+            if not _is_complete(path):
+                # Snapshots are written in order: the following ones can't be ready either
+                break
+
+            self._append(self._midline(path) - self._m0)
+            self._seen.add(path)
+            n_new += 1
+
+        self._n_since_refresh += n_new
+        return n_new
+
+    def finished(self):
+        """True once the drive has saved `n_expected` snapshots, or once OOMMF has recorded its end time."""
+        if self.n_expected is not None and self._n_rows >= self.n_expected:
+            return True
+
+        info_path = os.path.join(self.drive_dir, 'info.json')
+        try:
+            with open(info_path) as f:
+                return 'end_time' in json.load(f)
+        except (OSError, ValueError):
+            return False
+
+    def spectrum(self):
+        """
+        Partial dispersion relation of the rows received so far: log10(|FFT2|^2) of the windowed data, shifted so the
+        zero frequency and wavevector are at the centre. Returns (spectrum, freqs, ks); `freqs` in GHz (or cycles per
+        snapshot if no `time_step` was given) and `ks` in rad/nm.
+        """
+        data = self.data
+        n_t, n_x = data.shape
+
+        window_f = getattr(np, self.window)
+        windowed = data * window_f(n_t)[:, None]
+        windowed *= window_f(n_x)[None, :]
+
+        fft_data = np.abs(np.fft.fftshift(np.fft.fft2(windowed)))
+        with np.errstate(divide='ignore'):
+            fft_data = np.log10(fft_data ** 2)
+
+        freqs = np.fft.fftshift(np.fft.fftfreq(n_t, d=self.time_step if self.time_step else 1.))
+        if self.time_step:
+            freqs *= 1e-9
+        ks = np.fft.fftshift(np.fft.fftfreq(n_x, d=self._cell[0] * 1e9)) * 2 * np.pi
+
+        return fft_data, freqs, ks
+
+    # Figure -----------------------------------------------------------------
+
+    def _setup_figure(self):
+        if self._ax is None:
+            self._fig, self._ax = plt.subplots(nrows=1, ncols=2, figsize=(10, 4), layout='constrained')
+        else:
+            self._fig = self._ax[0].figure
+
+        self._ax[0].set(title='Amplitude', xlabel='Distance (nm)',
+                        ylabel='Time (ns)' if self.time_step else 'Snapshot')
+        self._ax[1].set(title='Partial spectrum', xlabel=r'$k$  [ rad/nm ]',
+                        ylabel=r'$f$  [ GHz ]' if self.time_step else r'$f$  [ 1/snapshot ]')
+
+        self._images = [ax.imshow(np.zeros((2, 2)), origin='lower', aspect='auto', interpolation='none', cmap=cmap)
+                        for ax, cmap in zip(self._ax, ['inferno', 'bone_r'])]
+        for image, ax in zip(self._images, self._ax):
+            self._fig.colorbar(image, ax=ax)
+
+    def refresh(self):
+        """Redraw the amplitude map and the partial spectrum with the rows received so far."""
+        if self._n_rows < 2:
+            return
+        if self._images is None:
+            self._setup_figure()
+
+        length = self.data.shape[1] * self._cell[0] * 1e9
+        t_max = self._n_rows * (self.time_step * 1e9 if self.time_step else 1.)
+
+        amplitude = np.abs(self.data)
+        self._images[0].set(data=amplitude, extent=[0, length, 0, t_max])
+        self._images[0].set_clim(0, amplitude.max() if amplitude.max() > 0 else 1)
+
+        fft_data, freqs, ks = self.spectrum()
+        finite = fft_data[np.isfinite(fft_data)]
+        self._images[1].set(data=fft_data, extent=[ks[0], ks[-1], freqs[0], freqs[-1]])
+        if finite.size:
+            self._images[1].set_clim(finite.min(), finite.max())
+
+        self._fig.suptitle(f'{os.path.basename(os.path.normpath(self.drive_dir))}: {self._n_rows} snapshots')
+        self._fig.canvas.draw_idle()
+        self._fig.canvas.flush_events()
+
+        if self.figs_output is not None:
+            self._fig.savefig(os.path.join(self.figs_output,
+                                           os.path.basename(os.path.normpath(self.drive_dir)) + '_monitor.png'),
+                              dpi=100)
+
+        self._n_since_refresh = 0
+
+    def run(self, poll_interval=2.0, idle_timeout=None):
+        """
+        Poll the drive directory every `poll_interval` seconds until the drive has finished, refreshing the figure
+        every `refresh_every` new snapshots. Stops early if no new snapshot appears for `idle_timeout` seconds.
+        Returns the space-time matrix.
+        """
+        last_new = time.monotonic()
+
+        while True:
+            n_new = self.poll()
+            if n_new:
+                last_new = time.monotonic()
+                lg.info(f"{PROGRAM_NAME}: {n_new} new snapshots in {self.drive_dir} ({self._n_rows} total)")
+
+            if self._n_since_refresh >= self.refresh_every:
+                self.refresh()
+
+            if self.finished():
+                break
+            if idle_timeout is not None and time.monotonic() - last_new > idle_timeout:
+                lg.warning(f"{PROGRAM_NAME}: no new snapshots for {idle_timeout} s; stopped monitoring")
+                break
+
+            if self._fig is not None:
+                plt.pause(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+        self.refresh()
+        return self.data
@@ -3,7 +3,21 @@
 # -------------------------- Preprocessing Directives -------------------------
 
 # Standard Libraries
+import io as io
 import logging as lg
+import os as os
+import pickle as pickle
+import queue as queue
+import shutil as shutil
+import subprocess as subprocess
+import threading as threading
+import time as time
+import tracemalloc as tracemalloc
+import warnings as warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
 from sys import exit
 
 # 3rd Party packages
@@ -19,7 +33,9 @@ from matplotlib.text import Text
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 from mpl_toolkits.axes_grid1.axes_divider import make_axes_locatable
 import matplotlib.pyplot as plt
+import micromagneticdata as md
 import numpy as np
+from PIL import Image
 
 # My packages/Header files
 # Here
@@ -39,7 +55,20 @@ Created on 24 Jul 24 by Cameron Aidan McEleney
 """
 
 __all__ = [
+    "StageTimer",
+    "FigureSaver",
     "default_three_pane",
+    "ThreePaneFigure",
+    "ResampleCache",
+    "extract_plane",
+    "auto_resample_shape",
+    "MeanPyramid",
+    "render_drive_frames",
+    "AnimationWriter",
+    "render_drive_animation",
+    "pool_matrix",
+    "binned_imshow",
+    "binned_surface",
     "mpl_wrapper",
     "rotate_in_place",
     "alter_colorbar"
@@ -66,8 +95,590 @@ def loggingSetup():
 
 # ------------------------------ Implementations ------------------------------
 
+@dataclass
+class StageRecord:
+    """One timed call of a stage: `stage` is the path of nested stages, e.g. 'mpl_wrapper/vector'."""
+    stage: str
+    seconds: float
+    peak_bytes: int = None
+
+
+class StageTimer:
+    """
+    Opt-in timing of the stages of a figure: `mpl_wrapper` (and its 'resample', 'scalar' and 'vector' steps),
+    `rotate_in_place`, `alter_colorbar`, `savefig` and the `update` of a `ThreePaneFigure`.
+
+    Nothing is timed unless a timer is active. While it is (as a context manager), every stage called records its wall
+    time and the peak memory it allocated above what was in use when it started (traced by `tracemalloc`, which slows
+    allocations down; pass `trace_memory=False` for times only). Records accumulate, so one timer aggregates a batch
+    of renders; `render_drive_frames` also collects the records of its worker processes. With several threads
+    rendering at once, the peaks are those of the whole process.
+
+    Example
+    -------
+    >>> with cip.StageTimer() as timer:
+    ...     cip.default_three_pane(system, system_prop, system_region, figs_output, drive_number, 'driven')
+    >>> print(timer.report())
+    """
+    _active = None
+
+    def __init__(self, trace_memory=True, log=False):
+        self.trace_memory = trace_memory
+        self.log = log
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracing = False
+        self._previous = None
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous, StageTimer._active = StageTimer._active, self
+        return self
+
+    def __exit__(self, *exc_info):
+        StageTimer._active = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self.log:
+            lg.info(f"{PROGRAM_NAME}: stage timings\n{self.report()}")
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as `name`, nested under the stages already running in this thread."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        start_bytes = 0
+        if tracing:
+            start_bytes, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+
+        # [stage path, peak of the nested stages]
+        entry = ['/'.join([stack[-1][0], name]) if stack else name, 0]
+        stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            peak_bytes = None
+            if tracing:
+                peak = max(entry[1], tracemalloc.get_traced_memory()[1])
+                peak_bytes = peak - start_bytes
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+            self.add([StageRecord(entry[0], seconds, peak_bytes)])
+
+    def add(self, records):
+        """Add records, e.g. those of another process."""
+        with self._lock:
+            self.records.extend(records)
+
+    def summary(self):
+        """{stage: {'calls', 'total_s', 'mean_s', 'max_s', 'peak_bytes'}}, in the order the stages first ran."""
+        summary = {}
+        for record in self.records:
+            stats = summary.setdefault(record.stage, {'calls': 0, 'total_s': 0., 'mean_s': 0., 'max_s': 0.,
+                                                      'peak_bytes': None})
+            stats['calls'] += 1
+            stats['total_s'] += record.seconds
+            stats['max_s'] = max(stats['max_s'], record.seconds)
+            if record.peak_bytes is not None:
+                stats['peak_bytes'] = max(stats['peak_bytes'] or 0, record.peak_bytes)
+        for stats in summary.values():
+            stats['mean_s'] = stats['total_s'] / stats['calls']
+        return summary
+
+    def report(self):
+        """The summary as a table."""
+        lines = [f"{'stage':<28}{'calls':>7}{'total (s)':>11}{'mean (s)':>10}{'max (s)':>10}{'peak (MiB)':>12}"]
+        for stage, stats in self.summary().items():
+            peak = '' if stats['peak_bytes'] is None else f"{stats['peak_bytes'] / 2 ** 20:.1f}"
+            lines.append(f"{stage:<28}{stats['calls']:>7}{stats['total_s']:>11.3f}{stats['mean_s']:>10.3f}"
+                         f"{stats['max_s']:>10.3f}{peak:>12}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def _stage(name):
+    """Time the enclosed block with the active `StageTimer`, if any."""
+    timer = StageTimer._active
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
+
+
+def _timed(name):
+    """Decorator timing every call of the function as the stage `name` (see `StageTimer`)."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with _stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Plane, scalar component, quiver components and quiver colour component of every data pane of the three-pane figure
+_THREE_PANES = {
+    'schematic': ('x', 'y', ('y', 'z'), 'z'),
+    'upper right': ('y', 'x', ('x', 'z'), 'z'),
+    'lower right': ('z', 'z', ('x', 'y'), 'x'),
+}
+
+
+class ResampleCache:
+    """
+    Planes of fields and their resampled copies, computed once per figure.
+
+    Entries are keyed by (field identity, plane, resample shape), so the scalar layer, the vector layer and the
+    `color_field` of a pane share one slice and one resample of each shape. The cache holds a reference to every field
+    it has seen, so their identities stay valid while it is alive; make a new cache for each figure (or frame).
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def orientation(self, field):
+        """`field.orientation`, computed once."""
+        key = (id(field), 'orientation', None)
+        if key not in self._entries:
+            self._entries[key] = (field, field.orientation)
+        return self._entries[key][1]
+
+    def get(self, field, plane=None, resample=None):
+        """`field.sel(plane).resample(resample)`, where each step is computed once and skipped when it is not needed."""
+        resample = tuple(int(n) for n in resample) if resample is not None and len(resample) else None
+        key = (id(field), plane, resample)
+        if key not in self._entries:
+            if resample is not None:
+                value = self.get(field, plane)
+                if tuple(value.mesh.n) != resample:
+                    value = value.resample(resample)
+            elif plane is not None:
+                value = field.sel(plane)
+            else:
+                value = field
+            self._entries[key] = (field, value)
+        return self._entries[key][1]
+
+
+def _sample_indices(n, m):
+    """
+    Cells of an axis of `n` cells holding the centres of `m` resampled cells (the lower cell for centres on a cell
+    boundary); a strided slice when `m` divides `n`.
+    """
+    if n % m == 0:
+        return slice((n // m - 1) // 2, None, n // m)
+    return np.clip(np.ceil((np.arange(m) + 0.5) * n / m).astype(int) - 1, 0, n - 1)
+
+
+def _block_mean(values, axis, m):
+    """Mean of `values` over `m` (nearly) equal blocks along `axis`."""
+    n = values.shape[axis]
+    if n % m == 0:
+        shape = values.shape[:axis] + (m, n // m) + values.shape[axis + 1:]
+        return values.reshape(shape).mean(axis=axis + 1)
+    edges = (np.arange(m) * n) // m
+    counts = np.diff(np.append(edges, n)).reshape([-1 if i == axis else 1 for i in range(values.ndim)])
+    return np.add.reduceat(values, edges, axis=axis) / counts
+
+
+def extract_plane(array, plane, resample=None, method='sample', normalise=True):
+    """
+    The plane of a raw field array through the middle of the sample, straight from NumPy.
+
+    This is the fast path of `field.orientation.sel(plane).resample(resample)`: no intermediate `df.Field` or mesh is
+    built. The plane is a view of `array`; it is downsampled by strided views (or the nearest cells, as `resample`
+    does) or by block averages, and only then copied and normalised in place, so `array` itself is never modified.
+    A resampled cell centred on the boundary of two cells (e.g. 40 cells down to 20) always takes the lower one, while
+    `resample` takes either depending on floating-point rounding, so such planes may differ from those of `resample`.
+
+    :param array: (nx, ny, nz, 3) values of the field, e.g. `drive[i].array`.
+    :param plane: 'x', 'y' or 'z'; the axis normal to the plane.
+    :param resample: (n1, n2) cells of the plane after downsampling. The full plane if None.
+    :param method: 'sample' picks the cell at the centre of every new cell; 'mean' averages the (normalised) cells of
+                   the block.
+    :param normalise: Divide every (non-zero) vector by its norm, as `field.orientation` does.
+
+    :return: (n1, n2, 3) array, with the in-plane axes in (x, y, z) order.
+    """
+    if method not in ('sample', 'mean'):
+        raise ValueError(f"{PROGRAM_NAME}: method must be 'sample' or 'mean', not {method!r}")
+    axis = 'xyz'.index(plane)
+    values = array[(slice(None),) * axis + (array.shape[axis] // 2,)]
+
+    if resample is not None:
+        for plane_axis, m in enumerate(resample):
+            if m == values.shape[plane_axis]:
+                continue
+            if method == 'mean' and m < values.shape[plane_axis]:
+                # Average orientations, as a resample of `field.orientation` would
+                if normalise and np.shares_memory(values, array):
+                    values = values / _norm(values)
+                values = _block_mean(values, plane_axis, m)
+            else:
+                indices = _sample_indices(values.shape[plane_axis], m)
+                values = values[:, indices] if plane_axis else values[indices]
+
+    # Only the (small) downsampled plane is copied
+    values = np.array(values, dtype=float)
+    if normalise:
+        values /= _norm(values)
+    return values
+
+
+def _norm(values):
+    """Norm of every vector of `values`, with 1 in place of 0 so that zero vectors stay zero when divided."""
+    norm = np.linalg.norm(values, axis=-1, keepdims=True)
+    norm[norm == 0] = 1.
+    return norm
+
+
+# Spacing (in inches) of the arrows of the panes with an 'auto' vector resample shape
+_ARROW_SPACING = 0.3
+
+
+def auto_resample_shape(ax, n_cells, dpi=None, pixels_per_cell=1., visible=(1., 1.)):
+    """
+    Resample shape of a plane of `n_cells` shown on `ax`: as many cells as there are pixels (`pixels_per_cell` apart)
+    across the axes at `dpi`, but never more than the plane has.
+
+    :param dpi: Resolution the figure is saved (or shown) at. The figure dpi if None.
+    :param visible: Fraction of the plane visible along each axis (e.g. when zoomed in); the shape covers the whole
+                    plane at the resolution of the visible part.
+    """
+    fig = ax.figure
+    dpi = fig.dpi if dpi is None else dpi
+    position = ax.get_position()
+    size_inches = fig.get_size_inches() * (position.width, position.height)
+    return tuple(int(max(1, min(n, np.ceil(size * dpi / (pixels_per_cell * fraction)))))
+                 for n, size, fraction in zip(n_cells, size_inches, visible))
+
+
+class MeanPyramid:
+    """
+    Level-of-detail pyramid of a (n1, n2, ...) plane: every level is the mean pool of the previous one over 2 cells
+    (rounded up at odd sizes) along each axis, down to a few cells. Elongated planes are only pooled along their long
+    axis until both axes are comparable. Built once per frame; any resolution is then served from the nearest level
+    instead of resampling the plane again.
+    """
+
+    def __init__(self, values, min_cells=2):
+        self.levels = [values]
+        while max(values.shape[:2]) > min_cells:
+            longest = max(values.shape[:2])
+            for axis in (0, 1):
+                if values.shape[axis] > 1 and 2 * values.shape[axis] > longest:
+                    values = _block_mean(values, axis, -(-values.shape[axis] // 2))
+            self.levels.append(values)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def level(self, shape):
+        """The coarsest level with at least `shape` cells along both axes (the finest level if none has)."""
+        for values in reversed(self.levels):
+            if values.shape[0] >= shape[0] and values.shape[1] >= shape[1]:
+                return values
+        return self.levels[0]
+
+    def resample(self, shape):
+        """Exactly `shape` cells, sampled from the nearest finer level."""
+        values = self.level(shape)
+        if values.shape[0] != shape[0]:
+            values = values[_sample_indices(values.shape[0], shape[0])]
+        if values.shape[1] != shape[1]:
+            values = values[:, _sample_indices(values.shape[1], shape[1])]
+        return values
+
+
+def _pane_resample_shapes(system_prop, scalar_resample_shape=None, vector_resample_shape=None, fig_axs=None,
+                          dpi=300):
+    """
+    (scalar, vector) resample shapes of every data pane of the three-pane figure. Shapes given as 'auto' are picked
+    from the size of the axes in `fig_axs` at `dpi`: one cell per pixel for images, and one arrow every
+    `_ARROW_SPACING` inches for quivers.
+    """
+    numcells = system_prop.numcells
+    shapes = {'schematic': ((numcells[1], numcells[2]), (numcells[1], numcells[2]))}
+
+    for pane, n_cells, default_vector_shape in (('upper right', (numcells[0], numcells[2]),
+                                                 (16, int(np.ceil(numcells[2])))),
+                                                ('lower right', (numcells[0], numcells[1]), (16, numcells[1]))):
+        if scalar_resample_shape == 'auto':
+            scalar_shape = auto_resample_shape(fig_axs[pane], n_cells, dpi)
+        else:
+            scalar_shape = scalar_resample_shape if scalar_resample_shape else n_cells
+
+        if vector_resample_shape == 'auto':
+            vector_shape = auto_resample_shape(fig_axs[pane], n_cells, dpi, _ARROW_SPACING * dpi)
+        else:
+            vector_shape = vector_resample_shape if vector_resample_shape else default_vector_shape
+
+        shapes[pane] = (scalar_shape, vector_shape)
+
+    return shapes
+
+
+def pool_matrix(matrix, shape, method='max', q=99., band_bytes=64 * 2 ** 20):
+    """
+    Pool a (n_rows, n_cols) matrix (spectrum, space-time data, ...) down to at most `shape` cells.
+
+    Every output cell reduces a block of ceil(n / shape) bins per axis with `method`: 'max' (peaks stay visible),
+    'mean' or 'percentile' (the `q`-th). The blocks at the end are padded with NaN, which is ignored. The matrix is read
+    in bands of rows of about `band_bytes`, so memory mapped (or broadcast) matrices are never copied whole.
+    """
+    if method not in ('max', 'mean', 'percentile'):
+        raise ValueError(f"{PROGRAM_NAME}: method must be 'max', 'mean' or 'percentile', not {method!r}")
+
+    n_rows, n_cols = np.shape(matrix)
+    f_r = max(1, -(-n_rows // max(1, shape[0])))
+    f_c = max(1, -(-n_cols // max(1, shape[1])))
+    if f_r == 1 and f_c == 1:
+        return np.asarray(matrix)
+
+    m_r, m_c = -(-n_rows // f_r), -(-n_cols // f_c)
+    pooled = np.empty((m_r, m_c))
+    band = max(1, band_bytes // (8 * f_r * m_c * f_c))
+    reduce = {'max': np.nanmax, 'mean': np.nanmean,
+              'percentile': lambda blocks, axis: np.nanpercentile(blocks, q, axis=axis)}[method]
+
+    with warnings.catch_warnings():
+        # Blocks made only of NaN give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for start in range(0, m_r, band):
+            stop = min(m_r, start + band)
+            rows = np.asarray(matrix[start * f_r:stop * f_r], dtype=float)
+            blocks = np.full(((stop - start) * f_r, m_c * f_c), np.nan)
+            blocks[:rows.shape[0], :n_cols] = rows
+            pooled[start:stop] = reduce(blocks.reshape(stop - start, f_r, m_c, f_c), axis=(1, 3))
+
+    return pooled
+
+
+def binned_imshow(ax, matrix, method='max', q=99., dpi=None, **imshow_kw):
+    """
+    `ax.imshow` of `matrix` pooled (see `pool_matrix`) to the pixel grid of `ax` at `dpi` (the figure dpi if None).
+
+    Crop the matrix to the plotted limits first, as the pooling is sized for the whole matrix filling the axes. Without
+    an `extent`, the one of the full matrix is used so the data coordinates are those of the bins either way.
+    """
+    n_rows, n_cols = np.shape(matrix)
+    if 'extent' not in imshow_kw:
+        if imshow_kw.get('origin', 'upper') == 'lower':
+            imshow_kw['extent'] = [-0.5, n_cols - 0.5, -0.5, n_rows - 0.5]
+        else:
+            imshow_kw['extent'] = [-0.5, n_cols - 0.5, n_rows - 0.5, -0.5]
+
+    pixels = auto_resample_shape(ax, (n_cols, n_rows), dpi)[::-1]
+    return ax.imshow(pool_matrix(matrix, pixels, method, q), **imshow_kw)
+
+
+def binned_surface(ax, X, Y, Z, shape=(50, 50), method='mean', q=99., **surface_kw):
+    """
+    `ax.plot_surface` of `Z` pooled (see `pool_matrix`) to at most `shape` cells.
+
+    `X` and `Y` are broadcast against `Z` (so 1D coordinates, e.g. x[None, :], or scalars need no meshgrid) and
+    mean-pooled over the same blocks. `plot_surface` would otherwise triangulate every cell only to draw (by default)
+    50x50 of them.
+    """
+    Z_pooled = pool_matrix(Z, shape, method, q)
+    X_pooled, Y_pooled = (pool_matrix(np.broadcast_to(coords, np.shape(Z)), shape, 'mean') for coords in (X, Y))
+
+    surface_kw.setdefault('rcount', Z_pooled.shape[0])
+    surface_kw.setdefault('ccount', Z_pooled.shape[1])
+    return ax.plot_surface(X_pooled, Y_pooled, Z_pooled, **surface_kw)
+
+
+class FigureSaver:
+    """
+    Save figures in the background, so the caller carries on while they are rasterised, encoded and written.
+
+    Executors:
+        'thread': the figure itself is saved by a worker thread. It is handed over: do not change it until its save
+                  is done (`wait`), and do not reuse it for the next figure (build a new one, as `default_three_pane`
+                  does). With `close`, it is closed once saved, by the caller's thread (at the next `save`, `wait`
+                  or `close`) as pyplot is not thread-safe.
+        'process': the figure is pickled in the caller (a snapshot, so it can be changed or reused right away, e.g. a
+                   `ThreePaneFigure`) and saved by a worker process, in parallel with the caller.
+
+    At most `queue_size` figures wait for a worker; `save` blocks while the queue is full, so a slow disk holds back the
+    caller instead of filling the memory. A failed save is raised (as a RuntimeError from the original error) by the
+    next `save`, by `wait` or when the saver is closed.
+
+    :param workers: Number of threads or processes saving figures.
+    :param queue_size: Number of figures that may wait for a worker.
+    :param close: Close every figure once it is saved ('thread') or pickled ('process').
+
+    Example
+    -------
+    >>> with cip.FigureSaver() as saver:
+    ...     for i, fig_name in enumerate(fig_names):
+    ...         cip.default_three_pane(system, system_prop, system_region, figs_output, i, fig_name, saver=saver)
+    """
+
+    def __init__(self, workers=1, queue_size=4, executor='thread', close=True):
+        if executor == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='FigureSaver')
+        elif executor == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=plt.switch_backend,
+                                                 initargs=('Agg',))
+        else:
+            raise ValueError(f"{PROGRAM_NAME}: executor must be 'thread' or 'process', not {executor!r}")
+
+        self.executor = executor
+        self.close_figures = close
+        self.written = []
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pending = []
+        self._error = None
+        self._raised = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(wait=exc_type is None)
+
+    def save(self, fig, filename, **savefig_kw):
+        """Queue `fig` to be saved as `filename` with `fig.savefig(filename, **savefig_kw)`; returns its Future."""
+        self._check_errors()
+        self._close_saved()
+        job = pickle.dumps(fig) if self.executor == 'process' else fig
+        if self.executor == 'process' and self.close_figures:
+            plt.close(fig)
+
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_save_figure, job, filename, savefig_kw, self.executor == 'process')
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda done: self._done(filename, done))
+        # Figures saved by a thread are closed here, on the caller's thread, once their save is done
+        to_close = fig if self.executor == 'thread' and self.close_figures else None
+        self._pending.append((filename, future, to_close))
+        return future
+
+    def wait(self):
+        """Block until every queued figure is saved; returns the paths written so far."""
+        pending, self._pending = self._pending, []
+        for filename, future, fig in pending:
+            if future.exception() is None:
+                self.written.append(filename)
+            else:
+                self._fail(filename, future)
+            if fig is not None:
+                plt.close(fig)
+        self._check_errors()
+        return self.written
+
+    def close(self, wait=True):
+        """Stop the workers, once the queued figures are saved (`wait`) or dropping those not yet started."""
+        try:
+            if wait:
+                self.wait()
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=not wait)
+            for _, _, fig in self._pending:
+                if fig is not None:
+                    plt.close(fig)
+
+    def _close_saved(self):
+        for i, (filename, future, fig) in enumerate(self._pending):
+            if fig is not None and future.done():
+                plt.close(fig)
+                self._pending[i] = (filename, future, None)
+
+    def _done(self, filename, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            self._fail(filename, future)
+
+    def _fail(self, filename, future):
+        # Keep the first failure not raised yet
+        with self._lock:
+            if self._error is None and future not in self._raised:
+                self._error = (filename, future)
+
+    def _check_errors(self):
+        with self._lock:
+            if self._error is None:
+                return
+            (filename, future), self._error = self._error, None
+            self._raised.add(future)
+        raise RuntimeError(f"{PROGRAM_NAME}: saving {filename} failed") from future.exception()
+
+
+def _save_figure(fig, filename, savefig_kw, close):
+    """
+    Worker of `FigureSaver`: save `fig` (or the figure it pickles) and close it if asked to. Only worker processes
+    close their figure; those saved by threads are closed by the caller.
+    """
+    if isinstance(fig, bytes):
+        fig = pickle.loads(fig)
+    try:
+        with _stage('savefig'):
+            fig.savefig(filename, **savefig_kw)
+    finally:
+        if close:
+            plt.close(fig)
+
+
 def default_three_pane(system, system_prop, system_region, figs_output_dir, drive_number, fig_name, has_schematic=True,
-                       scalar_resample_shape=None, vector_resample_shape=None):
+                       scalar_resample_shape=None, vector_resample_shape=None, saver=None):
+    fig, fig_axs, _ = _three_pane_layout(system, system_prop, system_region, fig_name, has_schematic,
+                                      scalar_resample_shape, vector_resample_shape)
+
+    ################################
+    filename = figs_output_dir + '/drive-' + str(drive_number) + "_m_" + fig_name + '.png'
+    if saver is not None:
+        # Saved in the background; the figure belongs to `saver` from here on
+        saver.save(fig, filename, format='png', dpi=300, bbox_inches='tight')
+        return fig
+
+    with _stage('savefig'):
+        plt.savefig(filename, format='png', dpi=300, bbox_inches='tight')
+
+    return fig
+
+
+def _three_pane_layout(system, system_prop, system_region, fig_name, has_schematic=True, scalar_resample_shape=None,
+                       vector_resample_shape=None):
+    """Build the figure of `default_three_pane` for `system`, without saving it, and return it with its axes and the
+    resample shapes of its panes."""
+    auto = [isinstance(shape, str) and shape == 'auto' for shape in (scalar_resample_shape, vector_resample_shape)]
+    resample_shapes = _pane_resample_shapes(system_prop, None if auto[0] else scalar_resample_shape,
+                                            None if auto[1] else vector_resample_shape)
+    fig, fig_axs = _draw_three_pane(system, system_prop, system_region, fig_name, has_schematic, resample_shapes)
+    if not any(auto):
+        return fig, fig_axs, resample_shapes
+
+    # The axes only have their final size once a draw has run the constrained layout with the suptitle and colorbars
+    # in place: the 'auto' shapes are picked from the drawn figure, which is rebuilt if they differ from the defaults
+    fig.canvas.draw()
+    auto_shapes = _pane_resample_shapes(system_prop, scalar_resample_shape, vector_resample_shape, fig_axs)
+    if auto_shapes != resample_shapes:
+        plt.close(fig)
+        fig, fig_axs = _draw_three_pane(system, system_prop, system_region, fig_name, has_schematic, auto_shapes)
+    return fig, fig_axs, auto_shapes
+
+
+def _draw_three_pane(system, system_prop, system_region, fig_name, has_schematic, resample_shapes):
+    """Draw the panes of `default_three_pane` with the given (scalar, vector) resample shapes of every pane."""
+    cache = ResampleCache()
+    orientation = cache.orientation(system.m)
+
     weight_factors = {'horizontal': [0.1, 0.9], 'vertical': [0.8, 0.2]}
     weighted_heights = [weight * numcells for weight, numcells in zip(weight_factors['vertical'],
                                                                       [system_prop.numcells[1],
@@ -94,18 +705,20 @@ def default_three_pane(system, system_prop, system_region, figs_output_dir, driv
     fig.suptitle(f'Normalised magnetisation fields ({fig_name})', fontsize=24)
 
     ################################
-    mpl_wrapper(system.m.orientation.sel('x'),
+    mpl_wrapper(cache.get(orientation, 'x'),
                 ax=fig_axs['schematic'],
                 multiplier=1e-9,
-                scalar_resample=(system_prop.numcells[1], system_prop.numcells[2]),
-                vector_resample=(system_prop.numcells[1], system_prop.numcells[2]),
+                scalar_resample=resample_shapes['schematic'][0],
+                vector_resample=resample_shapes['schematic'][1],
                 scalar_comp='y',
                 scalar_kw={'cmap': 'inferno', 'colorbar_label': 'm$_\\text{y}$', "interpolation": "none"},
                 vector_kw={'vdims': ['y', 'z'], 'cmap': 'viridis', 'use_color': False, 'alpha': 0.2,
-                           'colorbar': False, 'color_field': system.m.orientation.z.sel("x"),
+                           'colorbar': False,
+                           'color_field': cache.get(orientation, 'x', resample_shapes['schematic'][1]).z,
                            'scale': 3, 'headwidth': 16, 'headlength': 16, 'headaxislength': 16
                            },
-                mpl_kw={'title': ''})
+                mpl_kw={'title': ''},
+                cache=cache)
 
     rotate_in_place(fig_axs['schematic'],
                     [system_prop.numcells[1], system_prop.numcells[2]],
@@ -142,20 +755,19 @@ def default_three_pane(system, system_prop, system_region, figs_output_dir, driv
         fig_axs['lower left'].set_visible(False)
 
     ################################
-    mpl_wrapper(system.m.orientation.sel('y'),
+    mpl_wrapper(cache.get(orientation, 'y'),
                 ax=fig_axs['upper right'],
                 multiplier=1e-9,
-                scalar_resample=scalar_resample_shape if scalar_resample_shape else (
-                system_prop.numcells[0], system_prop.numcells[2]),
-                vector_resample=vector_resample_shape if vector_resample_shape else (
-                    16, int(np.ceil(system_prop.numcells[2]))),
+                scalar_resample=resample_shapes['upper right'][0],
+                vector_resample=resample_shapes['upper right'][1],
                 scalar_comp='x',
                 scalar_kw={'cmap': 'inferno', 'colorbar_label': 'm$_\\text{x}$', "interpolation": "none"},
                 vector_kw={'vdims': ['x', 'z'], 'cmap': 'viridis', 'use_color': False, 'colorbar': False, 'alpha': 0.2,
                            'colorbar_label': 'upper_right_cbar',
-                           'color_field': system.m.orientation.z.sel('y')
+                           'color_field': cache.get(orientation, 'y', resample_shapes['upper right'][1]).z
                            },
-                mpl_kw={})
+                mpl_kw={},
+                cache=cache)
 
     rotate_in_place(fig_axs['upper right'],
                     [system_prop.numcells[0], system_prop.numcells[2]],
@@ -171,18 +783,18 @@ def default_three_pane(system, system_prop, system_region, figs_output_dir, driv
                    cbar_yaxis_kw={'ticks_position': 'right', 'label_position': 'right'})
 
     ################################
-    mpl_wrapper(system.m.orientation.sel('z'),
+    mpl_wrapper(cache.get(orientation, 'z'),
                 ax=fig_axs['lower right'],
                 multiplier=1e-9,
-                scalar_resample=scalar_resample_shape if scalar_resample_shape else (
-                system_prop.numcells[0], system_prop.numcells[1]),
-                vector_resample=vector_resample_shape if vector_resample_shape else (16, system_prop.numcells[1]),
+                scalar_resample=resample_shapes['lower right'][0],
+                vector_resample=resample_shapes['lower right'][1],
                 scalar_comp='z',
                 scalar_kw={'cmap': 'inferno', 'colorbar_label': 'm$_\\text{z}$', "interpolation": "none"},
                 vector_kw={'vdims': ['x', 'y'], 'cmap': 'viridis', 'use_color': True, 'alpha': 0.3, 'colorbar': True,
-                           'color_field': system.m.orientation.x.sel('z')},
+                           'color_field': cache.get(orientation, 'z', resample_shapes['lower right'][1]).x},
                 # 'headwidth': 16, 'headlength': 16, 'headaxislength': 12},
-                mpl_kw={'title': '', 'aspect': 'auto'})
+                mpl_kw={'title': '', 'aspect': 'auto'},
+                cache=cache)
 
     rotate_in_place(fig_axs['lower right'],
                     [system_prop.numcells[0], system_prop.numcells[1]],
@@ -198,13 +810,462 @@ def default_three_pane(system, system_prop, system_region, figs_output_dir, driv
                                    'ylabel': 'Quiver: m$_\\text{x}$'},
                    )
 
-    ################################
-    plt.savefig(figs_output_dir + '/drive-' + str(drive_number) + "_m_" + fig_name + '.png', format='png',
-                dpi=300, bbox_inches='tight')
+    return fig, fig_axs
+
+
+class ThreePaneFigure:
+    """
+    The figure of `default_three_pane`, built once and then reused for every frame of an animation.
+
+    Building the figure (mosaic, colorbars, `rotate_in_place` and `alter_colorbar` restyling) is most of the cost of
+    `default_three_pane`. Here it is only done for the first frame; `update` (or `update_array`, straight from the raw
+    array) then replaces the data of the existing artists (`set_data` of the images, `set_UVC` of the quivers and their
+    colour limits) before `save` or `blit`.
+
+    :param clim: Fixed colour limits of the images and of the quiver colours, e.g. (-1, 1). Rescaled to every frame
+                 if None, as `default_three_pane` does; the colorbar labels (and the space kept for their ticks) are
+                 those of the first frame either way, so fixed limits are the better choice for animations.
+                 The arrow lengths are also kept on the scale of the first frame, so that they compare between frames.
+    :param lod: Level of detail: `update_array` builds a `MeanPyramid` of every plane once per frame, and each image
+                shows the coarsest level that still has a cell per pixel of its axes at `lod_dpi` (also after zooming
+                in, without resampling again). The quivers are sampled from the pyramid as well.
+    :param lod_dpi: Resolution the levels are matched to; that of `save` by default.
+
+    `scalar_resample_shape` and `vector_resample_shape` may be 'auto', to pick them from the size of the axes (see
+    `auto_resample_shape`).
+
+    Example
+    -------
+    >>> figure = ThreePaneFigure(system, system_prop, system_region, fig_name='driven', has_schematic=False)
+    >>> for i in range(drive.n):
+    ...     system.m = drive[i]
+    ...     figure.update(system, fig_name=f'driven_{i:04d}').save(f'{figs_output}/driven_{i:04d}.png')
+    """
 
+    def __init__(self, system, system_prop, system_region, fig_name='', has_schematic=True,
+                 scalar_resample_shape=None, vector_resample_shape=None, clim=None, lod=False, lod_dpi=300):
+        self.fig, self.axs, self.resample_shapes = _three_pane_layout(system, system_prop, system_region, fig_name,
+                                                                      has_schematic, scalar_resample_shape,
+                                                                      vector_resample_shape)
+        self.clim = clim
+        self.lod = lod
+        self.lod_dpi = lod_dpi
+        self.pyramids = {}
+
+        self.images = {pane: self.axs[pane].get_images()[0] for pane in _THREE_PANES}
+        self.quivers = {pane: self.axs[pane].findobj(mpl_q.Quiver)[0] for pane in _THREE_PANES}
+        self._background = None
+
+        if clim is not None:
+            for artist in [*self.images.values(), *self.quivers.values()]:
+                artist.set_clim(*clim)
+
+        if lod:
+            for pane in _THREE_PANES:
+                for event in ('xlim_changed', 'ylim_changed'):
+                    self.axs[pane].callbacks.connect(event, lambda ax, pane=pane: self._show_level(pane))
+            self.update_array(system.m.array)
+
+    def update(self, system, fig_name=None):
+        """Replace the data of every pane by the magnetisation of `system`."""
+        if self.lod:
+            return self.update_array(system.m.array, fig_name)
+
+        with _stage('update'):
+            cache = ResampleCache()
+            orientation = cache.orientation(system.m)
+
+            for pane, (plane, scalar_comp, _, _) in _THREE_PANES.items():
+                scalar_shape, vector_shape = self.resample_shapes[pane]
+
+                scalar_field = getattr(cache.get(orientation, plane, scalar_shape), scalar_comp)
+                scalar_values = scalar_field.array.reshape(scalar_field.mesh.n).astype(float)
+                scalar_values[~scalar_field.valid.reshape(scalar_field.mesh.n)] = np.nan
+
+                vector_field = cache.get(orientation, plane, vector_shape)
+                self._set_pane(pane, scalar_values, vector_field.array.reshape(*vector_field.mesh.n, 3))
+
+        return self._set_title(fig_name)
+
+    @_timed('update')
+    def update_array(self, array, fig_name=None, method='sample'):
+        """
+        Replace the data of every pane by the raw (nx, ny, nz, 3) magnetisation `array` (e.g. `drive[i].array`),
+        with the NumPy fast path of `extract_plane` instead of `df.Field` slices and resamples.
+
+        :param method: 'sample' or 'mean'; see `extract_plane`. Not used with `lod`, where the levels are mean pools.
+        """
+        for pane, (plane, scalar_comp, _, _) in _THREE_PANES.items():
+            scalar_shape, vector_shape = self.resample_shapes[pane]
+            if self.lod:
+                self.pyramids[pane] = MeanPyramid(extract_plane(array, plane))
+                self._set_pane(pane, self._level_values(pane), self.pyramids[pane].resample(vector_shape))
+                continue
+            scalar_values = extract_plane(array, plane, scalar_shape, method)[..., 'xyz'.index(scalar_comp)]
+            self._set_pane(pane, scalar_values, extract_plane(array, plane, vector_shape, method))
+
+        return self._set_title(fig_name)
+
+    def _level_values(self, pane):
+        """Scalar values of `pane` from the level of its pyramid matching the visible part of its axes."""
+        ax, image = self.axs[pane], self.images[pane]
+        extent = image.get_extent()
+        visible = (min(1., abs(np.diff(ax.get_xlim())[0] / (extent[1] - extent[0]))),
+                   min(1., abs(np.diff(ax.get_ylim())[0] / (extent[3] - extent[2]))))
+
+        pyramid = self.pyramids[pane]
+        shape = auto_resample_shape(ax, pyramid.levels[0].shape[:2], self.lod_dpi, visible=visible)
+        return pyramid.level(shape)[..., 'xyz'.index(_THREE_PANES[pane][1])]
+
+    def _show_level(self, pane):
+        """Swap the image of `pane` to the level matching a new view (zoom), from the pyramid of the current frame."""
+        if pane in self.pyramids:
+            self.images[pane].set_data(np.transpose(self._level_values(pane)))
+
+    def _set_pane(self, pane, scalar_values, vector_values):
+        """Give `pane` the (n1, n2) scalar values of its image and the (m1, m2, 3) vectors of its quiver."""
+        _, _, vdims, color_comp = _THREE_PANES[pane]
+
+        self.images[pane].set_data(np.transpose(scalar_values))
+        if self.clim is None:
+            self.images[pane].autoscale()
+
+        u, v, color = (np.transpose(vector_values[..., 'xyz'.index(comp)]) for comp in (*vdims, color_comp))
+        quiver = self.quivers[pane]
+        if quiver.get_array() is None:
+            quiver.set_UVC(u, v)
+        else:
+            quiver.set_UVC(u, v, color)
+            if self.clim is None:
+                quiver.autoscale()
+
+    def _set_title(self, fig_name):
+        if fig_name is not None:
+            self.fig.suptitle(f'Normalised magnetisation fields ({fig_name})', fontsize=24)
+        return self
+
+    def save(self, filename, saver=None, **savefig_kw):
+        """
+        Save the current frame, with the settings of `default_three_pane` unless overridden. With a `saver`, the frame
+        is saved in the background; as the figure is reused for the next frame, the saver must use processes.
+        """
+        savefig_kw = {'format': 'png', 'dpi': 300, 'bbox_inches': 'tight', **savefig_kw}
+        if saver is not None:
+            if saver.executor != 'process' or saver.close_figures:
+                raise ValueError(f"{PROGRAM_NAME}: a ThreePaneFigure is reused for every frame; save it with a "
+                                 f"FigureSaver(executor='process', close=False)")
+            saver.save(self.fig, filename, **savefig_kw)
+            return self
+        with _stage('savefig'):
+            self.fig.savefig(filename, **savefig_kw)
+        return self
+
+    def blit(self):
+        """
+        Redraw only the data artists on an interactive canvas. The static layout is drawn once and then restored from
+        a cached background for every frame.
+        """
+        canvas = self.fig.canvas
+        artists = [*self.images.values(), *self.quivers.values()]
+
+        if self._background is None:
+            for artist in artists:
+                artist.set_animated(True)
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.fig.bbox)
+
+        canvas.restore_region(self._background)
+        for artist in artists:
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        return self
+
+    def close(self):
+        plt.close(self.fig)
+
+
+class _FrameSystem:
+    """Stand-in for `system` in `default_three_pane`, holding the magnetisation of one frame of a drive."""
+
+    def __init__(self, m):
+        self.m = m
+
+
+def _render_frames(drive_name, drive_number, drive_dirname, frames, system_prop, system_region, figs_output_dir,
+                   fig_name, three_pane_kw, timer_kw=None):
+    """
+    Worker of `render_drive_frames`: load and render only `frames` of the drive. With `timer_kw`, the stages are timed
+    by a `StageTimer` of the worker and its records are returned along with the paths.
+    """
+    if timer_kw is not None:
+        with StageTimer(**timer_kw) as timer:
+            written, _ = _render_frames(drive_name, drive_number, drive_dirname, frames, system_prop, system_region,
+                                        figs_output_dir, fig_name, three_pane_kw)
+        return written, timer.records
+
+    drive = md.Drive(name=drive_name, number=drive_number, dirname=drive_dirname)
+
+    # The layout is built for the first frame and only its data is replaced for the others
+    figure, written = None, []
+    for frame in frames:
+        frame_name = f'{fig_name}_{frame:04d}'
+        field = drive[frame]
+        if figure is None:
+            figure = ThreePaneFigure(_FrameSystem(field), system_prop, system_region, fig_name=frame_name,
+                                     **three_pane_kw)
+        else:
+            figure.update_array(field.array, fig_name=frame_name)
+
+        written.append(figs_output_dir + '/drive-' + str(drive_number) + "_m_" + frame_name + '.png')
+        figure.save(written[-1])
+
+    if figure is not None:
+        figure.close()
+
+    return written, []
+
+
+def render_drive_frames(drive, system_prop, system_region, figs_output_dir, fig_name='frame', frames=None, workers=None,
+                        **three_pane_kw):
+    """
+    Render the figure of `default_three_pane` for every frame of a drive across a process pool.
+
+    The frames are split into one contiguous chunk per worker; each worker opens the drive itself and only loads the
+    frames of its chunk into one `ThreePaneFigure`. Every frame is saved as `drive-<N>_m_<fig_name>_<frame:04d>.png`.
+    The stage timings of the workers are added to the active `StageTimer`, if any.
+
+    :param drive: `md.Drive` to render.
+    :param frames: Indices (or a range) of the frames to render. All the frames of the drive if None.
+    :param workers: Number of processes. Defaults to the number of cores.
+    :param three_pane_kw: Passed on to `ThreePaneFigure` (e.g. `has_schematic=False`).
 
+    :return: Paths of the PNGs, in the order of `frames`.
+
+    Example
+    -------
+    >>> drive = md.Drive(name=system.name, dirname=data_output, number=system.drive_number - 1)
+    >>> cip.render_drive_frames(drive, system_prop, system_region, figs_output, fig_name='driven',
+    ...                         frames=range(0, drive.n, 5), has_schematic=False)
+    """
+    frames = list(range(drive.n) if frames is None else frames)
+    if not frames:
+        return []
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(frames)))
+    chunks = [[int(frame) for frame in chunk] for chunk in np.array_split(frames, workers) if len(chunk)]
+
+    drive_args = (drive.name, drive.number, str(drive.dirname))
+    if workers == 1:
+        return _render_frames(*drive_args, frames, system_prop, system_region, figs_output_dir, fig_name,
+                              three_pane_kw)[0]
+
+    # An active StageTimer gathers the timings of the workers too
+    timer = StageTimer._active
+    timer_kw = None if timer is None else {'trace_memory': timer.trace_memory}
+
+    # The workers never show anything, so they use a non-interactive backend
+    with ProcessPoolExecutor(max_workers=workers, initializer=plt.switch_backend, initargs=('Agg',)) as executor:
+        futures = [executor.submit(_render_frames, *drive_args, chunk, system_prop, system_region, figs_output_dir,
+                                   fig_name, three_pane_kw, timer_kw)
+                   for chunk in chunks]
+        written = []
+        for future in futures:
+            paths, records = future.result()
+            written.extend(paths)
+            if timer is not None:
+                timer.add(records)
+        return written
+
+
+class AnimationWriter:
+    """
+    Stream rendered figures straight into a movie, without writing any frame to disk.
+
+    Every `add_figure` renders the figure to raw RGBA in the calling thread and hands it to an encoder running in a
+    background thread, so encoding overlaps with the rendering of the next frame. The queue between them is bounded,
+    so a slow encoder holds back the rendering instead of filling the memory.
+
+    Encoders:
+        'ffmpeg': frames piped to a local `ffmpeg` (any format it writes, e.g. .mp4, .webm, .gif).
+        'pillow': GIF or APNG written by Pillow. Pillow writes these files in one go, so the encoder thread converts the
+                  frames as they come (palette quantisation for GIF) and keeps them in memory until `close`.
+
+    :param filename: Output file; its suffix selects the format.
+    :param fps: Frames per second.
+    :param dpi: Resolution of the rendered frames. Every frame must have the same size in pixels.
+    :param encoder: 'ffmpeg' or 'pillow'. Defaults to Pillow for .gif/.png/.apng and to ffmpeg otherwise.
+    :param queue_size: Largest number of rendered frames waiting for the encoder.
+    :param ffmpeg_args: Output options of ffmpeg (codec, quality, ...).
+
+    Example
+    -------
+    >>> with AnimationWriter(f'{figs_output}/driven.mp4', fps=20) as writer:
+    ...     for i in range(drive.n):
+    ...         writer.add_figure(figure.update_array(drive[i].array).fig)
+    """
+
+    _PILLOW_FORMATS = {'.gif': 'GIF', '.png': 'PNG', '.apng': 'PNG'}
+
+    def __init__(self, filename, fps=10, dpi=100, encoder=None, queue_size=8,
+                 ffmpeg_args=('-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-crf', '18')):
+        self.filename = str(filename)
+        self.fps = fps
+        self.dpi = dpi
+        self.ffmpeg_args = list(ffmpeg_args)
+
+        suffix = os.path.splitext(self.filename)[1].lower()
+        if encoder is None:
+            encoder = 'pillow' if suffix in self._PILLOW_FORMATS else 'ffmpeg'
+        if encoder == 'pillow' and suffix not in self._PILLOW_FORMATS:
+            raise ValueError(f"{PROGRAM_NAME}: Pillow only writes {', '.join(self._PILLOW_FORMATS)} animations, "
+                             f"not {suffix!r}")
+        if encoder == 'ffmpeg' and shutil.which('ffmpeg') is None:
+            raise RuntimeError(f"{PROGRAM_NAME}: ffmpeg was not found; install it or write a .gif/.apng with Pillow")
+        if encoder not in ('ffmpeg', 'pillow'):
+            raise ValueError(f"{PROGRAM_NAME}: encoder must be 'ffmpeg' or 'pillow', not {encoder!r}")
+        self.encoder = encoder
+        self._format = self._PILLOW_FORMATS.get(suffix)
+
+        self.n_frames = 0
+        self._size = None
+        self._error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._encode, name='AnimationWriter', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_figure(self, fig):
+        """Render `fig` and queue it for encoding."""
+        self._check_encoder()
+
+        buffer = io.BytesIO()
+        with _stage('savefig'):
+            fig.savefig(buffer, format='rgba', dpi=self.dpi)
+        width, height = (int(size) for size in fig.get_size_inches() * self.dpi)
+        frame = np.frombuffer(buffer.getbuffer(), dtype=np.uint8).reshape(height, width, 4)
+
+        if self._size is None:
+            self._size = (width, height)
+        elif self._size != (width, height):
+            raise ValueError(f"{PROGRAM_NAME}: frame {self.n_frames} is {width}x{height} pixels, but the animation is "
+                             f"{self._size[0]}x{self._size[1]}")
+
+        self._put(frame)
+        self.n_frames += 1
+        return self
+
+    def close(self):
+        """Wait for the encoder to finish the file, and raise its error if it failed."""
+        if self._thread.is_alive():
+            self._put(None)
+            self._thread.join()
+        self._check_encoder()
+
+    def _put(self, item):
+        # Never block on a full queue once the encoder has died
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                self._check_encoder()
+
+    def _check_encoder(self):
+        if self._error is not None:
+            raise RuntimeError(f"{PROGRAM_NAME}: encoding {self.filename} failed") from self._error
+
+    def _encode(self):
+        try:
+            if self.encoder == 'ffmpeg':
+                self._encode_ffmpeg()
+            else:
+                self._encode_pillow()
+        except BaseException as error:
+            self._error = error
+            # Release a producer waiting on the queue
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    def _frames(self):
+        while (frame := self._queue.get()) is not None:
+            yield frame
+
+    def _encode_ffmpeg(self):
+        process = None
+        try:
+            for frame in self._frames():
+                if process is None:
+                    height, width = frame.shape[:2]
+                    # yuv420p needs even sizes
+                    command = ['ffmpeg', '-y', '-loglevel', 'error',
+                               '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(self.fps),
+                               '-i', '-', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', *self.ffmpeg_args, self.filename]
+                    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+                process.stdin.write(frame.tobytes())
+        finally:
+            if process is not None:
+                process.stdin.close()
+                stderr = process.stderr.read().decode(errors='replace')
+                if process.wait() != 0:
+                    raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.strip()}")
+
+    def _encode_pillow(self):
+        images = []
+        for frame in self._frames():
+            image = Image.fromarray(frame[..., :3])
+            images.append(image.quantize(256) if self._format == 'GIF' else image)
+
+        if images:
+            images[0].save(self.filename, format=self._format, save_all=True, append_images=images[1:],
+                           duration=1000 / self.fps, loop=0)
+
+
+def render_drive_animation(drive, system_prop, system_region, filename, frames=None, fps=10, dpi=100, encoder=None,
+                           method='sample', **three_pane_kw):
+    """
+    Render the figure of `default_three_pane` for every frame of a drive straight into a movie with `AnimationWriter`.
+
+    The figure is built once (`ThreePaneFigure`) and then updated from the raw array of every frame (`update_array`),
+    while the previous frames are encoded in the background.
+
+    :param drive: `md.Drive` to render.
+    :param filename: Movie to write, e.g. 'driven.mp4' (ffmpeg) or 'driven.gif' (Pillow).
+    :param frames: Indices (or a range) of the frames to render. All the frames of the drive if None.
+    :param method: Downsampling of the planes, 'sample' or 'mean'; see `extract_plane`.
+    :param three_pane_kw: Passed on to `ThreePaneFigure` (e.g. `has_schematic=False`, `clim=(-1, 1)`).
+
+    :return: The number of frames written.
+    """
+    frames = list(range(drive.n) if frames is None else frames)
+    if not frames:
+        return 0
+
+    figure = None
+    with AnimationWriter(filename, fps=fps, dpi=dpi, encoder=encoder) as writer:
+        for frame in frames:
+            field = drive[frame]
+            if figure is None:
+                figure = ThreePaneFigure(_FrameSystem(field), system_prop, system_region, fig_name=f'{frame:04d}',
+                                         **three_pane_kw)
+            else:
+                figure.update_array(field.array, fig_name=f'{frame:04d}', method=method)
+            writer.add_figure(figure.fig)
+
+    figure.close()
+    return writer.n_frames
+
+
+@_timed('mpl_wrapper')
 def mpl_wrapper(field, ax, multiplier, scalar_resample=None, vector_resample=None, scalar_comp=None, scalar_kw=None,
-                vector_kw=None, mpl_kw=None):
+                vector_kw=None, mpl_kw=None, cache=None):
     """
     Wrapper function for plotting with Ubermag's MplField class, allowing different resampling for scalar and vector fields.
 
@@ -217,22 +1278,21 @@ def mpl_wrapper(field, ax, multiplier, scalar_resample=None, vector_resample=Non
         scalar_comp (str): The component to use for the scalar field (default is None).
         scalar_kw (dict): Keyword arguments for scalar plotting.
         vector_kw (dict): Keyword arguments for vector plotting.
+        cache (ResampleCache): Resampled fields shared with the other panes of the figure (default is a new cache, which
+            still shares the resamples between the scalar, vector and colour layers of this call).
     """
 
     if isinstance(mpl_kw, dict) and mpl_kw is not None and scalar_kw is None and vector_kw is None:
         ax.set(**mpl_kw)
         return
 
-    scalar_field = field
-    vector_field = field
-
-    # Resample scalar field if needed
-    if scalar_resample:
-        scalar_field = scalar_field.resample(scalar_resample)
+    if cache is None:
+        cache = ResampleCache()
 
-    # Resample vector field if needed
-    if vector_resample:
-        vector_field = vector_field.resample(vector_resample)
+    # Resample the fields if needed; layers with the same shape share one resample
+    with _stage('resample'):
+        scalar_field = cache.get(field, resample=scalar_resample)
+        vector_field = cache.get(field, resample=vector_resample)
 
     # Select scalar component if specified
     if scalar_comp:
@@ -243,10 +1303,15 @@ def mpl_wrapper(field, ax, multiplier, scalar_resample=None, vector_resample=Non
         scalar_kw = {}
     if vector_kw is None:
         vector_kw = {}
+    if vector_kw.get('color_field') is not None:
+        with _stage('resample'):
+            vector_kw = {**vector_kw, 'color_field': cache.get(vector_kw['color_field'], resample=vector_field.mesh.n)}
 
     # Call the MplField class
-    scalar_field.mpl.scalar(ax=ax, multiplier=multiplier, **scalar_kw)
-    vector_field.mpl.vector(ax=ax, multiplier=multiplier, **vector_kw)
+    with _stage('scalar'):
+        scalar_field.mpl.scalar(ax=ax, multiplier=multiplier, **scalar_kw)
+    with _stage('vector'):
+        vector_field.mpl.vector(ax=ax, multiplier=multiplier, **vector_kw)
 
     # Set matplotlib params
     if mpl_kw is None:
@@ -255,6 +1320,7 @@ def mpl_wrapper(field, ax, multiplier, scalar_resample=None, vector_resample=Non
     ax.set(**mpl_kw)
 
 
+@_timed('rotate_in_place')
 def rotate_in_place(ax, system_dims, rotate=True, ax_kw=None, xaxis_kw=None, yaxis_kw=None):
     if rotate:
         # Rotate and update image
@@ -312,6 +1378,7 @@ def rotate_in_place(ax, system_dims, rotate=True, ax_kw=None, xaxis_kw=None, yax
                 break
 
 
+@_timed('alter_colorbar')
 def alter_colorbar(ax, target_type='imshow', cbar_imshow_kw=None, cbar_quiver_kw=None,
                    cbar_xaxis_kw=None, cbar_yaxis_kw=None, insert_invisible_cbar=False):
     fig = ax.figure
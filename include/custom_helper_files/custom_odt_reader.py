@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import logging as lg
+import os as os
+import re
+
+# 3rd Party packages
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from ubermagtable.util.util import oommf_dict, rename_column
+
+# My packages/Header files
+# Here
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Reading an `.odt` table through `md.Drive(...).table` parses every column of the file, even when only `t` is needed
+(e.g. `m_all_data.table.data.t[0]` for the step size). For long runs with many energy terms this is slow. The reader
+in this file parses the header once, only converts the requested columns (streaming the rows in blocks), and caches
+the parsed columns in a binary `.npz` next to the `.odt`; so later reads of those columns skip the text parsing.
+
+Columns can be requested by their full OOMMF name (`Oxs_TimeDriver::Simulation time`) or by the short names used by
+`md.Drive(...).table.data` (`t`, `mx`, `E`, `E_exchange`, ...).
+"""
+PROGRAM_NAME = "custom_odt_reader.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+__all__ = [
+    "OdtTable",
+    "read_odt",
+    "odt_header"
+]
+
+
+# ---------------------------- Function Declarations ---------------------------
+
+def loggingSetup():
+    """
+    Minimum Working Example (MWE) for logging. Pre-defined levels are:
+
+        Highest               ---->            Lowest
+        CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET
+    """
+    today_date = datetime.now().strftime("%y%m%d")
+    current_time = datetime.now().strftime("%H%M")
+
+    lg.basicConfig(filename=f'./{today_date}-{current_time}.log',
+                   filemode='w',
+                   level=lg.INFO,
+                   format='%(asctime)s | %(module)s::%(funcName)s | %(levelname)s | %(message)s',
+                   datefmt='%Y-%m-%d %H:%M:%S',
+                   force=True)
+
+
+# ------------------------------ Implementations ------------------------------
+
+# Header entries are either `{names with spaces}` or single words
+_HEADER_ENTRY = re.compile(r'\{[^}]*\}|\S+')
+# Prefixes which `ubermagtable` removes before renaming the columns
+_OOMMF_PREFIXES = re.compile(r'^(Oxs_|Anv_|Southampton_|My_|YY_|UHH_|Xf_)')
+
+_CACHE_SUFFIX = '.cache.npz'
+
+
+def _split_header(line):
+    return [entry.strip('{}') for entry in _HEADER_ENTRY.findall(line.split(':', 1)[1])]
+
+
+def _find_odt(path):
+    """Allow a drive directory to be passed instead of the `.odt` file itself."""
+    if not os.path.isdir(path):
+        return path
+
+    odt_files = [f for f in os.listdir(path) if f.endswith('.odt')]
+    if len(odt_files) != 1:
+        raise FileNotFoundError(f"Expected one .odt file in {path}; found {len(odt_files)}")
+    return os.path.join(path, odt_files[0])
+
+
+def odt_header(path):
+    """
+    Parse the header of an `.odt` file.
+
+    :return: (columns, units, short_names); lists in file order. `short_names` are the names `md.Drive().table.data`
+             uses for the same columns.
+    """
+    columns, units = None, None
+    with open(_find_odt(path)) as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            if line.startswith('# Columns:'):
+                columns = _split_header(line)
+            elif line.startswith('# Units:'):
+                units = _split_header(line)
+            if columns is not None and units is not None:
+                break
+
+    if columns is None:
+        raise ValueError(f"No '# Columns:' line in the header of {path}")
+    if units is None:
+        units = [''] * len(columns)
+
+    short_names = [rename_column(_OOMMF_PREFIXES.sub('', column), oommf_dict) for column in columns]
+    return columns, units, short_names
+
+
+class OdtTable:
+    """
+    Columns of an `.odt` file, as 1D numpy arrays. Only the columns passed to `read_odt` are loaded.
+
+    Index with either the full or the short column name: `table['t']`, `table['Oxs_TimeDriver::Simulation time']`.
+    """
+
+    def __init__(self, path, columns, units, short_names, data):
+        self.path = path
+        self.columns = columns
+        self.units = dict(zip(columns, units))
+        self.short_names = dict(zip(columns, short_names))
+        self.data = data
+
+    def resolve(self, name):
+        """Full OOMMF column name for a full or short `name`."""
+        if name in self.short_names:
+            return name
+
+        matches = [column for column, short in self.short_names.items() if short == name]
+        if len(matches) == 1:
+            return matches[0]
+        if len(matches) > 1:
+            raise KeyError(f"Column name '{name}' is ambiguous; use one of {matches}")
+        raise KeyError(f"No column '{name}' in {self.path}. Available: {list(self.short_names.values())}")
+
+    def __getitem__(self, name):
+        column = self.resolve(name)
+        if column not in self.data:
+            raise KeyError(f"Column '{name}' was not loaded; pass it to `read_odt(columns=...)`")
+        return self.data[column]
+
+    def __contains__(self, name):
+        try:
+            return self.resolve(name) in self.data
+        except KeyError:
+            return False
+
+    def __repr__(self):
+        return f"OdtTable({os.path.basename(self.path)}, loaded={[self.short_names[c] for c in self.data]})"
+
+    def to_dataframe(self, short_names=True):
+        """Loaded columns as a `pd.DataFrame`; named like `md.Drive().table.data` if `short_names`."""
+        return pd.DataFrame({self.short_names[column] if short_names else column: values
+                             for column, values in self.data.items()})
+
+
+def _load_cache(odt_path):
+    """Cached columns, if the cache was written for the current version of the `.odt` file."""
+    cache_path = odt_path + _CACHE_SUFFIX
+    if not os.path.exists(cache_path):
+        return {}
+
+    stat = os.stat(odt_path)
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if cache['__size__'] != stat.st_size or cache['__mtime_ns__'] != stat.st_mtime_ns:
+                return {}
+            names = [str(name) for name in cache['__columns__']]
+            return {name: cache[f'col{i}'] for i, name in enumerate(names)}
+    except (OSError, KeyError, ValueError):
+        lg.warning(f"{PROGRAM_NAME}: ignoring unreadable cache {cache_path}")
+        return {}
+
+
+def _save_cache(odt_path, data):
+    stat = os.stat(odt_path)
+    cache_path = odt_path + _CACHE_SUFFIX
+    arrays = {f'col{i}': values for i, values in enumerate(data.values())}
+
+    # Write to a temporary file first, so an interrupted write never leaves a broken cache
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(tmp_path, __columns__=np.array(list(data.keys())), __size__=stat.st_size,
+             __mtime_ns__=stat.st_mtime_ns, **arrays)
+    os.replace(tmp_path, cache_path)
+
+
+def _parse_columns(odt_path, indices, block_rows):
+    """Parse only the columns at `indices`, `block_rows` rows at a time."""
+    blocks = [block.to_numpy()
+              for block in pd.read_csv(odt_path, sep=r'\s+', comment='#', header=None, usecols=indices,
+                                       dtype=np.float64, engine='c', chunksize=block_rows)]
+    if blocks:
+        values = np.concatenate(blocks, axis=0)
+    else:
+        values = np.empty((0, len(indices)))
+
+    # `usecols` returns the columns in file order
+    return {index: values[:, i] for i, index in enumerate(sorted(indices))}
+
+
+def read_odt(path, columns=None, block_rows=100_000, use_cache=True):
+    """
+    Read the requested columns of an `.odt` file.
+
+    :param path: `.odt` file, or a drive directory containing one.
+    :param columns: Full or short (`md.Drive().table.data`) column names. All columns if None.
+    :param block_rows: Number of rows converted at a time; bounds the memory used while parsing long tables.
+    :param use_cache: Read/update the binary cache (`<file>.odt.cache.npz`) of the parsed columns.
+
+    :return: OdtTable with the requested columns loaded.
+
+    Example
+    -------
+    >>> table = read_odt(data_output + f'/drive-{m_all_data.number}', columns=['t'])
+    >>> stepsize = table['t'][0]
+    """
+    odt_path = _find_odt(path)
+    all_columns, units, short_names = odt_header(odt_path)
+    table = OdtTable(odt_path, all_columns, units, short_names, {})
+
+    if columns is None:
+        wanted = list(all_columns)
+    else:
+        wanted = [table.resolve(name) for name in columns]
+
+    cached = _load_cache(odt_path) if use_cache else {}
+    missing = [column for column in wanted if column not in cached]
+
+    if missing:
+        parsed = _parse_columns(odt_path, [all_columns.index(column) for column in missing], block_rows)
+        cached.update({all_columns[index]: values for index, values in parsed.items()})
+        if use_cache:
+            _save_cache(odt_path, cached)
+
+    table.data = {column: cached[column] for column in wanted}
+    return table
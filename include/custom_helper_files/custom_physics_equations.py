@@ -5,7 +5,7 @@
 # Standard Libraries
 import logging as lg
 # import os as os
-from sys import exit
+from functools import lru_cache
 
 # 3rd Party packages
 from datetime import datetime
@@ -89,58 +89,85 @@ def gilbert_pbc_exponential_grad(pos, alpha, system_prop, system_subregions) ->
         return alpha
 
 
-def calculate_demag_factor_uniform_prism(length, width, thickness, alignment='z'):
-    demag_factors = {'N_x': -1, 'N_y': -1, 'N_z': -1}
+def _demag_factor_prism(a, b, c):
+    """
+    Demagnetising factor along the edge `c` of a rectangular prism with edges (a, b, c) [Aharoni, J. Appl. Phys. 83,
+    3432 (1998)]. Works elementwise on arrays; the square roots shared by the terms are computed once.
+    """
+    a2, b2, c2 = a ** 2, b ** 2, c ** 2
+    abc = a * b * c
 
-    def _calculate_demag_factor(a, b, c):
-        r = a**2 + b**2 + c**2
+    r = np.sqrt(a2 + b2 + c2)
+    r_ab = np.sqrt(a2 + b2)
+    r_bc = np.sqrt(b2 + c2)
+    r_ac = np.sqrt(a2 + c2)
 
-        demag_factor = ((b ** 2 - c ** 2) / (2 * b * c)) * np.log((np.sqrt(r) - a)
-                                                                  / (np.sqrt(r) + a))
+    demag_factor = ((b2 - c2) / (2 * b * c)) * np.log((r - a) / (r + a))
+    demag_factor += ((a2 - c2) / (2 * a * c)) * np.log((r - b) / (r + b))
+    demag_factor += (b / (2 * c)) * np.log((r_ab + a) / (r_ab - a))
+    demag_factor += (a / (2 * c)) * np.log((r_ab + b) / (r_ab - b))
+    demag_factor += (c / (2 * a)) * np.log((r_bc - b) / (r_bc + b))
+    demag_factor += (c / (2 * b)) * np.log((r_ac - a) / (r_ac + a))
+    demag_factor += 2 * np.arctan((a * b) / (c * r))
+    demag_factor += (a ** 3 + b ** 3 - 2 * c ** 3) / (3 * abc)
+    demag_factor += ((a2 + b2 - 2 * c2) / (3 * abc)) * r
+    demag_factor += (c / (a * b)) * (r_ac + r_bc)
+    demag_factor -= (r_ab ** 3 + r_bc ** 3 + r_ac ** 3) / (3 * abc)
 
-        demag_factor += ((a ** 2 - c ** 2) / (2 * a * c)) * np.log((np.sqrt(r) - b)
-                                                                   / (np.sqrt(r) + b))
+    return demag_factor / np.pi
 
-        demag_factor += (b / (2 * c)) * np.log((np.sqrt(a ** 2 + b ** 2) + a)
-                                               / (np.sqrt(a ** 2 + b ** 2) - a))
 
-        demag_factor += (a / (2 * c)) * np.log((np.sqrt(a ** 2 + b ** 2) + b)
-                                               / (np.sqrt(a ** 2 + b ** 2) - b))
+# Axis of the `thickness` -> axes (x, y, z) of (length, width, thickness); the length and width take the next axes
+# cyclically, so 'z' is the usual film in the x-y plane
+_PRISM_ALIGNMENTS = {'X': (1, 2, 0), 'Y': (2, 0, 1), 'Z': (0, 1, 2)}
 
-        demag_factor += (c / (2 * a)) * np.log((np.sqrt(b ** 2 + c ** 2) - b)
-                                               / (np.sqrt(b ** 2 + c ** 2) + b))
 
-        demag_factor += (c / (2 * b)) * np.log((np.sqrt(a ** 2 + c ** 2) - a)
-                                               / (np.sqrt(a ** 2 + c ** 2) + a))
+def _demag_factors(length, width, thickness, alignment):
+    if alignment.upper() not in _PRISM_ALIGNMENTS:
+        raise ValueError(f"{PROGRAM_NAME} -> calculate_demag_factor_uniform_prism: unknown alignment "
+                         f"'{alignment}'; use one of 'x', 'y' or 'z'")
 
-        demag_factor += 2 * np.arctan((a * b) / (c * np.sqrt(r)))
+    dims = [None, None, None]
+    for axis, edge in zip(_PRISM_ALIGNMENTS[alignment.upper()], (length, width, thickness)):
+        dims[axis] = edge
+    dx, dy, dz = dims
 
-        demag_factor += (a ** 3 + b ** 3 - 2 * c ** 3) / (3 * a * b * c)
+    demag_factors = {'N_x': _demag_factor_prism(dy, dz, dx),
+                     'N_y': _demag_factor_prism(dz, dx, dy),
+                     'N_z': _demag_factor_prism(dx, dy, dz)}
 
-        demag_factor += ((a ** 2 + b ** 2 - 2 * c ** 2) / (3 * a * b * c)) * np.sqrt(r)
+    N_total = demag_factors['N_x'] + demag_factors['N_y'] + demag_factors['N_z']
+    if np.any(N_total >= 1 + 1e-4):
+        raise ValueError(f"{PROGRAM_NAME} -> calculate_demag_factor_uniform_prism: the demagnetising factors sum to "
+                         f"{np.max(N_total)} > 1 for (length, width, thickness) = ({length}, {width}, {thickness})")
 
-        demag_factor += (c / (a * b)) * (np.sqrt(a ** 2 + c ** 2) + np.sqrt(b ** 2 + c ** 2))
+    return demag_factors
 
-        demag_factor -= ((np.power((a ** 2 + b ** 2), 3 / 2) + np.power((b ** 2 + c ** 2), 3 / 2) + np.power(
-            (c ** 2 + a ** 2), 3 / 2))
-                         / (3 * a * b * c))
 
-        demag_factor /= np.pi
+@lru_cache(maxsize=256)
+def _cached_demag_factors(length, width, thickness, alignment):
+    return _demag_factors(length, width, thickness, alignment)
 
-        return demag_factor
 
-    if alignment.upper() == 'Z':
-        demag_factors['N_z'] = _calculate_demag_factor(length, width, thickness)
-        demag_factors['N_y'] = _calculate_demag_factor(thickness, length, width)
-        demag_factors['N_x'] = _calculate_demag_factor(width, thickness, length)
-    else:
-        raise ("custom_physics_equations.py -> calculate_demag_factor_uniform_prism -> _calculate_demag_factor: "
-               "Unknown parameter [alignment] was passed")
+def calculate_demag_factor_uniform_prism(length, width, thickness, alignment='z'):
+    """
+    Demagnetising factors {'N_x', 'N_y', 'N_z'} of a uniformly magnetised rectangular prism.
 
-    N_total = 0
-    for k, v in demag_factors.items():
-        N_total += v
-    if N_total >= 1 + 1e-4:
-        exit(1)
+    :param length: Edge along x (for alignment 'z').
+    :param width: Edge along y (for alignment 'z').
+    :param thickness: Edge along the `alignment` axis.
+    :param alignment: Axis ('x', 'y' or 'z') of the thickness. The length and width take the following axes
+                      cyclically.
 
-    return demag_factors
+    Scalar dimensions are cached (LRU) as the same geometry is evaluated for every dispersion relation. Arrays of
+    dimensions are broadcast together, and each factor is then an array.
+
+    :raises ValueError: For an unknown `alignment`, or if the factors sum to more than 1.
+    """
+    if all(np.ndim(edge) == 0 for edge in (length, width, thickness)):
+        # A copy, so callers can't change the cached factors
+        return dict(_cached_demag_factors(float(length), float(width), float(thickness), alignment))
+
+    length, width, thickness = np.broadcast_arrays(*(np.asarray(edge, dtype=float)
+                                                     for edge in (length, width, thickness)))
+    return _demag_factors(length, width, thickness, alignment)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import logging as lg
+import os as os
+
+# 3rd Party packages
+from datetime import datetime
+
+import numpy as np
+
+# My packages/Header files
+# Here
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Extraction of the dispersion branches ω(k) from a dispersion map |F(f, k)| (e.g. the `--get_data` output of
+`process_data.py`). Instead of comparing the simulated spectra against `Omega_generalised_with_ua` by eye, the
+branches are returned as (k, f, amplitude) arrays which can be compared or fitted directly.
+
+For every k column the local maxima along f are found at once (vectorised over all the columns), refined to sub-bin
+precision with a parabola through the three bins around each maximum, and then linked from column to column into
+continuous branches.
+"""
+PROGRAM_NAME = "custom_spectral_ridges.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+__all__ = [
+    "Ridge",
+    "column_peaks",
+    "extract_ridges",
+    "load_spectrum"
+]
+
+
+# ---------------------------- Function Declarations ---------------------------
+
+def loggingSetup():
+    """
+    Minimum Working Example (MWE) for logging. Pre-defined levels are:
+
+        Highest               ---->            Lowest
+        CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET
+    """
+    today_date = datetime.now().strftime("%y%m%d")
+    current_time = datetime.now().strftime("%H%M")
+
+    lg.basicConfig(filename=f'./{today_date}-{current_time}.log',
+                   filemode='w',
+                   level=lg.INFO,
+                   format='%(asctime)s | %(module)s::%(funcName)s | %(levelname)s | %(message)s',
+                   datefmt='%Y-%m-%d %H:%M:%S',
+                   force=True)
+
+
+# ------------------------------ Implementations ------------------------------
+
+class Ridge:
+    """
+    One dispersion branch: the wavevectors `k`, the (sub-bin) frequencies `f` of the peak in each k column, and the
+    spectrum `amplitude` at the peak. Columns where the branch was lost are left out.
+    """
+
+    def __init__(self, k, f, amplitude):
+        self.k = np.asarray(k)
+        self.f = np.asarray(f)
+        self.amplitude = np.asarray(amplitude)
+
+    def __len__(self):
+        return len(self.k)
+
+    def __repr__(self):
+        if not len(self):
+            return "Ridge(empty)"
+        return f"Ridge({len(self)} points, k=[{self.k.min():.4g}, {self.k.max():.4g}])"
+
+    def to_array(self):
+        """(n, 3) array of (k, f, amplitude) rows."""
+        return np.column_stack((self.k, self.f, self.amplitude))
+
+    def save(self, filename):
+        np.savetxt(filename, self.to_array(), header='k f amplitude')
+
+
+def load_spectrum(name):
+    """
+    Load the spectrum saved by `process_data.py --get_data name`.
+
+    :return: (spectrum, freqs, ks); spectrum has one row per frequency and one column per wavevector.
+    """
+    if os.path.exists(name + '.npy'):
+        spectrum = np.load(name + '.npy', mmap_mode='r')
+    else:
+        spectrum = np.loadtxt(name + '.dat')
+    return spectrum, np.loadtxt(name + '_freqs.dat'), np.loadtxt(name + '_ks.dat')
+
+
+def column_peaks(spectrum, freqs, n_peaks=3, threshold=None, interpolate=True):
+    """
+    The `n_peaks` strongest local maxima along f of every k column, found for all the columns at once.
+
+    :param spectrum: (n_f, n_k) map. Non finite values (e.g. log10(0)) are ignored.
+    :param freqs: (n_f,) evenly spaced frequencies of the rows.
+    :param n_peaks: Number of candidate peaks kept per column.
+    :param threshold: Peaks below this value of the spectrum are discarded.
+    :param interpolate: Refine every peak with a parabola through the bins around it.
+
+    :return: (f, amplitude) arrays of shape (n_peaks, n_k), strongest peak first. Missing peaks are NaN.
+    """
+    spectrum = np.where(np.isfinite(spectrum), spectrum, -np.inf)
+    n_f, n_k = spectrum.shape
+    n_peaks = min(n_peaks, max(n_f - 2, 1))
+
+    # Local maxima of the interior rows
+    below, centre, above = spectrum[:-2], spectrum[1:-1], spectrum[2:]
+    is_peak = (centre > below) & (centre >= above) & np.isfinite(centre)
+    if threshold is not None:
+        is_peak &= centre >= threshold
+    candidates = np.where(is_peak, centre, -np.inf)
+
+    # The strongest n_peaks per column, sorted
+    top = np.argpartition(-candidates, n_peaks - 1, axis=0)[:n_peaks]
+    order = np.argsort(-np.take_along_axis(candidates, top, axis=0), axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    found = np.isfinite(np.take_along_axis(candidates, top, axis=0))
+
+    rows = top + 1
+    b = np.take_along_axis(spectrum, rows, axis=0)
+    delta = np.zeros(b.shape)
+    if interpolate:
+        a = np.take_along_axis(spectrum, rows - 1, axis=0)
+        c = np.take_along_axis(spectrum, rows + 1, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curvature = a - 2 * b + c
+            delta = np.where((curvature < 0) & np.isfinite(a) & np.isfinite(c), 0.5 * (a - c) / curvature, 0.)
+        delta = np.clip(delta, -0.5, 0.5)
+        b = np.where(delta != 0, b - 0.25 * (a - c) * delta, b)
+
+    df = freqs[1] - freqs[0]
+    f = freqs[rows] + delta * df
+    f = np.where(found, f, np.nan)
+    amplitude = np.where(found, b, np.nan)
+    return f, amplitude
+
+
+def _seed(f, free, tolerance):
+    """
+    Column to start a branch from: of the columns whose strongest free peak is within `tolerance` (a fraction of the
+    spread of the column maxima) of the strongest one, the one where the branch of that peak is the flattest. Near-tied
+    maxima are common (a uniform ridge), and on a steep part of the branch the first steps, which have no slope to
+    extrapolate with yet, are the most likely to miss it.
+    """
+    n_k = f.shape[1]
+    masked = np.where(np.isnan(free), -np.inf, free)
+    strength = masked.max(axis=0)
+    finite = np.isfinite(strength)
+    top, bottom = strength[finite].max(), strength[finite].min()
+    candidates = finite & (strength >= top - tolerance * (top - bottom))
+
+    # Local slope: distance to the closest peak (of any branch) in the neighbouring columns, the larger of both sides
+    peak_f = f[masked.argmax(axis=0), np.arange(n_k)]
+    slope = np.zeros(n_k)
+    for shift in (1, -1):
+        neighbours = np.roll(f, shift, axis=1)
+        with np.errstate(invalid='ignore'):
+            distance = np.nanmin(np.where(np.isnan(neighbours), np.inf, np.abs(neighbours - peak_f)), axis=0)
+        distance[0 if shift == 1 else -1] = 0.
+        slope = np.maximum(slope, distance)
+
+    return int(np.argmin(np.where(candidates, slope, np.inf)))
+
+
+def _track(f, amplitude, seed, max_jump, max_gap, used):
+    """
+    Follow one branch from the column `seed` to both ends of the map. In every column the unused candidate closest
+    to the frequency extrapolated from the previous points is taken, if it is within `max_jump`. The branch ends after
+    `max_gap` consecutive columns without one, rather than being extrapolated until it meets another branch.
+    """
+    n_peaks, n_k = f.shape
+    branch = np.full(n_k, -1)
+    branch[seed] = np.nanargmax(np.where(used[:, seed], np.nan, amplitude[:, seed]))
+
+    for step in (1, -1):
+        history = [(seed, f[branch[seed], seed])]
+        column = seed + step
+        while 0 <= column < n_k and abs(column - history[-1][0]) <= max_gap + 1:
+            # Linear extrapolation from the last two points of the branch, across the columns missed since
+            predicted = history[-1][1]
+            if len(history) > 1:
+                (c0, f0), (c1, f1) = history[-2:]
+                predicted = f1 + (f1 - f0) / (c1 - c0) * (column - c1)
+            distance = np.abs(f[:, column] - predicted)
+            distance[used[:, column] | np.isnan(distance)] = np.inf
+            best = np.argmin(distance)
+            if distance[best] <= max_jump:
+                branch[column] = best
+                history.append((column, f[best, column]))
+            column += step
+
+    return branch
+
+
+def extract_ridges(spectrum, freqs, ks, n_branches=1, f_range=None, k_range=None, threshold=None, max_jump=None,
+                   min_length=5, interpolate=True, max_gap=3, seed_tolerance=0.5):
+    """
+    Extract the dominant dispersion branches of a dispersion map.
+
+    :param spectrum: (n_f, n_k) map, e.g. from `load_spectrum`. Rows are the (increasing) `freqs` and columns the
+                     (increasing) `ks`.
+    :param freqs: Frequencies of the rows.
+    :param ks: Wavevectors of the columns.
+    :param n_branches: Number of branches to extract, strongest first.
+    :param f_range: (f_min, f_max) searched. Defaults to the positive frequencies (the map of real data is symmetric).
+    :param k_range: (k_min, k_max) searched. The whole map if None.
+    :param threshold: Peaks below this value of the spectrum are ignored.
+    :param max_jump: Largest distance of a point from the frequency extrapolated from the branch. Defaults to 5
+                     frequency bins.
+    :param min_length: Branches with fewer points are dropped.
+    :param interpolate: Sub-bin refinement of the peak frequencies.
+    :param max_gap: A branch ends after this many consecutive columns without a point within `max_jump`.
+    :param seed_tolerance: Columns whose strongest peak is within this fraction (of the spread of the column maxima)
+                           of the strongest one count as tied; a branch starts from the flattest of them.
+
+    :return: List of `Ridge`, sorted by the strength of their strongest point.
+
+    Example
+    -------
+    >>> spectrum, freqs, ks = load_spectrum('spectra_log10')
+    >>> ridge = extract_ridges(spectrum, freqs, ks, f_range=(1, 30), k_range=(-0.25, 0.25))[0]
+    >>> ridge.k, ridge.f  # Feed to the fitting of `Omega_generalised_with_ua`
+    """
+    freqs, ks = np.asarray(freqs), np.asarray(ks)
+    if f_range is None:
+        f_range = (0, np.inf)
+    if k_range is None:
+        k_range = (-np.inf, np.inf)
+
+    rows = np.flatnonzero((freqs > f_range[0]) & (freqs <= f_range[1]))
+    cols = np.flatnonzero((ks >= k_range[0]) & (ks <= k_range[1]))
+    if len(rows) < 3 or not len(cols):
+        raise ValueError(f"{PROGRAM_NAME}: the f_range and k_range select an empty part of the spectrum")
+
+    # Only the selected block is read (also for memory mapped spectra)
+    block = np.asarray(spectrum[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], dtype=float)
+    freqs, ks = freqs[rows[0]:rows[-1] + 1], ks[cols[0]:cols[-1] + 1]
+
+    if max_jump is None:
+        max_jump = 5 * (freqs[1] - freqs[0])
+
+    f, amplitude = column_peaks(block, freqs, n_peaks=2 * n_branches + 1, threshold=threshold,
+                                interpolate=interpolate)
+    used = np.isnan(f)
+
+    ridges = []
+    for _ in range(n_branches):
+        free = np.where(used, np.nan, amplitude)
+        if np.all(np.isnan(free)):
+            break
+        seed = _seed(f, free, seed_tolerance)
+        branch = _track(f, amplitude, seed, max_jump, max_gap, used)
+
+        columns = np.flatnonzero(branch >= 0)
+        used[branch[columns], columns] = True
+        if len(columns) < min_length:
+            lg.info(f"{PROGRAM_NAME}: dropped a branch of {len(columns)} points")
+            continue
+        ridges.append(Ridge(ks[columns], f[branch[columns], columns], amplitude[branch[columns], columns]))
+
+    return ridges
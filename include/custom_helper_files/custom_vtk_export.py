@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import logging as lg
+import os as os
+from concurrent.futures import ProcessPoolExecutor
+
+# 3rd Party packages
+from datetime import datetime
+
+import micromagneticdata as md
+import numpy as np
+
+# My packages/Header files
+# Here
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Export of drive snapshots to VTK for ParaView (or Mayavi). `md.Drive.ovf2vtk` converts one frame after another through
+a `df.Field` and legacy `.vtk` files. Here every frame is written straight from its (nx, ny, nz, 3) array as a VTK
+XML image (`.vti`) with its data appended as raw binary, across a process pool, and a `.pvd` collection indexes the
+frames by their time so ParaView opens the whole drive as one time series.
+"""
+PROGRAM_NAME = "custom_vtk_export.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+__all__ = [
+    "write_vti",
+    "write_pvd",
+    "export_drive_vti"
+]
+
+
+# ---------------------------- Function Declarations ---------------------------
+
+def loggingSetup():
+    """
+    Minimum Working Example (MWE) for logging. Pre-defined levels are:
+
+        Highest               ---->            Lowest
+        CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET
+    """
+    today_date = datetime.now().strftime("%y%m%d")
+    current_time = datetime.now().strftime("%H%M")
+
+    lg.basicConfig(filename=f'./{today_date}-{current_time}.log',
+                   filemode='w',
+                   level=lg.INFO,
+                   format='%(asctime)s | %(module)s::%(funcName)s | %(levelname)s | %(message)s',
+                   datefmt='%Y-%m-%d %H:%M:%S',
+                   force=True)
+
+
+# ------------------------------ Implementations ------------------------------
+
+_VTK_TYPES = {np.dtype('<f4'): 'Float32', np.dtype('<f8'): 'Float64'}
+
+
+def write_vti(path, arrays, origin, spacing):
+    """
+    Write cell data on a regular grid as a VTK XML image (`.vti`) with raw binary appended data.
+
+    :param path: File to write.
+    :param arrays: {name: (nx, ny, nz) or (nx, ny, nz, n_components) array} of the cells, e.g. {'m': field.array}.
+                   Every array must have the same (nx, ny, nz); float32 arrays are written as such, anything else as
+                   float64.
+    :param origin: (x, y, z) of the corner of the first cell, e.g. `field.mesh.region.pmin`.
+    :param spacing: (dx, dy, dz) of the cells, e.g. `field.mesh.cell`.
+    """
+    n_cells = None
+    blocks = []
+    for name, values in arrays.items():
+        values = np.asarray(values)
+        if n_cells is None:
+            n_cells = values.shape[:3]
+        elif values.shape[:3] != n_cells:
+            raise ValueError(f"{PROGRAM_NAME}: '{name}' has {values.shape[:3]} cells, but the grid has {n_cells}")
+
+        dtype = np.dtype('<f4') if values.dtype == np.float32 else np.dtype('<f8')
+        # VTK orders the cells with x varying fastest, and the components of a cell together
+        n_components = values.shape[3] if values.ndim == 4 else 1
+        data = np.ascontiguousarray(np.moveaxis(values.reshape(*n_cells, n_components), (0, 1, 2), (2, 1, 0)),
+                                    dtype=dtype)
+        blocks.append((name, n_components, data))
+
+    extent = ' '.join(f'0 {n}' for n in n_cells)
+    origin, spacing = (' '.join(repr(float(value)) for value in values) for values in (origin, spacing))
+    vectors = f' Vectors="{blocks[0][0]}"' if blocks[0][1] == 3 else ''
+    header = ['<?xml version="1.0"?>',
+              '<VTKFile type="ImageData" version="1.0" byte_order="LittleEndian" header_type="UInt64">',
+              f'  <ImageData WholeExtent="{extent}" Origin="{origin}" Spacing="{spacing}">',
+              f'    <Piece Extent="{extent}">',
+              f'      <CellData{vectors}>']
+    offset = 0
+    for name, n_components, data in blocks:
+        header.append(f'        <DataArray type="{_VTK_TYPES[data.dtype]}" Name="{name}" '
+                      f'NumberOfComponents="{n_components}" format="appended" offset="{offset}"/>')
+        offset += 8 + data.nbytes
+    header += ['      </CellData>',
+               '    </Piece>',
+               '  </ImageData>',
+               '  <AppendedData encoding="raw">']
+
+    with open(path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n   _').encode())
+        for _, _, data in blocks:
+            f.write(np.uint64(data.nbytes).tobytes())
+            data.tofile(f)
+        f.write(b'\n  </AppendedData>\n</VTKFile>\n')
+
+
+def write_pvd(path, files, times):
+    """Write a `.pvd` collection of `files` (paths relative to the `.pvd`) at `times`, for ParaView."""
+    lines = ['<?xml version="1.0"?>',
+             '<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">',
+             '  <Collection>']
+    lines += [f'    <DataSet timestep="{float(time)!r}" group="" part="0" file="{file}"/>'
+              for file, time in zip(files, times)]
+    lines += ['  </Collection>',
+              '</VTKFile>']
+
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _export_frames(drive_name, drive_number, drive_dirname, frames, paths, name, dtype, multiplier):
+    """Worker of `export_drive_vti`: load and write only `frames` of the drive."""
+    drive = md.Drive(name=drive_name, number=drive_number, dirname=drive_dirname)
+
+    for frame, path in zip(frames, paths):
+        field = drive[frame]
+        write_vti(path, {name: field.array.astype(dtype, copy=False)},
+                  origin=np.asarray(field.mesh.region.pmin) / multiplier,
+                  spacing=np.asarray(field.mesh.cell) / multiplier)
+
+    return len(frames)
+
+
+def _frame_times(drive, frames):
+    """Simulation time of every frame from the drive table; the frame indices if the drive has no times."""
+    try:
+        times = drive.table.data['t'].to_numpy()
+    except (KeyError, AttributeError, FileNotFoundError):
+        times = None
+
+    if times is None or len(times) != drive.n:
+        return [float(frame) for frame in frames]
+    return [float(times[frame]) for frame in frames]
+
+
+def export_drive_vti(drive, output_dir, frames=None, prefix=None, name='m', dtype=np.float32, multiplier=1.,
+                     workers=None):
+    """
+    Export the magnetisation of every frame of a drive as `.vti` files, indexed by a `.pvd` time series.
+
+    The frames are split into one contiguous chunk per worker; each worker opens the drive itself and writes the frames
+    of its chunk straight from their arrays (see `write_vti`). Frame i is written as `<prefix>_<i:04d>.vti` and the
+    collection as `<prefix>.pvd`; open the latter in ParaView to step through the drive.
+
+    :param drive: `md.Drive` to export.
+    :param output_dir: Directory to write to; created if needed.
+    :param frames: Indices (or a range) of the frames to export. All the frames of the drive if None.
+    :param prefix: Stem of the files. Defaults to `drive-<N>`.
+    :param name: Name of the vector array in the files.
+    :param dtype: np.float32 (half the size, enough for a normalised or Ms-sized magnetisation) or np.float64.
+    :param multiplier: Coordinates are divided by it, e.g. 1e-9 to work in nm in ParaView.
+    :param workers: Number of processes. Defaults to the number of cores.
+
+    :return: Path of the `.pvd`.
+
+    Example
+    -------
+    >>> drive = md.Drive(name=system.name, dirname=data_output, number=system.drive_number - 1)
+    >>> cvtk.export_drive_vti(drive, data_output + '/vti', multiplier=1e-9)
+    """
+    frames = [int(frame) for frame in (range(drive.n) if frames is None else frames)]
+    prefix = f'drive-{drive.number}' if prefix is None else prefix
+    os.makedirs(output_dir, exist_ok=True)
+
+    files = [f'{prefix}_{frame:04d}.vti' for frame in frames]
+    paths = [os.path.join(output_dir, file) for file in files]
+
+    if frames:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(frames)))
+        chunks = [chunk for chunk in np.array_split(np.arange(len(frames)), workers) if len(chunk)]
+
+        drive_args = (drive.name, drive.number, str(drive.dirname))
+        export_args = (name, dtype, multiplier)
+        if workers == 1:
+            _export_frames(*drive_args, frames, paths, *export_args)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_export_frames, *drive_args, [frames[i] for i in chunk],
+                                           [paths[i] for i in chunk], *export_args)
+                           for chunk in chunks]
+                for future in futures:
+                    future.result()
+
+    pvd_path = os.path.join(output_dir, f'{prefix}.pvd')
+    write_pvd(pvd_path, files, _frame_times(drive, frames))
+    return pvd_path
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+from types import SimpleNamespace
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include'))
+pytest.importorskip('micromagneticmodel')
+pytest.importorskip('scipy')
+from include.custom_helper_files import custom_dispersion_fitting as cdf  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Fits of the dispersion relations to synthetic (k, f) points made with the same relations: the known parameters must
+be recovered with and without noise, within the bounds and from several starting points, and the analytic Jacobian
+must agree with finite differences.
+"""
+PROGRAM_NAME = "test_custom_dispersion_fitting.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+SYSTEM_PROP = SimpleNamespace(length=4002e-9, width=200e-9, thickness=5e-9)
+TRUE = dict(H0=1. / (4 * np.pi * 1e-7), Ms=4.2e5, A=1.3e-11, D=1e-3, K1=5e4, K2=1e3, aniso_axis=(0, 0, 1),
+            d=5e-9, gamma=2.211e5 / (4 * np.pi * 1e-7) / (2 * np.pi * 1e9))
+K = np.linspace(-0.3, 0.3, 61)  # rad/nm
+
+
+def _points(noise=0., seed=0):
+    f = cdf.FIT_MODELS['generalised_with_ua'](SYSTEM_PROP, k=K * 1e9, **TRUE)
+    return f + noise * np.random.default_rng(seed).normal(size=f.shape)
+
+
+def _initial(**changes):
+    params = dict(TRUE, A=1e-11, D=5e-4)
+    params.update(changes)
+    return params
+
+
+def test_recovers_parameters_without_noise():
+    fit = cdf.fit_dispersion(K, _points(), _initial(), free=('A', 'D'), system_prop=SYSTEM_PROP)
+
+    assert fit.success
+    assert fit.params['A'] == pytest.approx(TRUE['A'], rel=1e-8)
+    assert fit.params['D'] == pytest.approx(TRUE['D'], rel=1e-8)
+    assert fit.cost == pytest.approx(0., abs=1e-16)
+    np.testing.assert_allclose(fit.evaluate(K), _points(), rtol=1e-10)
+
+
+def test_recovers_parameters_with_noise():
+    noise = 0.05  # GHz
+    fit = cdf.fit_dispersion(K, _points(noise), _initial(), free=('A', 'D'), system_prop=SYSTEM_PROP, sigma=noise)
+
+    for name in ('A', 'D'):
+        assert 0 < fit.errors[name] < 0.1 * abs(TRUE[name])
+        assert abs(fit.params[name] - TRUE[name]) < 4 * fit.errors[name]
+    # With the right sigma the reduced chi-square is about 1
+    assert 2 * fit.cost / (len(K) - 2) == pytest.approx(1., abs=0.5)
+
+
+@pytest.mark.parametrize('model', ['generalised_with_ua', 'generalised'])
+def test_jacobian_matches_finite_differences(model):
+    free = ('H0', 'Ms', 'A', 'D', 'gamma') + (('K1', 'K2') if model == 'generalised_with_ua' else ())
+    params = dict(_initial(), demag_factors=cdf.cdr.geometry_demag_factors(SYSTEM_PROP))
+    values = {name: value for name, value in cdf._SETTING_DEFAULTS.items()}
+    values.update(params)
+    if model == 'generalised':
+        values['has_aniso'] = 0
+    k = K * 1e9
+
+    jac = cdf._generalised_jacobian(values, k, free)
+    assert jac.shape == (len(K), len(free))
+    for i, name in enumerate(free):
+        step = 1e-6 * abs(values[name])
+        up, down = dict(values), dict(values)
+        up[name] += step
+        down[name] -= step
+        numeric = (cdf._evaluate(model, up, k) - cdf._evaluate(model, down, k)) / (2 * step)
+        np.testing.assert_allclose(jac[:, i], numeric, rtol=1e-7, atol=1e-9 * np.abs(numeric).max(), err_msg=name)
+
+
+def test_bounds_are_respected():
+    # The true D is outside the bounds: the fit stops at the nearest one
+    fit = cdf.fit_dispersion(K, _points(), _initial(D=2e-4), free=('A', 'D'), system_prop=SYSTEM_PROP,
+                             bounds={'A': (1e-12, 5e-11), 'D': (0., 5e-4)})
+
+    assert fit.params['D'] == pytest.approx(5e-4, rel=1e-6)
+    assert 1e-12 <= fit.params['A'] <= 5e-11
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_multi_start_finds_the_best_fit(workers):
+    # A poor initial guess, with starting points drawn within the bounds
+    fit = cdf.fit_dispersion(K, _points(), _initial(A=4.9e-11, D=-4e-3), free=('A', 'D'), system_prop=SYSTEM_PROP,
+                             bounds={'A': (1e-12, 5e-11), 'D': (-5e-3, 5e-3)}, n_starts=6, workers=workers, seed=1)
+
+    assert fit.n_starts == 6
+    assert fit.params['A'] == pytest.approx(TRUE['A'], rel=1e-6)
+    assert fit.params['D'] == pytest.approx(TRUE['D'], rel=1e-6)
+
+
+def test_finite_difference_models():
+    # Models without an analytic Jacobian use finite differences; the geometry is then not needed
+    params = dict(H0=TRUE['H0'], Ms=TRUE['Ms'], A=1e-11, D=5e-4, gamma=TRUE['gamma'], d=TRUE['d'])
+    expected = cdf.FIT_MODELS['moon'](k=K * 1e9, **dict(params, A=TRUE['A'], D=TRUE['D']))
+    fit = cdf.fit_dispersion(K, expected, params, free=('A', 'D'), model='moon')
+
+    assert fit.params['A'] == pytest.approx(TRUE['A'], rel=1e-5)
+    assert fit.params['D'] == pytest.approx(TRUE['D'], rel=1e-5)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError, match='unknown model'):
+        cdf.fit_dispersion(K, _points(), _initial(), free=('A',), model='kittel', system_prop=SYSTEM_PROP)
+    with pytest.raises(ValueError, match="can't be fitted"):
+        cdf.fit_dispersion(K, _points(), _initial(), free=('d',), system_prop=SYSTEM_PROP)
+    with pytest.raises(ValueError, match='needs `system_prop`'):
+        cdf.fit_dispersion(K, _points(), _initial(), free=('A',))
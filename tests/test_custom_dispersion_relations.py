@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+from types import SimpleNamespace
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include'))
+pytest.importorskip('micromagneticmodel')
+from include.custom_helper_files import custom_dispersion_relations as cdr  # noqa: E402
+from include.custom_helper_files import custom_physics_equations as cpe  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks that the dispersion relations broadcast over the parameter grids of `parameter_grid` exactly like evaluating
+them point by point, and that the demagnetising factors of the geometry are those of the prism.
+"""
+PROGRAM_NAME = "test_custom_dispersion_relations.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+SYSTEM_PROP = SimpleNamespace(length=4002e-9, width=200e-9, thickness=5e-9)
+MATERIAL = dict(Ms=4.2e5, A=8.78e-12, d=5e-9, gamma=2.211e5 / (4 * np.pi * 1e-7))
+H0_VALUES = np.array([0.05, 0.1, 0.2]) / (4 * np.pi * 1e-7)
+D_VALUES = np.array([0., 1e-4, 3e-4, 1e-3])
+K_VALUES = np.linspace(-0.2e9, 0.2e9, 5)
+
+
+def test_parameter_grid_shapes():
+    grid = cdr.parameter_grid(H0=H0_VALUES, Ms=4.2e5, D=D_VALUES, k=K_VALUES)
+
+    assert list(grid) == ['H0', 'Ms', 'D', 'k']
+    assert grid['H0'].shape == (3, 1, 1)
+    assert grid['Ms'].shape == ()
+    assert grid['D'].shape == (1, 4, 1)
+    assert grid['k'].shape == (1, 1, 5)
+    np.testing.assert_array_equal(grid['D'].ravel(), D_VALUES)
+
+
+def test_geometry_demag_factors():
+    factors = cdr.geometry_demag_factors(SYSTEM_PROP)
+    expected = cpe.calculate_demag_factor_uniform_prism(4000e-9, 200e-9, 5e-9)
+    assert factors == pytest.approx(expected, rel=1e-14)
+
+    # Arrays of geometries broadcast like the prism function
+    widths = np.array([100e-9, 200e-9, 400e-9])
+    factors = cdr.geometry_demag_factors(SimpleNamespace(length=4002e-9, width=widths, thickness=5e-9))
+    for i, width in enumerate(widths):
+        scalar = cpe.calculate_demag_factor_uniform_prism(4000e-9, width, 5e-9)
+        for key, value in scalar.items():
+            assert factors[key][i] == pytest.approx(value, rel=1e-14)
+
+
+def test_omega_generalised_over_grid_matches_points():
+    grid = cdr.parameter_grid(H0=H0_VALUES, D=D_VALUES, k=K_VALUES)
+    om = cdr.Omega_generalised(SYSTEM_PROP, **MATERIAL, **grid)
+    assert om.shape == (3, 4, 5)
+
+    demag_factors = cdr.geometry_demag_factors(SYSTEM_PROP)
+    for (i, H0), (j, D), (n, k) in ((a, b, c) for a in enumerate(H0_VALUES) for b in enumerate(D_VALUES)
+                                    for c in enumerate(K_VALUES)):
+        point = cdr.Omega_generalised(SYSTEM_PROP, H0=H0, D=D, k=k, demag_factors=demag_factors, **MATERIAL)
+        assert om[i, j, n] == pytest.approx(float(point), rel=1e-12)
+
+
+def test_omega_generalised_with_ua_over_grid_matches_points():
+    K1_values = np.array([0., 1e4, 5e4])
+    grid = cdr.parameter_grid(K1=K1_values, k=K_VALUES)
+    om = cdr.Omega_generalised_with_ua(SYSTEM_PROP, H0=H0_VALUES[1], D=1e-4, K2=0., aniso_axis=(0, 0, 1),
+                                       **MATERIAL, **grid)
+    assert om.shape == (3, 5)
+
+    for i, K1 in enumerate(K1_values):
+        for n, k in enumerate(K_VALUES):
+            point = cdr.Omega_generalised_with_ua(SYSTEM_PROP, H0=H0_VALUES[1], D=1e-4, K1=K1, K2=0., k=k,
+                                                  aniso_axis=(0, 0, 1), **MATERIAL)
+            assert om[i, n] == pytest.approx(float(point), rel=1e-12)
+
+    # Without anisotropy, the relation is that of Omega_generalised
+    no_aniso = cdr.Omega_generalised_with_ua(SYSTEM_PROP, H0=H0_VALUES[1], D=1e-4, K1=K1_values[:, np.newaxis],
+                                             K2=0., k=K_VALUES, aniso_axis=(0, 0, 1), has_aniso=0, **MATERIAL)
+    generalised = cdr.Omega_generalised(SYSTEM_PROP, H0=H0_VALUES[1], D=1e-4, k=K_VALUES, **MATERIAL)
+    np.testing.assert_allclose(no_aniso, np.broadcast_to(generalised, (3, 5)), rtol=1e-12)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import json as json
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+df = pytest.importorskip('discretisedfield')
+cdm = pytest.importorskip('custom_drive_monitor')
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of `DriveMonitor` on a drive directory filled with synthetic OOMMF snapshots, written while it is polled.
+"""
+PROGRAM_NAME = "test_custom_drive_monitor.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+N_CELLS = (8, 3, 2)
+CELL = (2e-9, 3e-9, 1e-9)
+MS = 8e5
+
+
+def _field(seed):
+    mesh = df.Mesh(p1=(0, 0, 0), p2=tuple(n * d for n, d in zip(N_CELLS, CELL)), cell=CELL)
+    values = np.random.default_rng(seed).normal(scale=MS, size=(*N_CELLS, 3))
+    return df.Field(mesh, nvdim=3, value=values)
+
+
+def _snapshot_name(stage, iteration):
+    return f'system-Oxs_TimeDriver-Magnetization-{stage:02d}-{iteration:07d}.omf'
+
+
+def _write_drive(drive_dir, n):
+    """Write m0 and `n` snapshots; return the fields written, m0 first."""
+    fields = [_field(seed) for seed in range(n + 1)]
+    fields[0].to_file(str(drive_dir / 'm0.omf'))
+    for i, field in enumerate(fields[1:]):
+        field.to_file(str(drive_dir / _snapshot_name(i, 10 * i)))
+    return fields
+
+
+def _midline(field, component=0):
+    # The centre of the y-z cross-section: (round(3 / 2), round(2 / 2)) = (2, 1)
+    return field.array[:, 2, 1, component] / MS
+
+
+def test_list_drive_snapshots_numeric_order(tmp_path):
+    for stage, iteration in [(10, 5), (2, 100), (2, 9), (0, 0)]:
+        (tmp_path / _snapshot_name(stage, iteration)).write_text('')
+    (tmp_path / 'm0.omf').write_text('')
+    (tmp_path / 'info.json').write_text('{}')
+
+    names = [os.path.basename(path) for path in cdm.list_drive_snapshots(str(tmp_path))]
+    assert names == [_snapshot_name(0, 0), _snapshot_name(2, 9), _snapshot_name(2, 100), _snapshot_name(10, 5)]
+
+
+def test_poll_appends_dynamic_midlines(tmp_path):
+    fields = _write_drive(tmp_path, 5)
+    monitor = cdm.DriveMonitor(str(tmp_path), Ms=MS, n_expected=3)
+
+    # The buffer starts at n_expected rows and grows past it
+    assert monitor.poll() == 5
+    assert monitor.poll() == 0
+    expected = [_midline(field) - _midline(fields[0]) for field in fields[1:]]
+    np.testing.assert_allclose(monitor.data, expected)
+    assert monitor.finished()
+
+
+def test_poll_waits_for_incomplete_snapshots(tmp_path):
+    fields = _write_drive(tmp_path, 3)
+    last = tmp_path / _snapshot_name(2, 20)
+    contents = last.read_bytes()
+    # Cut before '# End: Segment', as while OOMMF is still writing it
+    last.write_bytes(contents[:len(contents) // 2])
+
+    monitor = cdm.DriveMonitor(str(tmp_path), Ms=MS, component='z')
+    assert monitor.poll() == 2
+    assert not monitor.finished()
+
+    last.write_bytes(contents)
+    assert monitor.poll() == 1
+    np.testing.assert_allclose(monitor.data[-1], _midline(fields[3], 2) - _midline(fields[0], 2))
+
+    (tmp_path / 'info.json').write_text(json.dumps({'end_time': '12:00'}))
+    assert monitor.finished()
+
+
+def test_poll_without_initial_state(tmp_path):
+    _write_drive(tmp_path, 2)
+    os.remove(tmp_path / 'm0.omf')
+    assert cdm.DriveMonitor(str(tmp_path), Ms=MS).poll() == 0
+
+
+def test_run_refreshes_and_saves_the_figure(tmp_path):
+    plt = pytest.importorskip('matplotlib.pyplot')
+    plt.switch_backend('Agg')
+    drive_dir, figs_output = tmp_path / 'drive-0', tmp_path / 'figs'
+    drive_dir.mkdir()
+    figs_output.mkdir()
+    _write_drive(drive_dir, 6)
+
+    monitor = cdm.DriveMonitor(str(drive_dir), Ms=MS, time_step=1e-11, n_expected=6, refresh_every=2,
+                               figs_output=str(figs_output))
+    try:
+        data = monitor.run(poll_interval=0.)
+        assert data.shape == (6, N_CELLS[0])
+        assert os.path.exists(figs_output / 'drive-0_monitor.png')
+
+        spectrum, freqs, ks = monitor.spectrum()
+        assert spectrum.shape == data.shape
+        np.testing.assert_allclose(freqs, np.fft.fftshift(np.fft.fftfreq(6, d=1e-11)) * 1e-9)
+        np.testing.assert_allclose(ks, np.fft.fftshift(np.fft.fftfreq(N_CELLS[0], d=2.)) * 2 * np.pi)
+    finally:
+        plt.close('all')
@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import json as json
+import os as os
+import sys as sys
+import threading as threading
+import time as time
+from types import SimpleNamespace
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+plt = pytest.importorskip('matplotlib.pyplot')
+df = pytest.importorskip('discretisedfield')
+md = pytest.importorskip('micromagneticdata')
+Image = pytest.importorskip('PIL.Image')
+cip = pytest.importorskip('custom_image_processing')
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of the figure pipeline of `custom_image_processing` on small synthetic magnetisations and drives (written as
+OOMMF would), without a schematic pane so no `system_region` is needed.
+"""
+PROGRAM_NAME = "test_custom_image_processing.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+N_CELLS = (40, 10, 4)
+CELL = (2e-9, 2e-9, 2e-9)
+SYSTEM_PROP = SimpleNamespace(numcells=N_CELLS)
+DRIVE_NAME = 'synthetic'
+
+
+@pytest.fixture(autouse=True)
+def agg_backend():
+    plt.switch_backend('Agg')
+    yield
+    plt.close('all')
+
+
+def _mesh():
+    return df.Mesh(p1=(0, 0, 0), p2=tuple(n * d for n, d in zip(N_CELLS, CELL)), cell=CELL)
+
+
+def _field(seed):
+    return df.Field(_mesh(), nvdim=3, value=np.random.default_rng(seed).normal(size=(*N_CELLS, 3)))
+
+
+def _write_drive(dirname, n, number=0):
+    """Write a TimeDriver drive of `n` random snapshots; return it as an `md.Drive`."""
+    drive_dir = dirname / DRIVE_NAME / f'drive-{number}'
+    drive_dir.mkdir(parents=True)
+    (drive_dir / 'info.json').write_text(json.dumps({'drive_number': number, 'driver': 'TimeDriver', 'n': n,
+                                                     't': n * 1e-12}))
+    rows = [f'{i} {i * 1e-12} 0' for i in range(n)]
+    (drive_dir / f'{DRIVE_NAME}.odt').write_text('\n'.join(
+        ['# ODT 1.0', '# Table Start', '# Title: mmArchive Data Table',
+         '# Columns: Oxs_TimeDriver::Iteration {Oxs_TimeDriver::Simulation time} Oxs_TimeDriver::mx',
+         '# Units: {} s {}'] + rows + ['# Table End']) + '\n')
+
+    df.Field(_mesh(), nvdim=3, value=(0, 0, 1)).to_file(str(drive_dir / 'm0.omf'))
+    for i in range(n):
+        _field(i).to_file(str(drive_dir / f'{DRIVE_NAME}-Oxs_TimeDriver-Magnetization-{i:02d}-{i:07d}.omf'))
+    return md.Drive(name=DRIVE_NAME, number=number, dirname=str(dirname))
+
+
+def _pixels(path):
+    return np.asarray(Image.open(path))
+
+
+def test_render_drive_frames_serial_and_parallel(tmp_path):
+    drive = _write_drive(tmp_path, 5)
+    frames = [4, 0, 2]
+    for name in ('serial', 'parallel'):
+        (tmp_path / name).mkdir()
+
+    with cip.StageTimer(trace_memory=False) as timer:
+        parallel = cip.render_drive_frames(drive, SYSTEM_PROP, None, str(tmp_path / 'parallel'), fig_name='driven',
+                                           frames=frames, workers=2, has_schematic=False)
+
+    # One PNG per frame, in the order of `frames`, whichever worker rendered it
+    assert [os.path.basename(path) for path in parallel] == [f'drive-0_m_driven_{frame:04d}.png' for frame in frames]
+
+    # Each worker renders its chunk ([4, 0] and [2]) as a serial run of that chunk would: the layout (colorbar labels,
+    # arrow scale) is that of the first frame of the chunk
+    for chunk in ([4, 0], [2]):
+        serial = cip.render_drive_frames(drive, SYSTEM_PROP, None, str(tmp_path / 'serial'), fig_name='driven',
+                                         frames=chunk, workers=1, has_schematic=False)
+        for path in serial:
+            np.testing.assert_array_equal(_pixels(tmp_path / 'parallel' / os.path.basename(path)), _pixels(path))
+
+    # The timings of the worker processes are gathered by the active timer
+    summary = timer.summary()
+    assert summary['savefig']['calls'] == len(frames)
+    assert summary['update']['calls'] == 1
+
+
+def test_render_drive_frames_without_frames(tmp_path):
+    drive = _write_drive(tmp_path, 2)
+    assert cip.render_drive_frames(drive, SYSTEM_PROP, None, str(tmp_path), frames=[], has_schematic=False) == []
+
+
+def _pane_data(figure):
+    """{pane: (image values, quiver U, V and colours)} of a `ThreePaneFigure`."""
+    data = {}
+    for pane in ('schematic', 'upper right', 'lower right'):
+        quiver = figure.quivers[pane]
+        colours = quiver.get_array()
+        data[pane] = (np.asarray(figure.images[pane].get_array()), quiver.U, quiver.V,
+                      None if colours is None else np.asarray(colours))
+    return data
+
+
+def _assert_same_panes(actual, expected, **tolerance):
+    for pane, arrays in expected.items():
+        for actual_array, expected_array in zip(actual[pane], arrays):
+            if expected_array is None:
+                assert actual_array is None
+            else:
+                np.testing.assert_allclose(actual_array, expected_array, err_msg=pane, **tolerance)
+
+
+def test_three_pane_figure_update_matches_a_new_figure():
+    figure = cip.ThreePaneFigure(SimpleNamespace(m=_field(0)), SYSTEM_PROP, None, fig_name='0', has_schematic=False)
+    assert figure.update(SimpleNamespace(m=_field(1)), fig_name='1') is figure
+    new = cip.ThreePaneFigure(SimpleNamespace(m=_field(1)), SYSTEM_PROP, None, fig_name='1', has_schematic=False)
+
+    _assert_same_panes(_pane_data(figure), _pane_data(new), rtol=0, atol=0)
+    assert figure.fig.get_suptitle() == 'Normalised magnetisation fields (1)'
+
+
+def test_three_pane_figure_update_array_matches_update():
+    # The vector panes sample 40 cells down to 16, so no resampled cell centre is on a cell boundary
+    system = SimpleNamespace(m=_field(0))
+    figure = cip.ThreePaneFigure(system, SYSTEM_PROP, None, has_schematic=False)
+    from_array = cip.ThreePaneFigure(system, SYSTEM_PROP, None, has_schematic=False)
+
+    field = _field(1)
+    figure.update(SimpleNamespace(m=field))
+    from_array.update_array(field.array)
+    _assert_same_panes(_pane_data(from_array), _pane_data(figure), rtol=1e-12, atol=1e-12)
+
+
+def test_three_pane_figure_fixed_clim(tmp_path):
+    figure = cip.ThreePaneFigure(SimpleNamespace(m=_field(0)), SYSTEM_PROP, None, has_schematic=False,
+                                 clim=(-1, 1))
+    figure.update_array(3 * _field(1).array)
+    for artist in [*figure.images.values(), *figure.quivers.values()]:
+        assert artist.get_clim() == (-1, 1)
+
+    figure.save(str(tmp_path / 'frame.png'), dpi=50)
+    assert Image.open(tmp_path / 'frame.png').size[0] > 0
+
+
+def test_three_pane_figure_needs_a_process_saver(tmp_path):
+    figure = cip.ThreePaneFigure(SimpleNamespace(m=_field(0)), SYSTEM_PROP, None, has_schematic=False)
+    with cip.FigureSaver() as saver:
+        with pytest.raises(ValueError, match='reused for every frame'):
+            figure.save(str(tmp_path / 'frame.png'), saver=saver)
+
+
+def test_resample_cache_returns_the_same_objects():
+    cache = cip.ResampleCache()
+    field = _field(0)
+
+    orientation = cache.orientation(field)
+    assert cache.orientation(field) is orientation
+    assert cache.get(orientation) is orientation
+
+    plane = cache.get(orientation, 'z')
+    assert cache.get(orientation, 'z') is plane
+    # Resampling to the shape the plane already has is skipped
+    assert cache.get(orientation, 'z', (40, 10)) is plane
+
+    resampled = cache.get(orientation, 'z', (16, 5))
+    assert cache.get(orientation, 'z', [16, 5]) is resampled
+    assert cache.get(orientation, 'z', np.array([16, 5])) is resampled
+    assert cache.get(orientation, 'y', (16, 4)) is not resampled
+
+    expected = field.orientation.sel('z').resample((16, 5))
+    np.testing.assert_array_equal(resampled.array, expected.array)
+
+
+def test_resample_cache_keys_on_the_field():
+    # Equal but distinct fields each get their own entries
+    cache = cip.ResampleCache()
+    field, copy = _field(0), _field(0)
+    assert cache.get(field, 'x') is not cache.get(copy, 'x')
+    np.testing.assert_array_equal(cache.get(field, 'x').array, cache.get(copy, 'x').array)
+
+
+def _has_ties(n, m):
+    """Whether the centre of any of `m` resampled cells is on the boundary of two of the `n` cells."""
+    return m != n and any((2 * i + 1) * n % (2 * m) == 0 for i in range(m))
+
+
+@pytest.mark.parametrize('plane', ['x', 'y', 'z'])
+def test_extract_plane_matches_discretisedfield(plane):
+    field = _field(0)
+    array = field.array.copy()
+    expected = field.orientation.sel(plane)
+    n1, n2 = expected.mesh.n
+
+    full = cip.extract_plane(field.array, plane)
+    np.testing.assert_allclose(full, expected.array.reshape(n1, n2, 3), rtol=0, atol=1e-15)
+
+    for m1 in range(1, n1 + 1):
+        for m2 in range(1, n2 + 1):
+            values = cip.extract_plane(field.array, plane, (m1, m2))
+            assert values.shape == (m1, m2, 3)
+            if _has_ties(n1, m1) or _has_ties(n2, m2):
+                # The lower of the two cells, where `resample` may take either
+                rows = [int((i + 0.5) * n1 / m1 - 1e-9) for i in range(m1)]
+                columns = [int((j + 0.5) * n2 / m2 - 1e-9) for j in range(m2)]
+                np.testing.assert_array_equal(values, full[np.ix_(rows, columns)])
+            else:
+                np.testing.assert_allclose(values, expected.resample((m1, m2)).array, rtol=0, atol=1e-15,
+                                           err_msg=f'{(m1, m2)}')
+
+    # The raw array is never modified
+    np.testing.assert_array_equal(field.array, array)
+
+
+def test_extract_plane_mean_and_zero_vectors():
+    array = _field(0).array
+    array[:2, :, 2] = 0.
+
+    unit = array[:, :, 2] / np.linalg.norm(array[:, :, 2], axis=-1, keepdims=True).clip(1e-300)
+    # Means of the unit vectors over blocks of 5 x 2 cells, normalised again
+    mean = unit.reshape(8, 5, 5, 2, 3).mean(axis=(1, 3))
+    np.testing.assert_allclose(cip.extract_plane(array, 'z', (8, 5), method='mean'),
+                               mean / np.linalg.norm(mean, axis=-1, keepdims=True), rtol=1e-12)
+    # Zero vectors stay zero instead of becoming NaNs
+    np.testing.assert_array_equal(cip.extract_plane(array, 'z')[:2], 0.)
+
+    with pytest.raises(ValueError, match='method'):
+        cip.extract_plane(array, 'z', (8, 5), method='max')
+
+
+def _small_figure(value, size=(2, 1)):
+    fig = plt.figure(figsize=size)
+    fig.add_subplot().imshow(np.full((4, 4), value), vmin=0, vmax=1)
+    return fig
+
+
+def _gif_frames(path):
+    with Image.open(path) as image:
+        return image.n_frames, image.size
+
+
+def test_animation_writer_pillow(tmp_path):
+    filename = tmp_path / 'animation.gif'
+    with cip.AnimationWriter(filename, fps=5, dpi=40, queue_size=1) as writer:
+        assert writer.encoder == 'pillow'
+        for value in (0., 0.5, 1.):
+            writer.add_figure(_small_figure(value))
+    assert writer.n_frames == 3
+    assert _gif_frames(filename) == (3, (80, 40))
+
+
+def test_animation_writer_rejects_other_frame_sizes(tmp_path):
+    with cip.AnimationWriter(tmp_path / 'animation.gif', dpi=40) as writer:
+        writer.add_figure(_small_figure(0.))
+        with pytest.raises(ValueError, match='frame 1 is 40x40 pixels'):
+            writer.add_figure(_small_figure(1., size=(1, 1)))
+
+    with pytest.raises(ValueError, match='Pillow only writes'):
+        cip.AnimationWriter(tmp_path / 'animation.mp4', encoder='pillow')
+
+
+@pytest.mark.skipif(cip.shutil.which('ffmpeg') is None, reason='ffmpeg is not installed')
+def test_animation_writer_ffmpeg(tmp_path):
+    filename = tmp_path / 'animation.mp4'
+    with cip.AnimationWriter(filename, fps=5, dpi=40) as writer:
+        assert writer.encoder == 'ffmpeg'
+        for value in (0., 0.5, 1.):
+            writer.add_figure(_small_figure(value))
+    assert writer.n_frames == 3
+    assert filename.stat().st_size > 0
+
+
+def test_render_drive_animation(tmp_path):
+    drive = _write_drive(tmp_path, 4)
+    filename = tmp_path / 'driven.gif'
+
+    n_frames = cip.render_drive_animation(drive, SYSTEM_PROP, None, str(filename), frames=range(1, 4), dpi=20,
+                                          has_schematic=False, clim=(-1, 1))
+    # The frames are the 8 x 6 inch figure of `default_three_pane`
+    assert n_frames == 3
+    assert _gif_frames(filename) == (3, (160, 120))
+    assert cip.render_drive_animation(drive, SYSTEM_PROP, None, str(filename), frames=[]) == 0
+
+
+def test_mean_pyramid_levels():
+    values = np.random.default_rng(0).normal(size=(40, 10, 3))
+    pyramid = cip.MeanPyramid(values)
+
+    # The long axis is pooled alone until both are comparable, then both are, rounding odd sizes up
+    assert [level.shape[:2] for level in pyramid.levels] == [(40, 10), (20, 10), (10, 10), (5, 5), (3, 3), (2, 2)]
+    assert len(pyramid) == 6
+    assert pyramid.levels[0] is values
+    np.testing.assert_allclose(pyramid.levels[1], values.reshape(20, 2, 10, 3).mean(axis=1))
+    np.testing.assert_allclose(pyramid.levels[3], pyramid.levels[2].reshape(5, 2, 5, 2, 3).mean(axis=(1, 3)))
+    # 5 cells pool into blocks of 1, 2 and 2
+    np.testing.assert_allclose(pyramid.levels[4][0, 0], pyramid.levels[3][0, 0])
+    np.testing.assert_allclose(pyramid.levels[4][-1, -1], pyramid.levels[3][3:, 3:].mean(axis=(0, 1)))
+
+
+def test_mean_pyramid_resample():
+    values = np.random.default_rng(0).normal(size=(40, 10, 3))
+    pyramid = cip.MeanPyramid(values)
+
+    assert pyramid.level((12, 4)) is pyramid.levels[1]
+    assert pyramid.level((10, 10)) is pyramid.levels[2]
+    assert pyramid.level((80, 10)) is pyramid.levels[0]
+    assert pyramid.level((1, 1)) is pyramid.levels[-1]
+
+    # Exactly the shape asked for, sampled from the nearest finer level
+    np.testing.assert_array_equal(pyramid.resample((20, 10)), pyramid.levels[1])
+    np.testing.assert_array_equal(pyramid.resample((16, 5)), cip.extract_plane(
+        pyramid.levels[1][:, :, np.newaxis], 'z', (16, 5), normalise=False))
+
+
+def test_auto_resample_shape():
+    fig = plt.figure(figsize=(8, 6), dpi=100)
+    ax = fig.add_axes((0.1, 0.1, 0.5, 0.25))
+
+    # The axes are 4 x 1.5 inches
+    assert cip.auto_resample_shape(ax, (1000, 1000)) == (400, 150)
+    assert cip.auto_resample_shape(ax, (1000, 1000), dpi=300) == (1000, 450)
+    assert cip.auto_resample_shape(ax, (1000, 1000), pixels_per_cell=2.) == (200, 75)
+    assert cip.auto_resample_shape(ax, (1000, 1000), visible=(0.5, 1.)) == (800, 150)
+    assert cip.auto_resample_shape(ax, (100, 2)) == (100, 2)
+
+
+def test_three_pane_auto_shapes_fit_the_drawn_layout():
+    n_cells = (600, 30, 20)
+    mesh = df.Mesh(p1=(0, 0, 0), p2=tuple(n * d for n, d in zip(n_cells, CELL)), cell=CELL)
+    field = df.Field(mesh, nvdim=3, value=np.random.default_rng(0).normal(size=(*n_cells, 3)))
+    system_prop = SimpleNamespace(numcells=n_cells)
+
+    figure = cip.ThreePaneFigure(SimpleNamespace(m=field), system_prop, None, has_schematic=False,
+                                 scalar_resample_shape='auto', vector_resample_shape='auto')
+    # The shapes are those of the axes once the suptitle and colorbars are laid out, not of the bare mosaic
+    figure.fig.canvas.draw()
+    assert figure.resample_shapes == cip._pane_resample_shapes(system_prop, 'auto', 'auto', figure.axs)
+    assert figure.resample_shapes['upper right'][1] != (16, 20)
+    for pane, (scalar_shape, vector_shape) in figure.resample_shapes.items():
+        assert figure.images[pane].get_array().shape == scalar_shape[::-1]
+        assert figure.quivers[pane].U.size == np.prod(vector_shape)
+
+
+def test_stage_timer_records_every_stage():
+    @cip._timed('outer')
+    def outer():
+        with cip._stage('inner'):
+            np.ones(2 ** 20)
+        with cip._stage('inner'):
+            pass
+
+    # Nothing is recorded without an active timer
+    outer()
+    with cip.StageTimer() as timer:
+        outer()
+        outer()
+    outer()
+
+    assert [record.stage for record in timer.records] == ['outer/inner', 'outer/inner', 'outer'] * 2
+    assert all(record.seconds >= 0 for record in timer.records)
+    # The peak of the outer stage includes the 8 MiB array of its first inner stage
+    assert timer.records[0].peak_bytes >= 2 ** 23
+    assert timer.records[2].peak_bytes >= timer.records[0].peak_bytes
+
+    summary = timer.summary()
+    assert list(summary) == ['outer/inner', 'outer']
+    assert summary['outer/inner']['calls'] == 4
+    assert summary['outer']['calls'] == 2
+    assert summary['outer']['mean_s'] == pytest.approx(summary['outer']['total_s'] / 2)
+    assert timer.report().splitlines()[1].startswith('outer/inner')
+    assert cip.StageTimer._active is None
+
+
+def test_stage_timer_without_memory_and_nested_timers():
+    with cip.StageTimer(trace_memory=False) as outer_timer:
+        with cip.StageTimer(trace_memory=False) as inner_timer:
+            cip.rotate_in_place(plt.figure().add_subplot(), [4, 2], rotate=False)
+        with cip._stage('after'):
+            pass
+
+    # The innermost active timer records; the previous one is active again once it exits
+    assert [record.stage for record in inner_timer.records] == ['rotate_in_place']
+    assert [record.stage for record in outer_timer.records] == ['after']
+    assert outer_timer.records[0].peak_bytes is None
+    assert outer_timer.summary()['after']['peak_bytes'] is None
+
+    outer_timer.add(inner_timer.records)
+    assert outer_timer.summary()['rotate_in_place']['calls'] == 1
+
+
+def _wait_for_failure(saver, future):
+    """Wait until the failed `future` has been recorded by `saver` (its done callback runs after `exception`)."""
+    assert future.exception(timeout=10) is not None
+    deadline = time.monotonic() + 10
+    while saver._error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_figure_saver_writes_and_closes_figures(tmp_path):
+    figures = [_small_figure(value) for value in (0., 1.)]
+    kept = _small_figure(0.5)
+    with cip.FigureSaver(workers=2) as saver:
+        for i, fig in enumerate(figures):
+            saver.save(fig, str(tmp_path / f'{i}.png'), dpi=20)
+        assert saver.wait() == [str(tmp_path / '0.png'), str(tmp_path / '1.png')]
+    with cip.FigureSaver(close=False) as saver:
+        saver.save(kept, str(tmp_path / 'kept.png'), dpi=20)
+
+    assert all((tmp_path / name).exists() for name in ('0.png', '1.png', 'kept.png'))
+    # Figures saved by threads are closed by the caller once saved, unless close=False
+    assert not any(plt.fignum_exists(fig.number) for fig in figures)
+    assert plt.fignum_exists(kept.number)
+
+
+def test_figure_saver_raises_failed_saves(tmp_path):
+    missing = str(tmp_path / 'missing' / 'figure.png')
+
+    saver = cip.FigureSaver()
+    saver.wait()
+    _wait_for_failure(saver, saver.save(_small_figure(0.), missing))
+    with pytest.raises(RuntimeError, match='saving .*figure.png failed') as error:
+        saver.save(_small_figure(1.), str(tmp_path / 'next.png'))
+    assert isinstance(error.value.__cause__, FileNotFoundError)
+    # Each failure is raised once
+    assert saver.wait() == []
+
+    saver.save(_small_figure(0.), missing)
+    with pytest.raises(RuntimeError, match='failed'):
+        saver.wait()
+    saver.close()
+
+    with pytest.raises(RuntimeError, match='failed'):
+        with cip.FigureSaver() as saver:
+            saver.save(_small_figure(0.), missing)
+
+
+def test_figure_saver_blocks_while_the_queue_is_full(tmp_path):
+    release = threading.Event()
+    blocked = _small_figure(0.)
+    original_savefig = blocked.savefig
+
+    def slow_savefig(*args, **kwargs):
+        release.wait(10)
+        original_savefig(*args, **kwargs)
+    blocked.savefig = slow_savefig
+
+    with cip.FigureSaver(workers=1, queue_size=1) as saver:
+        saver.save(blocked, str(tmp_path / '0.png'), dpi=20)
+        saver.save(_small_figure(0.5), str(tmp_path / '1.png'), dpi=20)
+
+        # One figure being saved and one waiting: the third save waits for a free slot
+        third = threading.Thread(target=saver.save, args=(_small_figure(1.), str(tmp_path / '2.png')),
+                                 kwargs={'dpi': 20})
+        third.start()
+        third.join(0.3)
+        assert third.is_alive()
+
+        release.set()
+        third.join(10)
+        assert not third.is_alive()
+    assert sorted(os.listdir(tmp_path)) == ['0.png', '1.png', '2.png']
+
+
+def test_figure_saver_processes(tmp_path):
+    fig = _small_figure(0.)
+    with cip.FigureSaver(executor='process', close=False) as saver:
+        saver.save(fig, str(tmp_path / 'snapshot.png'), dpi=20)
+        # The worker saves a snapshot, so the figure may change right away
+        fig.axes[0].images[0].set_data(np.ones((4, 4)))
+        saver.wait()
+    assert plt.fignum_exists(fig.number)
+    _small_figure(0.).savefig(str(tmp_path / 'expected.png'), dpi=20)
+    np.testing.assert_array_equal(_pixels(tmp_path / 'snapshot.png'), _pixels(tmp_path / 'expected.png'))
+
+    with pytest.raises(ValueError, match='executor'):
+        cip.FigureSaver(executor='fork')
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+cor = pytest.importorskip('custom_odt_reader')
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of `read_odt` on synthetic OOMMF tables: column projection, short names, parsing in blocks and the binary
+cache, which must be dropped once the `.odt` changes.
+"""
+PROGRAM_NAME = "test_custom_odt_reader.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+COLUMNS = ['Oxs_RungeKuttaEvolve:evolver:Total energy', 'Oxs_Demag:demag:Energy', 'Oxs_UniformExchange:exchange:Energy',
+           'Oxs_TimeDriver::Iteration', 'Oxs_TimeDriver::mx', 'Oxs_TimeDriver::my', 'Oxs_TimeDriver::mz',
+           'Oxs_TimeDriver::Simulation time']
+UNITS = ['J', 'J', 'J', '', '', '', '', 's']
+
+
+def write_odt(path, values):
+    """Write the (n_rows, len(COLUMNS)) `values` as an OOMMF `.odt` table."""
+    lines = ['# ODT 1.0', '# Table Start', '# Title: mmArchive Data Table',
+             '# Columns: ' + ' '.join(f'{{{column}}}' if ' ' in column else column for column in COLUMNS),
+             '# Units: ' + ' '.join(f'{{{unit}}}' if not unit else unit for unit in UNITS)]
+    lines += [' '.join(f'{value:.17g}' for value in row) for row in values]
+    lines += ['# Table End']
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _values(n_rows=50, seed=0):
+    values = np.random.default_rng(seed).normal(size=(n_rows, len(COLUMNS)))
+    values[:, 3] = np.arange(n_rows)
+    values[:, 7] = np.arange(n_rows) * 1e-12
+    return values
+
+
+def assert_parsed(actual, expected):
+    # The fast (default) float parser of pandas keeps about 16 of the 17 digits written
+    np.testing.assert_allclose(actual, expected, rtol=1e-13, atol=0)
+
+
+def test_header_short_names(tmp_path):
+    write_odt(tmp_path / 'drive.odt', _values(3))
+    columns, units, short_names = cor.odt_header(str(tmp_path / 'drive.odt'))
+
+    assert columns == COLUMNS
+    assert units == UNITS
+    assert short_names == ['E', 'E_demag', 'E_exchange', 'iteration', 'mx', 'my', 'mz', 't']
+
+
+def test_projection_returns_only_requested_columns(tmp_path):
+    values = _values()
+    write_odt(tmp_path / 'drive.odt', values)
+
+    # A drive directory may be passed instead of the file
+    table = cor.read_odt(str(tmp_path), columns=['mz', 'Oxs_TimeDriver::Simulation time'], use_cache=False)
+
+    assert list(table.data) == ['Oxs_TimeDriver::mz', 'Oxs_TimeDriver::Simulation time']
+    assert_parsed(table['mz'], values[:, 6])
+    assert_parsed(table['t'], values[:, 7])
+    assert 'E' not in table
+    with pytest.raises(KeyError, match='not loaded'):
+        table['E']
+    assert list(table.to_dataframe().columns) == ['mz', 't']
+
+
+def test_all_columns(tmp_path):
+    values = _values()
+    write_odt(tmp_path / 'drive.odt', values)
+
+    table = cor.read_odt(str(tmp_path / 'drive.odt'), use_cache=False)
+    assert_parsed(np.column_stack([table[column] for column in COLUMNS]), values)
+
+
+@pytest.mark.parametrize('block_rows', [1, 7, 49, 50, 10_000])
+def test_block_rows_give_identical_results(tmp_path, block_rows):
+    values = _values()
+    write_odt(tmp_path / 'drive.odt', values)
+
+    whole = cor.read_odt(str(tmp_path / 'drive.odt'), columns=['t', 'mx', 'E'], use_cache=False)
+    blocked = cor.read_odt(str(tmp_path / 'drive.odt'), columns=['t', 'mx', 'E'], block_rows=block_rows,
+                           use_cache=False)
+    for column in ['t', 'mx', 'E']:
+        np.testing.assert_array_equal(blocked[column], whole[column])
+
+
+def test_cache_is_used_and_extended(tmp_path):
+    path = str(tmp_path / 'drive.odt')
+    values = _values()
+    write_odt(path, values)
+
+    cor.read_odt(path, columns=['t'])
+    assert os.path.exists(path + '.cache.npz')
+
+    # Same size and modification time: the cached column is read, not the (changed) file
+    stat = os.stat(path)
+    changed = values.copy()
+    changed[:, 7] = changed[::-1, 7]
+    write_odt(path, changed)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.path.getsize(path) == stat.st_size
+
+    table = cor.read_odt(path, columns=['t', 'mx'])
+    assert_parsed(table['t'], values[:, 7])
+    assert_parsed(table['mx'], values[:, 4])
+
+
+def test_rewritten_odt_invalidates_cache(tmp_path):
+    path = str(tmp_path / 'drive.odt')
+    write_odt(path, _values(50))
+    cor.read_odt(path, columns=['t', 'mx'])
+
+    # The drive was run again, with more steps
+    values = _values(80, seed=1)
+    write_odt(path, values)
+    table = cor.read_odt(path, columns=['t', 'mx'])
+    assert_parsed(table['t'], values[:, 7])
+    assert_parsed(table['mx'], values[:, 4])
+
+    # Same size, but a newer modification time
+    stat = os.stat(path)
+    values[:, 4] *= -1
+    write_odt(path, values)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert_parsed(cor.read_odt(path, columns=['mx'])['mx'], values[:, 4])
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    path = str(tmp_path / 'drive.odt')
+    values = _values()
+    write_odt(path, values)
+    with open(path + '.cache.npz', 'wb') as f:
+        f.write(b'not a cache')
+
+    assert_parsed(cor.read_odt(path, columns=['t'])['t'], values[:, 7])
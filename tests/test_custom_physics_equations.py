@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+import custom_physics_equations as cpe  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of `calculate_demag_factor_uniform_prism` against the formula as it was written before it was vectorised and
+cached.
+"""
+PROGRAM_NAME = "test_custom_physics_equations.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+# (length, width, thickness) [m]: films, a cube, needles and a tall pillar
+PRISMS = [(1e-6, 50e-9, 1e-9), (4e-6, 200e-9, 5e-9), (10e-9, 10e-9, 10e-9), (1e-6, 2e-9, 2e-9),
+          (20e-9, 30e-9, 500e-9)]
+
+# The formula sums terms of opposite signs as large as the aspect ratio, so both versions round differently at about
+# 1e-12 for the aspect ratios above
+ATOL = 1e-10
+
+
+def _reference_demag_factor(a, b, c):
+    """The term-by-term formula of the original implementation."""
+    r = a ** 2 + b ** 2 + c ** 2
+
+    demag_factor = ((b ** 2 - c ** 2) / (2 * b * c)) * np.log((np.sqrt(r) - a) / (np.sqrt(r) + a))
+    demag_factor += ((a ** 2 - c ** 2) / (2 * a * c)) * np.log((np.sqrt(r) - b) / (np.sqrt(r) + b))
+    demag_factor += (b / (2 * c)) * np.log((np.sqrt(a ** 2 + b ** 2) + a) / (np.sqrt(a ** 2 + b ** 2) - a))
+    demag_factor += (a / (2 * c)) * np.log((np.sqrt(a ** 2 + b ** 2) + b) / (np.sqrt(a ** 2 + b ** 2) - b))
+    demag_factor += (c / (2 * a)) * np.log((np.sqrt(b ** 2 + c ** 2) - b) / (np.sqrt(b ** 2 + c ** 2) + b))
+    demag_factor += (c / (2 * b)) * np.log((np.sqrt(a ** 2 + c ** 2) - a) / (np.sqrt(a ** 2 + c ** 2) + a))
+    demag_factor += 2 * np.arctan((a * b) / (c * np.sqrt(r)))
+    demag_factor += (a ** 3 + b ** 3 - 2 * c ** 3) / (3 * a * b * c)
+    demag_factor += ((a ** 2 + b ** 2 - 2 * c ** 2) / (3 * a * b * c)) * np.sqrt(r)
+    demag_factor += (c / (a * b)) * (np.sqrt(a ** 2 + c ** 2) + np.sqrt(b ** 2 + c ** 2))
+    demag_factor -= ((np.power((a ** 2 + b ** 2), 3 / 2) + np.power((b ** 2 + c ** 2), 3 / 2)
+                      + np.power((c ** 2 + a ** 2), 3 / 2)) / (3 * a * b * c))
+
+    return demag_factor / np.pi
+
+
+def _reference_demag_factors(length, width, thickness):
+    """The original (alignment 'z' only) assignment of the edges to the factors."""
+    return {'N_x': _reference_demag_factor(width, thickness, length),
+            'N_y': _reference_demag_factor(thickness, length, width),
+            'N_z': _reference_demag_factor(length, width, thickness)}
+
+
+@pytest.mark.parametrize('prism', PRISMS)
+def test_matches_original_formula(prism):
+    factors = cpe.calculate_demag_factor_uniform_prism(*prism)
+    for key, value in _reference_demag_factors(*prism).items():
+        assert factors[key] == pytest.approx(value, abs=ATOL)
+
+
+def test_known_limits():
+    cube = cpe.calculate_demag_factor_uniform_prism(10e-9, 10e-9, 10e-9)
+    for value in cube.values():
+        assert value == pytest.approx(1 / 3, rel=1e-12)
+
+    film = cpe.calculate_demag_factor_uniform_prism(1e-3, 1e-3, 1e-9)
+    assert film['N_z'] == pytest.approx(1., abs=1e-5)
+    assert sum(film.values()) == pytest.approx(1., abs=1e-8)
+
+
+def test_arrays_broadcast_like_scalars():
+    lengths = np.array([prism[0] for prism in PRISMS])
+    widths = np.array([prism[1] for prism in PRISMS])
+    thicknesses = np.array([prism[2] for prism in PRISMS])
+
+    factors = cpe.calculate_demag_factor_uniform_prism(lengths, widths, thicknesses)
+    for i, prism in enumerate(PRISMS):
+        for key, value in _reference_demag_factors(*prism).items():
+            assert factors[key][i] == pytest.approx(value, abs=ATOL)
+
+    # A scalar thickness broadcasts against the arrays
+    factors = cpe.calculate_demag_factor_uniform_prism(lengths[:, np.newaxis], widths, 5e-9)
+    assert factors['N_z'].shape == (len(PRISMS), len(PRISMS))
+
+
+def test_alignments_permute_the_factors():
+    z = cpe.calculate_demag_factor_uniform_prism(1e-6, 50e-9, 1e-9, alignment='z')
+    x = cpe.calculate_demag_factor_uniform_prism(1e-6, 50e-9, 1e-9, alignment='x')
+    y = cpe.calculate_demag_factor_uniform_prism(1e-6, 50e-9, 1e-9, alignment='y')
+    # The thickness lies along the alignment axis; length and width follow cyclically
+    assert (x['N_y'], x['N_z'], x['N_x']) == pytest.approx((z['N_x'], z['N_y'], z['N_z']))
+    assert (y['N_z'], y['N_x'], y['N_y']) == pytest.approx((z['N_x'], z['N_y'], z['N_z']))
+
+
+def test_cached_result_is_a_copy():
+    factors = cpe.calculate_demag_factor_uniform_prism(1e-6, 50e-9, 1e-9)
+    factors['N_z'] = -1.
+    assert cpe.calculate_demag_factor_uniform_prism(1e-6, 50e-9, 1e-9)['N_z'] != -1.
+
+
+def test_unknown_alignment():
+    with pytest.raises(ValueError, match='alignment'):
+        cpe.calculate_demag_factor_uniform_prism(1e-6, 50e-9, 1e-9, alignment='w')
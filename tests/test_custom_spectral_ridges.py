@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+import custom_spectral_ridges as csr  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks that `extract_ridges` follows one dispersion branch and does not jump to a neighbouring one.
+"""
+PROGRAM_NAME = "test_custom_spectral_ridges.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+KS = np.linspace(-0.3, 0.3, 121)
+FREQS = np.arange(0., 60., 0.1)
+BRANCH_GAP = 15.
+
+
+def _branch(k):
+    return 10 + 200 * k ** 2 + 5 * k
+
+
+def _lorentzian(f0, width=0.3):
+    return 1 / (1 + ((FREQS[:, np.newaxis] - f0[np.newaxis, :]) / width) ** 2)
+
+
+def _two_branch_map(second_amplitude=1.):
+    return _lorentzian(_branch(KS)) + second_amplitude * _lorentzian(_branch(KS) + BRANCH_GAP)
+
+
+def _offsets(ridge):
+    """Number of points of the ridge on the first and on the second branch."""
+    offset = ridge.f - _branch(ridge.k)
+    return np.sum(np.abs(offset) < 1), np.sum(np.abs(offset - BRANCH_GAP) < 1)
+
+
+@pytest.mark.parametrize('scale', ['linear', 'log10'])
+@pytest.mark.parametrize('second_amplitude', [1., 0.5])
+def test_branches_are_not_mixed(scale, second_amplitude):
+    spectrum = _two_branch_map(second_amplitude)
+    if scale == 'log10':
+        spectrum = np.log10(spectrum)
+
+    ridges = csr.extract_ridges(spectrum, FREQS, KS, n_branches=2)
+
+    assert len(ridges) == 2
+    on_branches = sorted(_offsets(ridge) for ridge in ridges)
+    assert on_branches == [(0, len(KS)), (len(KS), 0)]
+    for ridge in ridges:
+        offset = np.abs(ridge.f - _branch(ridge.k))
+        np.testing.assert_allclose(np.minimum(offset, np.abs(offset - BRANCH_GAP)), 0., atol=0.05)
+
+
+def test_strongest_branch_first():
+    ridge = csr.extract_ridges(_two_branch_map(0.5), FREQS, KS)[0]
+    assert _offsets(ridge) == (len(KS), 0)
+
+
+def test_branch_ends_at_a_gap():
+    # The first branch vanishes for k > 0.1; the tracker must not continue onto the second one
+    spectrum = _lorentzian(_branch(KS)) * (KS <= 0.1) + 0.5 * _lorentzian(_branch(KS) + BRANCH_GAP)
+
+    ridge = csr.extract_ridges(spectrum, FREQS, KS)[0]
+    assert _offsets(ridge) == (np.sum(KS <= 0.1), 0)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import json as json
+import os as os
+import re as re
+import sys as sys
+import xml.etree.ElementTree as ET
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+df = pytest.importorskip('discretisedfield')
+md = pytest.importorskip('micromagneticdata')
+cvtk = pytest.importorskip('custom_vtk_export')
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of the VTK export: the `.vti` files are read back with NumPy (header, offsets, UInt64 block sizes and the
+x-fastest order of the cells), and a drive is exported as `.vti` frames indexed by a `.pvd` collection.
+"""
+PROGRAM_NAME = "test_custom_vtk_export.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+N_CELLS = (3, 4, 5)
+
+
+def read_vti(path):
+    """Return the XML header of a `.vti` (as text) and {name: (attributes, flat data)} of its appended arrays."""
+    with open(path, 'rb') as f:
+        contents = f.read()
+    start = contents.index(b'<AppendedData encoding="raw">\n   _') + len(b'<AppendedData encoding="raw">\n   _')
+    header = contents[:start].decode()
+
+    arrays = {}
+    for match in re.finditer(r'<DataArray ([^>]*)/>', header):
+        attributes = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1)))
+        offset = start + int(attributes['offset'])
+        nbytes = int(np.frombuffer(contents, dtype='<u8', count=1, offset=offset)[0])
+        dtype = {'Float32': '<f4', 'Float64': '<f8'}[attributes['type']]
+        data = np.frombuffer(contents, dtype=dtype, count=nbytes // np.dtype(dtype).itemsize, offset=offset + 8)
+        assert data.nbytes == nbytes
+        arrays[attributes['Name']] = (attributes, data)
+
+    assert contents.endswith(b'\n  </AppendedData>\n</VTKFile>\n')
+    return header, arrays
+
+
+def test_write_vti_appended_data(tmp_path):
+    rng = np.random.default_rng(0)
+    m = rng.normal(size=(*N_CELLS, 3))
+    energy = rng.normal(size=N_CELLS).astype(np.float32)
+    path = tmp_path / 'frame.vti'
+
+    cvtk.write_vti(str(path), {'m': m, 'energy': energy}, origin=(1e-9, 0, -2e-9), spacing=(2e-9, 3e-9, 1e-9))
+    header, arrays = read_vti(path)
+
+    assert 'WholeExtent="0 3 0 4 0 5"' in header
+    assert 'Origin="1e-09 0.0 -2e-09" Spacing="2e-09 3e-09 1e-09"' in header
+    assert '<CellData Vectors="m">' in header
+    assert 'header_type="UInt64"' in header
+
+    # Each block is a UInt64 size followed by the data; the offsets are counted from the '_'
+    (m_attributes, m_data), (energy_attributes, energy_data) = arrays['m'], arrays['energy']
+    assert (m_attributes['type'], m_attributes['NumberOfComponents'], m_attributes['offset']) == ('Float64', '3', '0')
+    assert (energy_attributes['type'], energy_attributes['NumberOfComponents']) == ('Float32', '1')
+    assert int(energy_attributes['offset']) == 8 + m.size * 8
+    assert energy_data.size == energy.size
+
+    # Cell (i, j, k) is at i + nx (j + ny k), with its components together
+    nx, ny, nz = N_CELLS
+    for i, j, k in np.ndindex(*N_CELLS):
+        cell = i + nx * (j + ny * k)
+        np.testing.assert_array_equal(m_data[3 * cell:3 * cell + 3], m[i, j, k])
+        assert energy_data[cell] == energy[i, j, k]
+
+
+def test_write_vti_checks_the_grid(tmp_path):
+    with pytest.raises(ValueError, match='cells'):
+        cvtk.write_vti(str(tmp_path / 'frame.vti'), {'m': np.zeros((*N_CELLS, 3)), 'energy': np.zeros((3, 4, 4))},
+                       origin=(0, 0, 0), spacing=(1, 1, 1))
+
+
+def test_write_pvd(tmp_path):
+    path = tmp_path / 'drive-0.pvd'
+    cvtk.write_pvd(str(path), ['drive-0_0000.vti', 'drive-0_0002.vti'], [0., 2.5e-12])
+
+    root = ET.parse(path).getroot()
+    assert root.get('type') == 'Collection'
+    datasets = root.findall('./Collection/DataSet')
+    assert [dataset.get('file') for dataset in datasets] == ['drive-0_0000.vti', 'drive-0_0002.vti']
+    assert [float(dataset.get('timestep')) for dataset in datasets] == [0., 2.5e-12]
+
+
+def _write_drive(dirname, n):
+    """Write a TimeDriver drive of `n` random snapshots, 1 ps apart; return it as an `md.Drive`."""
+    drive_dir = dirname / 'synthetic' / 'drive-0'
+    drive_dir.mkdir(parents=True)
+    (drive_dir / 'info.json').write_text(json.dumps({'drive_number': 0, 'driver': 'TimeDriver', 'n': n,
+                                                     't': n * 1e-12}))
+    rows = [f'{i} {(i + 1) * 1e-12} 0' for i in range(n)]
+    (drive_dir / 'synthetic.odt').write_text('\n'.join(
+        ['# ODT 1.0', '# Table Start', '# Title: mmArchive Data Table',
+         '# Columns: Oxs_TimeDriver::Iteration {Oxs_TimeDriver::Simulation time} Oxs_TimeDriver::mx',
+         '# Units: {} s {}'] + rows + ['# Table End']) + '\n')
+
+    mesh = df.Mesh(p1=(0, 0, 0), p2=tuple(2e-9 * n for n in N_CELLS), cell=(2e-9, 2e-9, 2e-9))
+    df.Field(mesh, nvdim=3, value=(0, 0, 1)).to_file(str(drive_dir / 'm0.omf'))
+    for i in range(n):
+        values = np.random.default_rng(i).normal(size=(*N_CELLS, 3))
+        df.Field(mesh, nvdim=3, value=values).to_file(
+            str(drive_dir / f'synthetic-Oxs_TimeDriver-Magnetization-{i:02d}-{i:07d}.omf'))
+    return md.Drive(name='synthetic', number=0, dirname=str(dirname))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_export_drive_vti(tmp_path, workers):
+    drive = _write_drive(tmp_path, 4)
+    pvd = cvtk.export_drive_vti(drive, str(tmp_path / 'vti'), frames=[3, 1], multiplier=1e-9, workers=workers)
+
+    assert pvd == str(tmp_path / 'vti' / 'drive-0.pvd')
+    datasets = ET.parse(pvd).getroot().findall('./Collection/DataSet')
+    assert [dataset.get('file') for dataset in datasets] == ['drive-0_0003.vti', 'drive-0_0001.vti']
+    assert [float(dataset.get('timestep')) for dataset in datasets] == pytest.approx([4e-12, 2e-12])
+
+    for frame, dataset in zip([3, 1], datasets):
+        header, arrays = read_vti(tmp_path / 'vti' / dataset.get('file'))
+        assert 'Spacing="2.0 2.0 2.0"' in header
+        attributes, data = arrays['m']
+        assert attributes['type'] == 'Float32'
+        expected = drive[frame].array.astype(np.float32)
+        np.testing.assert_array_equal(data.reshape(N_CELLS[::-1] + (3,)), np.transpose(expected, (2, 1, 0, 3)))
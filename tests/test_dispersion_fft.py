@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tutorials', 'ubermag_standard_problem_dmi_paper',
+                                'sims', 'spin_waves_sims', 'data_libs'))
+import dispersion_fft as dfft  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of the spectra of dispersion_fft.py against the reference the data scripts used,
+abs(fftshift(fft2(data * window))).
+"""
+PROGRAM_NAME = "test_dispersion_fft.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+# Even and odd numbers of time steps and positions, as the mirroring of the negative frequencies depends on them
+SHAPES = [(64, 48), (63, 48), (64, 47), (31, 17)]
+
+
+def _data(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(shape[0])[:, np.newaxis]
+    x = np.arange(shape[1])[np.newaxis, :]
+    return np.sin(0.3 * t - 0.5 * x) + 0.1 * rng.normal(size=shape)
+
+
+def _windowed(data, window='hanning'):
+    return data * np.outer(getattr(np, window)(data.shape[0]), getattr(np, window)(data.shape[1]))
+
+
+def _reference(data, window='hanning'):
+    return np.abs(np.fft.fftshift(np.fft.fft2(_windowed(data, window))))
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('mode', ['fft2', 'rfft'])
+def test_dispersion_spectrum_matches_fft2(shape, mode):
+    data = _data(shape)
+    spectrum = dfft.dispersion_spectrum(data.copy(), mode=mode)
+    np.testing.assert_allclose(spectrum, _reference(data), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_rfft_spectrum_float32(shape):
+    data = _data(shape)
+    spectrum = dfft.dispersion_spectrum(data.copy(), mode='rfft', precision='float32')
+    assert spectrum.dtype == np.float32
+    np.testing.assert_allclose(spectrum, _reference(data), rtol=1e-3, atol=1e-3)
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('block_bytes', [1, 2 ** 10, 2 ** 30])
+def test_out_of_core_spectrum_matches_fft2(tmp_path, shape, block_bytes):
+    data = _data(shape)
+    np.save(tmp_path / 'data.npy', data)
+    scratch_path = tmp_path / 'scratch.npy'
+
+    spectrum = dfft.out_of_core_spectrum(np.load(tmp_path / 'data.npy', mmap_mode='r'), str(tmp_path / 'out.npy'),
+                                         str(scratch_path), block_bytes=block_bytes)
+    np.testing.assert_allclose(spectrum, _reference(data), rtol=1e-10, atol=1e-10)
+    assert not scratch_path.exists()
+
+
+def test_scale_spectrum_in_blocks():
+    spectrum = np.abs(_data((40, 12))) + 0.1
+    expected = np.log10(spectrum ** 2)
+    np.testing.assert_allclose(dfft.scale_spectrum(spectrum, 'log10', block_bytes=100), expected)
+
+
+def test_crop_indices_symmetric():
+    ks = np.fft.fftshift(np.fft.fftfreq(20))
+    for limits in [(-0.1, 0.2), (-0.23, 0.1), (0., 0.6)]:
+        cropped = ks[dfft.crop_indices(ks, limits)]
+        # Covers +/- max(|limits|), with at most one more bin on each side
+        bound = np.max(np.abs(limits))
+        assert cropped[0] <= max(-bound, ks[0]) and cropped[-1] >= min(bound, ks[-1])
+        assert np.sum(np.abs(cropped) > bound) <= 2
+
+
+@pytest.mark.parametrize('mode', ['fft2', 'rfft'])
+def test_scipy_backend_matches_numpy(mode):
+    pytest.importorskip('scipy')
+    data = _data(SHAPES[1])
+    spectrum = dfft.dispersion_spectrum(data.copy(), mode=mode, backend=dfft.get_backend('scipy', workers=2))
+    np.testing.assert_allclose(spectrum, _reference(data), rtol=1e-10, atol=1e-10)
+
+
+def test_pyfftw_backend_reuses_plans():
+    pytest.importorskip('pyfftw')
+    backend = dfft.get_backend('pyfftw', workers=1)
+    for seed in range(3):
+        data = _data(SHAPES[0], seed)
+        np.testing.assert_allclose(dfft.dispersion_spectrum(data.copy(), mode='rfft', backend=backend),
+                                   _reference(data), rtol=1e-10, atol=1e-10)
+    assert len(backend.plans) == 2
+
+
+def test_get_backend_is_shared():
+    assert dfft.get_backend('numpy') is dfft.get_backend('numpy')
+    assert dfft.get_backend('numpy', workers=2) is not dfft.get_backend('numpy')
+    backend = dfft.FFTBackend('numpy')
+    assert dfft.get_backend(backend) is backend
+    with pytest.raises(ValueError, match='Unknown FFT backend'):
+        dfft.get_backend('fftpack')
+
+
+@pytest.mark.parametrize('overlap', [0., 0.5, 0.75])
+def test_short_time_spectra_segments(overlap):
+    data = _data((100, 24))
+    spectra, starts = dfft.short_time_spectra(data, segment_length=32, overlap=overlap, batch_size=3)
+
+    assert starts.shape == (len(spectra), 1)
+    for spectrum, (start,) in zip(spectra, starts):
+        np.testing.assert_allclose(spectrum, _reference(data[start:start + 32]), rtol=1e-10, atol=1e-10)
+
+
+def test_short_time_spectra_welch_average(tmp_path):
+    data = _data((100, 24))
+    out = np.lib.format.open_memmap(tmp_path / 'spectra.npy', mode='w+', dtype=np.float64, shape=(2, 32, 24))
+    spectra, starts = dfft.short_time_spectra(data, segment_length=32, overlap=0.5, average=2, out=out)
+
+    assert spectra is out
+    for spectrum, segment_starts in zip(spectra, starts):
+        power = np.mean([_reference(data[s:s + 32]) ** 2 for s in segment_starts], axis=0)
+        np.testing.assert_allclose(spectrum, np.sqrt(power), rtol=1e-10, atol=1e-10)
+
+    single, starts = dfft.short_time_spectra(data, segment_length=32, overlap=0.5, average=None)
+    assert single.shape == (1, 32, 24) and starts.shape == (1, 5)
+
+
+def test_segment_starts():
+    np.testing.assert_array_equal(dfft.segment_starts(100, 32, 0.5), [0, 16, 32, 48, 64])
+    np.testing.assert_array_equal(dfft.segment_starts(32, 32, 0.9), [0])
+    for segment_length, overlap in [(1, 0.5), (101, 0.5), (32, 1.)]:
+        with pytest.raises(ValueError):
+            dfft.segment_starts(100, segment_length, overlap)
+
+
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_band_spectrum_without_band_matches_fft2(shape):
+    data = _data(shape)
+    spectrum, freqs, ks = dfft.band_spectrum(data.copy(), dt=2., dx=3.)
+
+    np.testing.assert_allclose(spectrum, _reference(data), rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(freqs, np.fft.fftshift(np.fft.fftfreq(shape[0], d=2.)))
+    np.testing.assert_allclose(ks, np.fft.fftshift(np.fft.fftfreq(shape[1], d=3.)))
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+@pytest.mark.parametrize('fast', [False, True])
+def test_band_spectrum_padded_and_cropped(shape, fast):
+    data = _data(shape)
+    pad_factor = (2., 1.5)
+    f_range, k_range = (-0.2, 0.3), (-0.1, 0.25)
+    spectrum, freqs, ks = dfft.band_spectrum(data.copy(), pad_factor=pad_factor, fast=fast, f_range=f_range,
+                                             k_range=k_range)
+
+    # Zero padding after the window, then the rows and columns within the band
+    n_tf, n_xf = (dfft.spectral_length(n, pad, fast) for n, pad in zip(shape, pad_factor))
+    reference = np.abs(np.fft.fftshift(np.fft.fft2(_windowed(data), s=(n_tf, n_xf))))
+    all_freqs = np.fft.fftshift(np.fft.fftfreq(n_tf))
+    all_ks = np.fft.fftshift(np.fft.fftfreq(n_xf))
+    rows = (all_freqs >= f_range[0]) & (all_freqs <= f_range[1])
+    columns = (all_ks >= k_range[0]) & (all_ks <= k_range[1])
+
+    np.testing.assert_allclose(freqs, all_freqs[rows])
+    np.testing.assert_allclose(ks, all_ks[columns])
+    np.testing.assert_allclose(spectrum, reference[rows][:, columns], rtol=1e-10, atol=1e-10)
+
+
+def test_next_fast_length():
+    assert [dfft.next_fast_length(n) for n in (1, 7, 11, 97, 121, 1000)] == [1, 8, 12, 100, 125, 1000]
+    assert dfft.spectral_length(100, 1.5) == 150
+    assert dfft.spectral_length(101, 1., fast=True) == 108
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tutorials', 'ubermag_standard_problem_dmi_paper',
+                                'sims', 'spin_waves_sims', 'data_libs'))
+from generate_data import FidimagReader, OOMMFReader, OVFReader, extract  # noqa: E402
+from probes import CellsProbe, LineProbe, ProbeSet  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Round trips of synthetic snapshot files through the readers of generate_data.py (OVF 1 and 2, rectangular and
+irregular meshes, text and binary 4/8 data) and of the extraction engine, serial and across processes.
+"""
+PROGRAM_NAME = "test_generate_data.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+N_CELLS = (6, 4, 2)
+CELL = (2e-9, 3e-9, 5e-9)
+BINARY_CHECK = {4: 1234567.0, 8: 123456789012345.0}
+
+
+def _cell_centres(n_cells=N_CELLS, cell=CELL):
+    """(n, 3) cell centres with x changing the fastest, as OVF files store them."""
+    z, y, x = np.meshgrid(*((np.arange(n) + 0.5) * d for n, d in zip(n_cells[::-1], cell[::-1])), indexing='ij')
+    return np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+
+
+def write_ovf(path, values, version=2, data_format='binary 8', irregular=False, value_multiplier=None,
+              n_cells=N_CELLS, cell=CELL):
+    """Write the (n, 3) `values` of the cells of `_cell_centres` as an OVF file."""
+    coordinates = _cell_centres(n_cells, cell)
+    meshtype = 'irregular' if irregular else 'rectangular'
+
+    header = ['OOMMF OVF 2.0' if version == 2 else f'OOMMF: {meshtype} mesh v1.0',
+              'Segment count: 1', 'Begin: Segment', 'Begin: Header', 'Title: m',
+              f'meshtype: {meshtype}', 'meshunit: m']
+    header += [f'{k}min: 0' for k in 'xyz'] + [f'{k}max: {n * d}' for k, n, d in zip('xyz', n_cells, cell)]
+    if version == 2:
+        header += ['valuedim: 3', 'valuelabels: m_x m_y m_z', 'valueunits: A/m A/m A/m']
+    if value_multiplier is not None:
+        header.append(f'valuemultiplier: {value_multiplier}')
+    if irregular:
+        header += [f'pointcount: {len(coordinates)}'] + [f'{k}stepsize: {d}' for k, d in zip('xyz', cell)]
+    else:
+        header += [f'{k}base: {d / 2}' for k, d in zip('xyz', cell)]
+        header += [f'{k}nodes: {n}' for k, n in zip('xyz', n_cells)]
+        header += [f'{k}stepsize: {d}' for k, d in zip('xyz', cell)]
+    header += ['End: Header', f'Begin: Data {data_format.title()}']
+
+    columns = np.column_stack((coordinates, values)) if irregular else np.asarray(values)
+    with open(path, 'wb') as f:
+        f.write(''.join(f'# {line}\n' for line in header).encode())
+        if data_format == 'text':
+            np.savetxt(f, columns, fmt='%.17g')
+        else:
+            n_bytes = int(data_format.split()[-1])
+            dtype = np.dtype(f"{'<' if version == 2 else '>'}f{n_bytes}")
+            np.concatenate(([BINARY_CHECK[n_bytes]], columns.ravel())).astype(dtype).tofile(f)
+            f.write(b'\n')
+        f.write(f'# End: Data {data_format.title()}\n# End: Segment\n'.encode())
+
+
+def _random_values(seed=0, n=int(np.prod(N_CELLS))):
+    return np.random.default_rng(seed).normal(scale=8e5, size=(n, 3))
+
+
+@pytest.mark.parametrize('version', [1, 2])
+@pytest.mark.parametrize('data_format', ['text', 'binary 4', 'binary 8'])
+@pytest.mark.parametrize('irregular', [False, True])
+def test_ovf_round_trip(tmp_path, version, data_format, irregular):
+    values = _random_values()
+    path = tmp_path / 'm000001.ovf'
+    write_ovf(path, values, version, data_format, irregular)
+
+    reader = OVFReader()
+    header = reader.header(path)
+    assert header['format'] == data_format
+    assert header.get('version') == version
+
+    # Binary 4 files store float32 values, and the coordinates of irregular meshes with them
+    expected = values.astype(np.float32) if data_format == 'binary 4' else values
+    coordinates = _cell_centres()
+    if irregular and data_format == 'binary 4':
+        coordinates = coordinates.astype(np.float32)
+    np.testing.assert_allclose(reader.read(path), expected, rtol=1e-12)
+    np.testing.assert_allclose(reader.coordinates(path), coordinates, rtol=1e-12)
+
+
+def test_ovf_read_into_buffer_with_scale_and_multiplier(tmp_path):
+    values = _random_values(1)
+    path = tmp_path / 'm.omf'
+    write_ovf(path, values, version=1, data_format='binary 8', value_multiplier=2.)
+
+    out = np.empty_like(values)
+    read = OOMMFReader(Ms=8e5).read(path, out=out)
+    assert read is out
+    np.testing.assert_allclose(out, values * 2. / 8e5)
+
+
+def test_ovf_wrong_check_value(tmp_path):
+    path = tmp_path / 'm.ovf'
+    write_ovf(path, _random_values(), data_format='binary 8')
+    with open(path, 'r+b') as f:
+        f.seek(OVFReader().header(path)['offset'])
+        f.write(np.float64(1.).tobytes())
+
+    with pytest.raises(ValueError, match='check value'):
+        OVFReader().read(path)
+
+
+def test_ovf_matches_discretisedfield(tmp_path):
+    df = pytest.importorskip('discretisedfield')
+    mesh = df.Mesh(p1=(0, 0, 0), p2=tuple(n * d for n, d in zip(N_CELLS, CELL)), cell=CELL)
+    field = df.Field(mesh, nvdim=3, value=lambda point: (point[0] * 1e9, point[1] * 1e9 + 1., point[2] * 1e9 - 1.))
+
+    for representation in ('txt', 'bin4', 'bin8'):
+        path = tmp_path / f'm_{representation}.omf'
+        field.to_file(str(path), representation=representation)
+        # df stores (nx, ny, nz, 3); OVF files have x changing the fastest
+        expected = field.array.transpose(2, 1, 0, 3).reshape(-1, 3)
+        np.testing.assert_allclose(OVFReader().read(path), expected, rtol=1e-6)
+        np.testing.assert_allclose(OVFReader().coordinates(path), _cell_centres(), rtol=1e-9)
+
+
+def test_ovf_list_files_numeric_order(tmp_path):
+    for i in (10, 2, 1):
+        write_ovf(tmp_path / f'm{i:d}.ovf', _random_values(i))
+    (tmp_path / 'table.txt').write_text('')
+    assert OVFReader(prefix='m').list_files(tmp_path) == ['m1.ovf', 'm2.ovf', 'm10.ovf']
+
+
+def test_fidimag_reader_is_a_view(tmp_path):
+    values = _random_values(2)
+    path = tmp_path / 'm_1.npy'
+    np.save(path, values.ravel())
+
+    reader = FidimagReader(mesh_lengths=[n * d * 1e9 for n, d in zip(N_CELLS, CELL)],
+                           mesh_discretisation=[d * 1e9 for d in CELL])
+    read = reader.read(path)
+    assert isinstance(read.base, np.memmap) or isinstance(read, np.memmap)
+    np.testing.assert_array_equal(read, values)
+    np.testing.assert_allclose(reader.coordinates(path), _cell_centres() * 1e9)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_extract_subtracts_initial_state(tmp_path, workers):
+    frames = [_random_values(seed) for seed in range(5)]
+    m0 = _random_values(99)
+    write_ovf(tmp_path / 'm0.ovf', m0)
+    files = []
+    for i, values in enumerate(frames):
+        files.append(str(tmp_path / f'm{i:06d}.ovf'))
+        write_ovf(files[-1], values, data_format='binary 4' if i % 2 else 'binary 8')
+
+    probes = ProbeSet([CellsProbe('midline', fixed={'y': None}), LineProbe('line', axis='x')])
+    extract(OVFReader(), files, probes, initial_state=str(tmp_path / 'm0.ovf'), workers=workers)
+
+    for probe in probes:
+        for c, data in enumerate(probes.data[probe.name]):
+            expected = [(values.astype(np.float32) if i % 2 else values)[probe.indices, c] - m0[probe.indices, c]
+                        for i, values in enumerate(frames)]
+            np.testing.assert_allclose(data, expected, rtol=1e-12)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tutorials', 'ubermag_standard_problem_dmi_paper',
+                                'sims', 'spin_waves_sims', 'data_libs'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'include', 'custom_helper_files'))
+import pixel_binning as pb  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of the pooling of large matrices for plotting, and that the copy of it in data_libs/pixel_binning.py gives the
+same results as `custom_image_processing.pool_matrix` and `binned_imshow`.
+"""
+PROGRAM_NAME = "test_pixel_binning.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+MATRIX = np.random.default_rng(0).normal(size=(301, 97))
+
+
+@pytest.mark.parametrize('method', pb.POOLING)
+def test_pool_matrix_reduces_blocks(method):
+    pooled = pb.pool_matrix(MATRIX, (101, 33), method=method, q=90., band_bytes=2 ** 10)
+
+    # Blocks of ceil(301 / 101) x ceil(97 / 33) bins, the last ones partly outside the matrix
+    assert pooled.shape == (101, 33)
+    reduce = {'max': np.max, 'mean': np.mean, 'percentile': lambda block: np.percentile(block, 90.)}[method]
+    for i, j in [(0, 0), (50, 10), (100, 32)]:
+        assert pooled[i, j] == pytest.approx(reduce(MATRIX[3 * i:3 * i + 3, 3 * j:3 * j + 3]))
+
+
+def test_pool_matrix_keeps_small_matrices():
+    np.testing.assert_array_equal(pb.pool_matrix(MATRIX, (400, 100)), MATRIX)
+    with pytest.raises(ValueError):
+        pb.pool_matrix(MATRIX, (10, 10), method='median')
+
+
+@pytest.mark.parametrize('method', pb.POOLING)
+def test_copy_matches_custom_image_processing(method):
+    cip = pytest.importorskip('custom_image_processing')
+    matrix = MATRIX.copy()
+    matrix[:7, :5] = np.nan
+
+    np.testing.assert_array_equal(pb.pool_matrix(matrix, (50, 20), method, q=75., band_bytes=2 ** 10),
+                                  cip.pool_matrix(matrix, (50, 20), method, q=75., band_bytes=2 ** 10))
+
+
+@pytest.mark.parametrize('origin', ['upper', 'lower'])
+def test_binned_imshow_matches_custom_image_processing(origin):
+    cip = pytest.importorskip('custom_image_processing')
+    plt = pytest.importorskip('matplotlib.pyplot')
+
+    # A fresh axes each, as imshow changes the aspect (and so the position) of the axes
+    figs = [plt.figure(figsize=(1, 1), dpi=50) for _ in range(2)]
+    try:
+        images = [module.binned_imshow(fig.add_subplot(), MATRIX, origin=origin)
+                  for module, fig in zip((pb, cip), figs)]
+        np.testing.assert_array_equal(images[0].get_array(), images[1].get_array())
+        assert images[0].get_extent() == images[1].get_extent()
+        assert images[0].get_array().shape[0] < MATRIX.shape[0]
+    finally:
+        for fig in figs:
+            plt.close(fig)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tutorials', 'ubermag_standard_problem_dmi_paper',
+                                'sims', 'spin_waves_sims', 'data_libs'))
+from probes import ProbeSet, default_probes  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Checks of the default probes of the *_generate_data.py scripts: they must select exactly the cells (and save the
+coordinates) the original scripts did, so the datafile_m*.dat files keep their columns.
+"""
+PROGRAM_NAME = "test_probes.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+
+# ------------------------------ Implementations ------------------------------
+
+def _cell_centres(nx, ny, nz):
+    """(n, 3) cell centres with x changing the fastest, as in the OMF/OVF files and Fidimag meshes."""
+    z, y, x = np.meshgrid((np.arange(nz) + 0.5) * 2e-9, (np.arange(ny) + 0.5) * 3e-9, (np.arange(nx) + 0.5) * 1e-9,
+                          indexing='ij')
+    return np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+
+
+@pytest.mark.parametrize('n_cells', [(5, 4, 1), (5, 4, 3), (6, 5, 2)])
+@pytest.mark.parametrize('backend', ['oommf', 'mumax', 'fidimag'])
+def test_default_probe_matches_original_masks(backend, n_cells):
+    nx, ny, nz = n_cells
+    coordinates = _cell_centres(nx, ny, nz)
+    probe = ProbeSet(default_probes(backend)).compile(coordinates).probes[0]
+
+    if backend == 'mumax':
+        # MUMAX_generate_data.py saved every cell
+        indices, x_coordinates = np.arange(len(coordinates)), coordinates[:, 0][:nx]
+    else:
+        # OOMMF and Fidimag: the y-midplane, with every z layer
+        mask = coordinates[:, 1] == coordinates[:, 1][nx * int(ny * 0.5)]
+        indices = np.flatnonzero(mask)
+        x_coordinates = coordinates[:, 0][mask] if backend == 'fidimag' else coordinates[:, 0][:nx]
+
+    np.testing.assert_array_equal(probe.indices, indices)
+    np.testing.assert_array_equal(probe.coordinates, x_coordinates)
+
+
+def test_default_probe_keeps_file_names():
+    probes = ProbeSet(default_probes('oommf'))
+    probe = probes.probes[0]
+    assert probes.file_name(probe, 'x', '_run') == 'datafile_mx_run.dat'
+    assert probes.coordinates_file_name(probe, '_run') == 'mesh_x-coordinates_run.dat'
+
+
+def test_default_probe_sample_is_dynamic_part():
+    coordinates = _cell_centres(5, 4, 3)
+    rng = np.random.default_rng(0)
+    m0, m1 = rng.normal(size=(2, len(coordinates), 3))
+
+    probes = ProbeSet(default_probes('mumax')).compile(coordinates)
+    probes.set_reference(m0)
+    probes.allocate(1)
+    probes.fill(0, m1)
+
+    for c, data in enumerate(probes.data['midline']):
+        np.testing.assert_allclose(data[0], m1[:, c] - m0[:, c])
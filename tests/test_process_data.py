@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# -------------------------- Preprocessing Directives -------------------------
+
+# Standard Libraries
+import os as os
+import sys as sys
+
+# 3rd Party packages
+import numpy as np
+import pytest
+
+# My packages/Header files
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tutorials', 'ubermag_standard_problem_dmi_paper',
+                                'sims', 'spin_waves_sims', 'data_libs'))
+pytest.importorskip('spectrum')
+import process_data as pd_  # noqa: E402
+
+# ----------------------------- Program Information ----------------------------
+
+"""
+Runs of process_data.py on small synthetic datasets (written as by the *_generate_data.py scripts) in a temporary
+directory: the batch mode must give every (dataset, component) the spectrum of a run on its own.
+"""
+PROGRAM_NAME = "test_process_data.py"
+"""
+Created on 19 Oct 26 by Cameron Aidan McEleney
+"""
+
+# ------------------------------ Implementations ------------------------------
+
+N_T, N_X = 64, 40
+TIME_STEP = 1e-12
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Datasets 'a' and 'b' with the components x and y, as text and NPY files."""
+    plt = pytest.importorskip('matplotlib.pyplot')
+    plt.switch_backend('Agg')
+    monkeypatch.chdir(tmp_path)
+
+    rng = np.random.default_rng(0)
+    t = np.arange(N_T)[:, np.newaxis]
+    x = np.arange(N_X)[np.newaxis, :]
+    for name in ('a', 'b'):
+        np.savetxt(f'mesh_x-coordinates_{name}.dat', (np.arange(N_X) + 0.5) * 2.)
+        for i, m_i in enumerate('xy'):
+            data = np.sin(0.2 * (i + 1) * t - 0.3 * x) + 0.1 * rng.normal(size=(N_T, N_X))
+            if name == 'a':
+                np.savetxt(f'datafile_m{m_i}_{name}.dat', data)
+            else:
+                np.save(f'datafile_m{m_i}_{name}.npy', data)
+    yield tmp_path
+    plt.close('all')
+
+
+def _run(*argv):
+    pd_.main(['--time_step', str(TIME_STEP), '--pixel_pooling', 'none'] + list(argv))
+
+
+def test_job_names():
+    args = pd_.parser.parse_args(['--m_i', 'x', 'y', '--out_name', 'a', '--get_data', 'out'])
+    job = pd_.Job(args, 'a', 'y')
+    assert (job.out_name, job.pdf_name, job.get_data) == ('_a', 'spectra_a_my', 'out_my')
+
+    args = pd_.parser.parse_args(['--out_name', 'a', 'b', '--pdf_name', 'fig'])
+    job = pd_.Job(args, 'b', 'x')
+    assert (job.pdf_name, job.get_data) == ('fig_b', None)
+
+    args = pd_.parser.parse_args([])
+    job = pd_.Job(args, '', 'x')
+    assert (job.out_name, job.pdf_name) == ('', 'spectra')
+
+
+def test_shared_arrays_are_computed_once():
+    shared = pd_.SharedArrays(pd_.parser.parse_args(['--time_step', '1e-12']))
+    assert shared.windows((N_T, N_X)) is shared.windows((N_T, N_X))
+    assert shared.freqs(N_T) is shared.freqs(N_T)
+    x = np.arange(N_X) * 2.
+    assert shared.ks(x) is shared.ks(x + 1.)
+    np.testing.assert_allclose(shared.freqs(N_T), np.fft.fftshift(np.fft.fftfreq(N_T, d=1e-12)) / 1e9)
+    np.testing.assert_allclose(shared.ks(x), np.fft.fftshift(np.fft.fftfreq(N_X, d=2.)) * 2 * np.pi)
+
+
+@pytest.mark.parametrize('batch_workers', ['1', '4'])
+def test_batch_matches_single_runs(data_dir, batch_workers):
+    _run('--m_i', 'x', 'y', '--out_name', 'a', 'b', '--get_data', 'batch', '--batch_workers', batch_workers)
+
+    for name in ('a', 'b'):
+        for m_i in 'xy':
+            _run('--m_i', m_i, '--out_name', name, '--get_data', 'single')
+            assert os.path.exists(f'spectra_{name}_m{m_i}.pdf')
+            for suffix in ('.dat', '_freqs.dat', '_ks.dat'):
+                np.testing.assert_array_equal(np.loadtxt(f'batch_{name}_m{m_i}{suffix}'),
+                                              np.loadtxt(f'single{suffix}'))
+
+
+@pytest.mark.parametrize('option', [['--fast_length'], ['--pad_factor', '2', '1'], ['--crop_band']])
+def test_out_of_core_rejects_band_options(data_dir, option, capsys):
+    with pytest.raises(SystemExit):
+        _run('--out_name', 'b', '--out_of_core', *option)
+    assert 'can not be used with --out_of_core' in capsys.readouterr().err
@@ -24,7 +24,7 @@ fig = mlab.figure(bgcolor=(1, 1, 1), fgcolor=(0, 0, 0), size=(1500, 800))
 
 # Read the last file from the base directory
 base_dir = '../fidimag_3D_vtks/'
-data = mlab.pipeline.open(base_dir + os.listdir(base_dir)[-1])
+data = mlab.pipeline.open(base_dir + sorted(os.listdir(base_dir))[-1])
 
 # Extract vec comp and plot
 vecomp = mlab.pipeline.extract_vector_components(data)
@@ -0,0 +1,489 @@
+from __future__ import print_function
+
+import os
+import threading
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Fourier transforms of the space-time data matrices for process_data.py
+#
+# The data matrices have one row per time step and one column per position
+# along the sample. Every function returns the amplitude |F(f, k)| shifted with
+# the zero frequency and wave vector at the centre, i.e. the same matrix as
+#
+#   abs(np.fft.fftshift(np.fft.fft2(data * window)))
+# -----------------------------------------------------------------------------
+
+PRECISIONS = {'float32': np.float32, 'float64': np.float64}
+
+FFT_BACKENDS = ('numpy', 'scipy', 'pyfftw')
+
+
+class FFTBackend(object):
+    """
+    The FFT functions used by this module (fft2, rfft and fft along one axis).
+
+    numpy: single threaded np.fft
+    scipy: scipy.fft with `workers` threads (-1 for all the cores); scipy
+           keeps its own cache of plans per shape and dtype
+    pyfftw: FFTW plans from pyfftw.builders with `workers` threads. A plan is
+            built the first time a (transform, shape, dtype, axis) is seen and
+            reused by every later call with the same arguments, e.g. for the
+            mx, my and mz data of every drive of a sweep
+
+    Use get_backend, so the plans are shared by every caller in the process
+    """
+
+    def __init__(self, name='numpy', workers=1):
+        if name not in FFT_BACKENDS:
+            raise ValueError('Unknown FFT backend {}; use one of: {}'.format(
+                name, ', '.join(FFT_BACKENDS)))
+        self.name = name
+        self.workers = workers
+        self.plans = {}
+        # A plan owns its input and output arrays, so it can't be executed
+        # by two threads at the same time (see process_data.py batches)
+        self._lock = threading.Lock()
+
+        if name == 'scipy':
+            import scipy.fft
+            self._module = scipy.fft
+        elif name == 'pyfftw':
+            try:
+                import pyfftw
+                import pyfftw.builders
+            except ImportError:
+                raise ImportError('The pyfftw FFT backend needs pyFFTW '
+                                  '(pip install pyfftw); use --fft_backend '
+                                  'scipy instead')
+            self._module = pyfftw.builders
+            if workers is None or workers < 1:
+                self.workers = os.cpu_count()
+        else:
+            self._module = np.fft
+
+    def _plan(self, transform, data, axis):
+        key = (transform, data.shape, data.dtype.str, axis)
+        with self._lock:
+            if key not in self.plans:
+                builder = getattr(self._module, transform)
+                if axis is None:
+                    kwargs = {'axes': (-2, -1)}
+                else:
+                    kwargs = {'axis': axis}
+                self.plans[key] = builder(data, threads=self.workers,
+                                          planner_effort='FFTW_MEASURE',
+                                          **kwargs)
+            # The output array of a plan is overwritten by its next call
+            return self.plans[key](data).copy()
+
+    def _transform(self, transform, data, axis=None):
+        if self.name == 'pyfftw':
+            return self._plan(transform, data, axis)
+        kwargs = {} if axis is None else {'axis': axis}
+        if self.name == 'scipy':
+            kwargs['workers'] = self.workers
+        return getattr(self._module, transform)(data, **kwargs)
+
+    def fft2(self, data):
+        # Over the last two axes, so stacks of matrices are transformed at once
+        return self._transform('fft2', data)
+
+    def rfft(self, data, axis=0):
+        return self._transform('rfft', data, axis)
+
+    def fft(self, data, axis=1):
+        return self._transform('fft', data, axis)
+
+
+_backends = {}
+
+
+def get_backend(name='numpy', workers=1):
+    """
+    FFTBackend for `name` and `workers`, created once per process so its
+    plans are reused across calls
+    """
+    if isinstance(name, FFTBackend):
+        return name
+    if (name, workers) not in _backends:
+        _backends[(name, workers)] = FFTBackend(name, workers)
+    return _backends[(name, workers)]
+
+
+def window_arrays(shape, window='hanning', dtype=np.float64):
+    """
+    1D window functions for the time (rows) and space (columns) axes. We can
+    use: blackman, hanning, hamming, bartlett (numpy window functions)
+    """
+    window_f = getattr(np, window)
+    return (window_f(shape[0]).astype(dtype),
+            window_f(shape[1]).astype(dtype))
+
+
+def apply_window(data, window='hanning', windows=None):
+    """
+    Multiply `data` in place by the outer product of the time and space
+    windows, by broadcasting the 1D windows (no meshgrid is created)
+    """
+    if windows is None:
+        windows = window_arrays(data.shape, window, data.dtype)
+    times_filter, x_filter = windows
+    data *= times_filter[:, np.newaxis]
+    data *= x_filter[np.newaxis, :]
+    return data
+
+
+def fft2_spectrum(data, backend='numpy'):
+    """
+    Shifted amplitude of the complex 2D FFT
+    """
+    return abs(np.fft.fftshift(get_backend(backend).fft2(data)))
+
+
+def _fill_shifted(out, half, n_t, n_x):
+    """
+    Fill the shifted full spectrum `out` (n_t, n_x) from the amplitudes of the
+    non-negative frequencies `half` (n_t // 2 + 1, n_x), not shifted along k.
+    For real data F(-f, -k) = conj(F(f, k)), so the negative frequency rows
+    are the positive ones reversed in both f and k
+    """
+    k_index = np.fft.fftshift(np.arange(n_x))
+    n_neg = n_t // 2
+    n_pos = n_t - n_neg
+
+    # f >= 0: rows n_neg, n_neg + 1, ... of the shifted spectrum
+    np.take(half[:n_pos], k_index, axis=1, out=out[n_neg:], mode='wrap')
+    # f < 0: row r has frequency r - n_neg, i.e. the row n_neg - r of `half`
+    # at wave vector -k
+    np.take(half[n_neg:0:-1], -k_index % n_x, axis=1, out=out[:n_neg],
+            mode='wrap')
+    return out
+
+
+def rfft_spectrum(data, backend='numpy'):
+    """
+    Shifted amplitude of the 2D FFT of real `data`, computed with a real
+    input FFT along time (only the non-negative frequencies) and a complex
+    FFT along space. The negative frequencies are filled from the symmetry of
+    the spectrum of real data. Roughly half the memory and time of
+    fft2_spectrum; the precision (float32 or float64) of `data` is kept
+    """
+    backend = get_backend(backend)
+    n_t, n_x = data.shape
+    half = backend.rfft(data, axis=0)
+    half = backend.fft(half, axis=1)
+    half = np.abs(half)
+
+    out = np.empty((n_t, n_x), dtype=half.dtype)
+    return _fill_shifted(out, half, n_t, n_x)
+
+
+def dispersion_spectrum(data, window='hanning', mode='fft2',
+                        precision='float64', windows=None,
+                        backend='numpy'):
+    """
+    Window `data` and compute its shifted 2D amplitude spectrum.
+
+    mode: 'fft2' (complex 2D FFT) or 'rfft' (real input FFT along time)
+    precision: 'float32' or 'float64'. The data is converted (or windowed in
+    place, if it already has that precision)
+    backend: name of an FFT backend (see FFTBackend) or an FFTBackend
+    """
+    dtype = PRECISIONS[precision]
+    data = np.asarray(data)
+    if data.dtype != dtype:
+        data = data.astype(dtype)
+    apply_window(data, window, windows)
+
+    if mode == 'rfft':
+        return rfft_spectrum(data, backend)
+    elif mode == 'fft2':
+        return fft2_spectrum(data, backend)
+    raise ValueError('Unknown FFT mode {}; use fft2 or rfft'.format(mode))
+
+
+# Padded and band limited spectra ---------------------------------------------
+
+def next_fast_length(n):
+    """
+    Smallest length >= n whose only prime factors are 2, 3 and 5, for which
+    the FFTs are fastest (prime lengths can be many times slower)
+    """
+    n = max(int(n), 1)
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+def spectral_length(n, pad_factor=1., fast=False):
+    """
+    FFT length of an axis of `n` samples, zero padded by `pad_factor` (finer
+    frequency or wave vector grid) and, with `fast`, increased to the next
+    fast length
+    """
+    length = int(np.ceil(n * pad_factor))
+    return next_fast_length(length) if fast else length
+
+
+def _within(values, limits):
+    if limits is None:
+        return np.ones(len(values), dtype=bool)
+    return (values >= limits[0]) & (values <= limits[1])
+
+
+def band_spectrum(data, dt=1., dx=1., window='hanning', precision='float64',
+                  pad_factor=(1., 1.), fast=False, f_range=None, k_range=None,
+                  windows=None, backend='numpy'):
+    """
+    Shifted amplitude spectrum of `data` (n_t, n_x) with zero padding, fast
+    FFT lengths and cropping to a band of frequencies and wave vectors.
+
+    The real input FFT along time is computed first (zero padded to the FFT
+    length) and only the frequency rows inside `f_range` are transformed
+    along space, so only the band that is plotted is transformed. Negative
+    frequencies reuse the rows of the positive ones (symmetry of real data).
+
+    dt, dx: sample spacings of the time and space axes
+    pad_factor: zero padding factors of the (time, space) axes
+    fast: increase the FFT lengths to the next fast length
+    f_range, k_range: (min, max) in cycles per unit of dt and dx; the whole
+    axis if None
+
+    Returns (spectrum, freqs, ks), with the frequencies and wave vectors (in
+    cycles per unit) of the rows and columns
+    """
+    backend = get_backend(backend)
+    dtype = PRECISIONS[precision]
+    data = np.asarray(data)
+    if data.dtype != dtype:
+        data = data.astype(dtype)
+    apply_window(data, window, windows)
+
+    n_t, n_x = data.shape
+    n_tf = spectral_length(n_t, pad_factor[0], fast)
+    n_xf = spectral_length(n_x, pad_factor[1], fast)
+
+    # Signed frequency index of the rows of the shifted spectrum
+    signed = np.fft.fftshift(np.arange(n_tf))
+    signed = np.where(signed > (n_tf - 1) // 2, signed - n_tf, signed)
+    freqs = signed / (n_tf * dt)
+    f_rows = _within(freqs, f_range)
+    signed, freqs = signed[f_rows], freqs[f_rows]
+
+    ks = np.fft.fftshift(np.fft.fftfreq(n_xf, d=dx))
+    k_cols = _within(ks, k_range)
+    columns = np.fft.fftshift(np.arange(n_xf))[k_cols]
+    ks = ks[k_cols]
+
+    if n_tf != n_t:
+        padded = np.zeros((n_tf, n_x), dtype=dtype)
+        padded[:n_t] = data
+        data = padded
+    half = backend.rfft(data, axis=0)
+    del data
+
+    # Only the rows of the band are transformed along space
+    needed = np.unique(np.abs(signed))
+    band = np.zeros((len(needed), n_xf), dtype=half.dtype)
+    band[:, :n_x] = half[needed]
+    del half
+    band = np.abs(backend.fft(band, axis=1)).astype(dtype)
+
+    # -f has the amplitude of f at -k
+    rows = np.searchsorted(needed, np.abs(signed))
+    spectrum = np.where((signed >= 0)[:, np.newaxis],
+                        band[rows][:, columns],
+                        band[rows][:, -columns % n_xf])
+    return spectrum, freqs, ks
+
+
+# Out-of-core transforms ------------------------------------------------------
+
+def _block_length(n_lines, line_bytes, block_bytes):
+    return int(max(1, min(n_lines, block_bytes // max(line_bytes, 1))))
+
+
+def out_of_core_spectrum(data, out_path, scratch_path, window='hanning',
+                         precision='float64', block_bytes=256 * 2 ** 20,
+                         backend='numpy'):
+    """
+    Shifted amplitude spectrum of a space-time matrix that does not fit in
+    memory. `data` is a (n_t, n_x) array, usually memory mapped with
+    np.load(..., mmap_mode='r').
+
+    1. Blocks of columns are windowed and transformed along time (real input
+       FFT) into a memory mapped intermediate file at `scratch_path`
+    2. Blocks of rows of the intermediate are transformed along space, and
+       their amplitudes written (and mirrored to the negative frequencies)
+       into a memory mapped NPY file at `out_path`, which is returned
+
+    Every block holds at most about `block_bytes` bytes, which sets the peak
+    memory, whatever the size of the data. The scratch file is removed at the
+    end
+    """
+    backend = get_backend(backend)
+    dtype = PRECISIONS[precision]
+    cdtype = np.result_type(dtype, np.complex64)
+    n_t, n_x = data.shape
+    n_f = n_t // 2 + 1
+    n_neg = n_t // 2
+    n_pos = n_t - n_neg
+
+    times_filter, x_filter = window_arrays(data.shape, window, dtype)
+    k_index = np.fft.fftshift(np.arange(n_x))
+    neg_k_index = -k_index % n_x
+
+    half = np.lib.format.open_memmap(scratch_path, mode='w+', dtype=cdtype,
+                                     shape=(n_f, n_x))
+    try:
+        # Time axis, in blocks of columns
+        n_cols = _block_length(n_x, n_t * np.dtype(cdtype).itemsize,
+                               block_bytes)
+        for c0 in range(0, n_x, n_cols):
+            c1 = min(c0 + n_cols, n_x)
+            block = np.array(data[:, c0:c1], dtype=dtype)
+            block *= times_filter[:, np.newaxis]
+            block *= x_filter[np.newaxis, c0:c1]
+            half[:, c0:c1] = backend.rfft(block, axis=0)
+        half.flush()
+
+        out = np.lib.format.open_memmap(out_path, mode='w+', dtype=dtype,
+                                        shape=(n_t, n_x))
+
+        # Space axis, in blocks of rows (non-negative frequencies f)
+        n_rows = _block_length(n_f, n_x * np.dtype(cdtype).itemsize,
+                               block_bytes)
+        for f0 in range(0, n_f, n_rows):
+            f1 = min(f0 + n_rows, n_f)
+            block = np.abs(backend.fft(half[f0:f1], axis=1)).astype(dtype)
+
+            # f >= 0 goes to the shifted row n_neg + f
+            p1 = min(f1, n_pos)
+            if f0 < p1:
+                out[n_neg + f0:n_neg + p1] = block[:p1 - f0][:, k_index]
+            # f > 0 is mirrored to -f, at the shifted row n_neg - f, with -k
+            m0, m1 = max(f0, 1), min(f1, n_neg + 1)
+            if m0 < m1:
+                mirrored = block[m0 - f0:m1 - f0][:, neg_k_index]
+                out[n_neg - m1 + 1:n_neg - m0 + 1] = mirrored[::-1]
+        out.flush()
+    finally:
+        del half
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+
+    return out
+
+
+def scale_spectrum(spectrum, scale, block_bytes=256 * 2 ** 20):
+    """
+    Apply the spectra scale (log10 or power2 of the amplitude) in place, in
+    blocks of rows, so it also works on memory mapped spectra. Any other
+    scale leaves the amplitude unchanged
+    """
+    if scale not in ('log10', 'power2'):
+        return spectrum
+    n_rows = _block_length(len(spectrum),
+                           spectrum.shape[1] * spectrum.dtype.itemsize,
+                           block_bytes)
+    for r0 in range(0, len(spectrum), n_rows):
+        block = spectrum[r0:r0 + n_rows]
+        np.square(block, out=block)
+        if scale == 'log10':
+            with np.errstate(divide='ignore'):
+                np.log10(block, out=block)
+    return spectrum
+
+
+def crop_indices(values, limits):
+    """
+    Slice of the (sorted) axis `values` within +/- max(|limits|), so the
+    cropped spectrum keeps the symmetric extent used by the plots
+    """
+    bound = np.max(np.abs(limits))
+    i0, i1 = np.searchsorted(values, [-bound, bound], side='left')
+    i1 = min(i1 + 1, len(values))
+    return slice(int(max(i0 - 1, 0)), int(i1))
+
+
+# Short-time (time resolved) spectra ------------------------------------------
+
+def segment_starts(n_t, segment_length, overlap=0.5):
+    """
+    First time step of every segment of `segment_length` steps, where
+    consecutive segments share a fraction `overlap` of their steps
+    """
+    if not 1 < segment_length <= n_t:
+        raise ValueError('The segment length must be between 2 and the number '
+                         'of time steps ({})'.format(n_t))
+    if not 0 <= overlap < 1:
+        raise ValueError('The segment overlap must be in [0, 1)')
+    hop = max(1, int(round(segment_length * (1 - overlap))))
+    return np.arange(0, n_t - segment_length + 1, hop)
+
+
+def short_time_spectra(data, segment_length, overlap=0.5, window='hanning',
+                       precision='float64', average=1, batch_size=8,
+                       backend='numpy', out=None):
+    """
+    Time resolved dispersion: shifted amplitude spectra of overlapping time
+    segments of `data` (n_t, n_x), which can be memory mapped, since only
+    `batch_size` segments are read (and transformed at once, as a stack) at a
+    time. Every segment is windowed along time and space.
+
+    average: number of consecutive segments whose powers are averaged into
+             one output spectrum (Welch averaging); None averages all of them
+             into a single spectrum. Averages are returned as amplitudes,
+             sqrt(mean |F|^2), like the other spectra of this module
+
+    Returns (spectra, starts): spectra has shape (n_out, segment_length, n_x)
+    and is written into `out` if given (e.g. a memmap); starts are the first
+    time steps of the segments of every output spectrum, shape (n_out,
+    average)
+    """
+    backend = get_backend(backend)
+    dtype = PRECISIONS[precision]
+    n_t, n_x = data.shape
+    starts = segment_starts(n_t, segment_length, overlap)
+    if average is None:
+        average = len(starts)
+    n_out = len(starts) // average
+    if n_out == 0:
+        raise ValueError('Not enough segments ({}) to average {} of '
+                         'them'.format(len(starts), average))
+    starts = starts[:n_out * average].reshape(n_out, average)
+
+    if out is None:
+        out = np.zeros((n_out, segment_length, n_x), dtype=dtype)
+    else:
+        out[...] = 0
+    times_filter, x_filter = window_arrays((segment_length, n_x), window,
+                                           dtype)
+    flat_starts = starts.ravel()
+    batch_size = max(1, batch_size)
+
+    for b0 in range(0, len(flat_starts), batch_size):
+        batch_starts = flat_starts[b0:b0 + batch_size]
+        segments = np.empty((len(batch_starts), segment_length, n_x),
+                            dtype=dtype)
+        for i, s in enumerate(batch_starts):
+            segments[i] = data[s:s + segment_length]
+        segments *= times_filter[np.newaxis, :, np.newaxis]
+        segments *= x_filter[np.newaxis, np.newaxis, :]
+
+        power = np.abs(backend.fft2(segments)) ** 2
+        power = np.fft.fftshift(power, axes=(-2, -1)).astype(dtype)
+        # Accumulate the power of every segment into its output spectrum
+        np.add.at(out, np.arange(b0, b0 + len(batch_starts)) // average,
+                  power)
+
+    out /= average
+    np.sqrt(out, out=out)
+    return out, starts
@@ -0,0 +1,468 @@
+from __future__ import print_function
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from os import listdir
+
+import numpy as np
+import pandas as pd
+
+from probes import ProbeSet, default_probes, load_probe_spec
+
+# -----------------------------------------------------------------------------
+# Shared engine of the OOMMF, MUMAX and Fidimag *_generate_data.py scripts
+#
+# A reader knows how to list, sort and decode the snapshot files of one
+# simulation package. The engine streams the files through a single frame
+# buffer, fills all the probes (see probes.py) from it, optionally splits the
+# files among several processes, and saves the data as text or binary files
+# with the same naming for every backend:
+#
+#   mesh_x-coordinates{_out_name}.dat  and  datafile_m{x,y,z}{_out_name}.dat
+#
+# New backends are added by subclassing SnapshotReader and registering the
+# class in READERS.
+# -----------------------------------------------------------------------------
+
+
+class SnapshotReader(object):
+    """
+    Base class of the readers. `read(path, out)` returns the magnetisation of
+    a snapshot as a (n, 3) array, decoded into `out` when it is given, and
+    `coordinates(path)` the (n, 3) coordinates of the mesh cells in the same
+    order. Coordinates are multiplied by `coordinates_scale` when saved
+    """
+    name = None
+    coordinates_scale = 1.
+
+    def list_files(self, path):
+        raise NotImplementedError
+
+    def coordinates(self, path):
+        raise NotImplementedError
+
+    def read(self, path, out=None):
+        raise NotImplementedError
+
+
+class OVFReader(SnapshotReader):
+    """
+    Reader of OVF files (versions 1 and 2) with rectangular or irregular
+    meshes, in text or binary (4 or 8 bytes) format. Values are multiplied by
+    `scale`, e.g. 1 / Ms to normalise the magnetisation
+    """
+    name = 'ovf'
+    # Coordinates are saved in nm
+    coordinates_scale = 1e9
+    extensions = ('.omf', '.ovf')
+
+    # Control values at the start of the binary data
+    BINARY_CHECK = {4: 1234567.0, 8: 123456789012345.0}
+
+    def __init__(self, scale=1., prefix=''):
+        self.scale = scale
+        self.prefix = prefix
+
+    def sort_key(self, f):
+        return [int(n) for n in re.findall(r'[0-9]+', f)]
+
+    def list_files(self, path):
+        file_list = [_file for _file in listdir(path)
+                     if _file.startswith(self.prefix)
+                     and _file.endswith(self.extensions)]
+        return sorted(file_list, key=self.sort_key)
+
+    def header(self, path):
+        """
+        Parse the header of an OVF file. Returns a dictionary with the header
+        fields, the data format ('text', 'binary 4' or 'binary 8') and the
+        byte offset of the data
+        """
+        header = {}
+        with open(path, 'rb') as f:
+            for line in f:
+                line = line.decode('latin-1').lstrip('#').strip()
+                if line.lower().startswith('begin: data'):
+                    header['format'] = line[len('begin: data'):].strip().lower()
+                    header['offset'] = f.tell()
+                    break
+                if line.startswith('OOMMF'):
+                    header['version'] = 2 if '2.0' in line else 1
+                elif ':' in line:
+                    key, value = line.split(':', 1)
+                    header[key.strip().lower()] = value.strip()
+        return header
+
+    def _n_columns(self, header):
+        # Irregular meshes store the cell coordinates before the values
+        n_values = int(header.get('valuedim', 3))
+        if header.get('meshtype', 'rectangular') == 'irregular':
+            return 3 + n_values
+        return n_values
+
+    def _n_points(self, header):
+        if header.get('meshtype', 'rectangular') == 'irregular':
+            return int(header['pointcount'])
+        return int(np.prod([int(header[k + 'nodes']) for k in 'xyz']))
+
+    def _load(self, path, header):
+        """
+        Return all the columns of the data block as a (n, n_columns) array
+        """
+        n_points, n_columns = self._n_points(header), self._n_columns(header)
+
+        if header['format'] == 'text':
+            data = pd.read_csv(path, comment='#', header=None, sep=r'\s+',
+                               dtype=np.float64, engine='c')
+            return data.values.reshape(n_points, n_columns)
+
+        n_bytes = int(header['format'].split()[-1])
+        byteorder = '<' if header.get('version', 2) == 2 else '>'
+        data = np.fromfile(path, dtype='{}f{}'.format(byteorder, n_bytes),
+                           count=1 + n_points * n_columns,
+                           offset=header['offset'])
+        if data[0] != self.BINARY_CHECK[n_bytes]:
+            raise ValueError('Wrong binary check value in {}'.format(path))
+        return data[1:].reshape(n_points, n_columns)
+
+    def coordinates(self, path):
+        header = self.header(path)
+        if header.get('meshtype', 'rectangular') == 'irregular':
+            return self._load(path, header)[:, :3].copy()
+
+        # Rectangular meshes: cell centres, with x changing the fastest
+        axes = [float(header[k + 'base'])
+                + float(header[k + 'stepsize']) * np.arange(int(header[k + 'nodes']))
+                for k in 'xyz']
+        z, y, x = np.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
+        return np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+
+    def read(self, path, out=None):
+        header = self.header(path)
+        values = self._load(path, header)[:, -3:]
+        scale = self.scale * float(header.get('valuemultiplier', 1.))
+        if out is None:
+            out = np.empty(values.shape)
+        np.multiply(values, scale, out=out)
+        return out
+
+
+class OOMMFReader(OVFReader):
+    name = 'oommf'
+
+    def __init__(self, Ms=1.15e6, prefix='SWDynamics-Oxs_TimeDriver'):
+        super(OOMMFReader, self).__init__(scale=1. / Ms, prefix=prefix)
+
+
+class MumaxReader(OVFReader):
+    name = 'mumax'
+
+    def __init__(self, prefix='m'):
+        super(MumaxReader, self).__init__(scale=1., prefix=prefix)
+
+
+class FidimagReader(SnapshotReader):
+    """
+    Direct reader of the NPY files saved by Fidimag. Every file is memory
+    mapped and reshaped to (n, 3) as a view, so the probes only gather the
+    cells they need with their integer indices: no Fidimag simulation is
+    created and no snapshot is copied in full. The cell coordinates (in nm)
+    are those of a fidimag.common.CuboidMesh: cell centres with x changing the
+    fastest
+    """
+    name = 'fidimag'
+
+    def __init__(self, mesh_lengths, mesh_discretisation):
+        self.mesh_lengths = mesh_lengths
+        self.mesh_discretisation = mesh_discretisation
+
+    def list_files(self, path):
+        return sorted(listdir(path),
+                      key=lambda f: int(re.search(r'[0-9]+', f).group(0)))
+
+    def coordinates(self, path):
+        lx, ly, lz = self.mesh_lengths
+        dx, dy, dz = self.mesh_discretisation
+        nx, ny, nz = int(lx / dx), int(ly / dy), int(lz / dz)
+        print('Number of elements:', nx, ny, nz)
+
+        z, y, x = np.meshgrid((np.arange(nz) + 0.5) * dz,
+                              (np.arange(ny) + 0.5) * dy,
+                              (np.arange(nx) + 0.5) * dx,
+                              indexing='ij')
+        return np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+
+    def read(self, path, out=None):
+        # The spins are stored as mx0 my0 mz0 mx1 ..., so this is a view.
+        # `out` is not needed since nothing is decoded
+        return np.load(path, mmap_mode='r').reshape(-1, 3)
+
+
+class FidimagSimReader(FidimagReader):
+    """
+    Reader of Fidimag NPY files through a Fidimag simulation (`Sim.set_m`),
+    as the original script did. Slower than FidimagReader, but it applies the
+    normalisation and the Ms mask of Fidimag. The simulation is created on
+    first use, so the reader can be sent to worker processes
+    """
+    name = 'fidimag_sim'
+
+    def __init__(self, mesh_lengths, mesh_discretisation):
+        super(FidimagSimReader, self).__init__(mesh_lengths,
+                                               mesh_discretisation)
+        self._sim = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_sim'] = None
+        return state
+
+    @property
+    def sim(self):
+        if self._sim is None:
+            from fidimag.micro import Sim
+            from fidimag.common import CuboidMesh
+
+            lx, ly, lz = self.mesh_lengths
+            dx, dy, dz = self.mesh_discretisation
+            nx, ny, nz = int(lx / dx), int(ly / dy), int(lz / dz)
+            mesh = CuboidMesh(nx=nx, ny=ny, nz=nz,
+                              dx=dx, dy=dy, dz=dz,
+                              unit_length=1e-9
+                              )
+            self._sim = Sim(mesh)
+        return self._sim
+
+    def coordinates(self, path):
+        return np.array(self.sim.mesh.coordinates)
+
+    def read(self, path, out=None):
+        self.sim.set_m(np.load(path))
+        if out is None:
+            return np.copy(self.sim.spin.reshape(-1, 3))
+        out[:] = self.sim.spin.reshape(-1, 3)
+        return out
+
+
+READERS = {reader.name: reader
+           for reader in (OVFReader, OOMMFReader, MumaxReader, FidimagReader,
+                         FidimagSimReader)}
+
+# -----------------------------------------------------------------------------
+
+
+def _extract_chunk(reader, files, probes):
+    """
+    Fill `probes` from a group of files, in a worker process
+    """
+    probes.allocate(len(files))
+    frame = None
+    for i, _file in enumerate(files):
+        frame = reader.read(_file, out=frame)
+        probes.fill(i, frame)
+    return probes.data
+
+
+def extract(reader, files, probes, initial_state=None, workers=1,
+            open_array=None):
+    """
+    Fill the `probes` (a ProbeSet) with the dynamic magnetisation of every
+    snapshot in `files`, i.e. after subtracting the `initial_state`. Every
+    file is read only once, into a single frame buffer. With `workers` > 1,
+    the files are split in contiguous chunks among that many processes
+    """
+    coordinates = reader.coordinates(files[0])
+    probes.compile(coordinates)
+
+    frame = np.empty((len(coordinates), 3))
+    if initial_state:
+        probes.set_reference(reader.read(initial_state, out=frame))
+
+    if workers > 1 and len(files) > 1:
+        chunks = np.array_split(np.arange(len(files)),
+                                min(len(files), 4 * workers))
+        # Workers get their own (empty) probe set with the same references
+        worker_probes = ProbeSet(probes.probes)
+        worker_probes.reference = probes.reference
+
+        probes.allocate(len(files), open_array=open_array)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(chunk, executor.submit(_extract_chunk, reader,
+                                               [files[i] for i in chunk],
+                                               worker_probes))
+                       for chunk in chunks if len(chunk)]
+            for chunk, future in futures:
+                chunk_data = future.result()
+                for name, components in chunk_data.items():
+                    for data, values in zip(probes.data[name], components):
+                        data[chunk[0]:chunk[-1] + 1] = values
+    else:
+        probes.allocate(len(files), open_array=open_array)
+        for i, _file in enumerate(files):
+            probes.fill(i, reader.read(_file, out=frame))
+
+    return probes
+
+
+def memmap_opener(probes, out_name=''):
+    """
+    Array factory for ProbeSet.allocate that writes the data straight into
+    the final NPY files, so the extracted data never has to fit in memory
+    """
+    def open_array(probe, comp, shape, dtype):
+        return np.lib.format.open_memmap(
+            probes.file_name(probe, comp, out_name, '.npy'),
+            mode='w+', dtype=dtype, shape=shape)
+    return open_array
+
+
+def load_data(name, mmap_mode=None):
+    """
+    Load a data file saved by the engine, binary (NPY) if available. With
+    `mmap_mode` (e.g. 'r') the NPY file is memory mapped instead of read;
+    text files cannot be mapped
+    """
+    if os.path.exists(name + '.npy'):
+        return np.load(name + '.npy', mmap_mode=mmap_mode)
+    if mmap_mode is not None:
+        raise ValueError('{}.npy not found: memory mapping needs the binary '
+                         'data; use --format npy when generating '
+                         'it'.format(name))
+    return np.loadtxt(name + '.dat')
+
+
+# -----------------------------------------------------------------------------
+
+DEFAULTS = {
+    'oommf': {'initial_state': 'InitialMagnetization.omf',
+              'snapshots_path': 'omfs/'},
+    'mumax': {'initial_state': 'InitialMagnetization.ovf',
+              'snapshots_path': 'ovfs/'},
+    'fidimag': {'initial_state': 'InitialMagnetization.omf',
+                'snapshots_path': 'unnamed_npys/'},
+}
+
+
+def make_parser(backend=None):
+    parser = argparse.ArgumentParser(
+        description='Generate data from {} files'.format(
+            backend.upper() if backend else 'OMF, OVF or NPY'))
+
+    if backend is None:
+        parser.add_argument('--backend',
+                            help='Simulation package of the snapshot files: '
+                            'oommf, mumax, fidimag',
+                            choices=sorted(DEFAULTS), default='oommf')
+
+    parser.add_argument('--initial_state',
+                        help='Path to the file with the initial state')
+
+    parser.add_argument('--snapshots_path', '--omfs_path', '--ovfs_path',
+                        '--npys_path', dest='snapshots_path',
+                        help='Path to the folder with the snapshot files')
+
+    parser.add_argument('--prefix',
+                        help='Only use the snapshot files starting with this '
+                        'prefix (OMF and OVF files)')
+
+    parser.add_argument('--out_name',
+                        help='Append this name to the data_mi file name',
+                        default='')
+
+    parser.add_argument('--probes',
+                        help='JSON file with the probe specification (lines, '
+                        'planes, points and region averages). Default: the '
+                        'cells the original script of the backend saved')
+
+    parser.add_argument('--Ms',
+                        help='Saturation magnetisation value (OOMMF)',
+                        type=float, default=1.15e6)
+
+    parser.add_argument('--mesh_lengths',
+                        help='Cuboid mesh lengths in XYZ directions: '
+                        'lx ly lz (Fidimag)',
+                        type=float, nargs=3)
+
+    parser.add_argument('--mesh_discretisation',
+                        help='Cuboid mesh discretisation in XYZ directions: '
+                        'dx dy dz (Fidimag)',
+                        type=float, nargs=3)
+
+    parser.add_argument('--use_sim',
+                        help='Read the NPY files through a Fidimag simulation '
+                        'instead of memory mapping them (Fidimag)',
+                        action='store_true')
+
+    parser.add_argument('--workers',
+                        help='Number of processes reading the snapshot files',
+                        type=int, default=1)
+
+    parser.add_argument('--format',
+                        help='Output format: dat (text) or npy (binary, '
+                        'streamed to disk while the files are read)',
+                        choices=['dat', 'npy'], default='dat')
+
+    if backend is not None:
+        parser.set_defaults(backend=backend)
+    return parser
+
+
+def make_reader(args):
+    kwargs = {}
+    if args.prefix is not None:
+        kwargs['prefix'] = args.prefix
+
+    if args.backend == 'oommf':
+        return OOMMFReader(Ms=args.Ms, **kwargs)
+    elif args.backend == 'mumax':
+        return MumaxReader(**kwargs)
+    elif args.backend == 'fidimag':
+        if args.use_sim:
+            return FidimagSimReader(args.mesh_lengths,
+                                    args.mesh_discretisation)
+        return FidimagReader(args.mesh_lengths, args.mesh_discretisation)
+    raise ValueError('Unknown backend {}'.format(args.backend))
+
+
+def main(argv=None, backend=None):
+    args = make_parser(backend).parse_args(argv)
+    for key, value in DEFAULTS[args.backend].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+
+    reader = make_reader(args)
+
+    basedir = args.snapshots_path
+    file_list = [os.path.join(basedir, _file)
+                 for _file in reader.list_files(basedir)]
+    print('Processing {} files'.format(len(file_list)))
+
+    if args.probes:
+        probes = ProbeSet(load_probe_spec(args.probes))
+    else:
+        probes = ProbeSet(default_probes(args.backend))
+
+    if args.out_name:
+        out_name = '_' + args.out_name
+    else:
+        out_name = ''
+
+    open_array = None
+    if args.format == 'npy':
+        open_array = memmap_opener(probes, out_name)
+
+    extract(reader, file_list, probes, initial_state=args.initial_state,
+            workers=args.workers, open_array=open_array)
+
+    # Save the data and the x coordinates -------------------------------------
+    # (it doesn't matter if the x coordinates are obtained at the middle or
+    # at the first row in the mesh, since the sample is rectangular)
+    probes.save(out_name, coordinates_scale=reader.coordinates_scale,
+                fmt=args.format)
+    return probes
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+from __future__ import print_function
+
+import warnings
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Pixel-binned plotting of large matrices (spectra, space-time data)
+#
+# A spectrum of millions of bins ends up as a plot a few hundred pixels wide.
+# Instead of handing the full matrix to imshow (which copies and resamples all
+# of it), the matrix is first pooled in NumPy down to the pixel grid of the
+# axes, keeping the maximum (peaks stay visible), mean or a percentile of
+# every block of bins.
+#
+# pool_matrix, auto_resample_shape and binned_imshow are copies of those of
+# include/custom_helper_files/custom_image_processing.py, which these scripts
+# cannot import: they run on their own (no repository root on the path), and
+# the include package needs the Ubermag stack. Keep both in step; the tests
+# compare them.
+# -----------------------------------------------------------------------------
+
+POOLING = ('max', 'mean', 'percentile')
+
+
+def pool_matrix(matrix, shape, method='max', q=99.,
+                band_bytes=64 * 2 ** 20):
+    """
+    Pool a (n_rows, n_cols) matrix down to at most `shape` cells
+
+    Every output cell reduces a block of ceil(n / shape) bins per axis with
+    `method`: 'max' (peaks stay visible), 'mean' or 'percentile' (the `q`-th).
+    The blocks at the end are padded with NaN, which is ignored. The matrix is
+    read in bands of rows of about `band_bytes`, so memory mapped matrices are
+    never loaded whole
+    """
+    if method not in POOLING:
+        raise ValueError('Unknown pooling {}; use one of: {}'.format(
+            method, ', '.join(POOLING)))
+
+    n_rows, n_cols = np.shape(matrix)
+    f_r = max(1, -(-n_rows // max(1, shape[0])))
+    f_c = max(1, -(-n_cols // max(1, shape[1])))
+    if f_r == 1 and f_c == 1:
+        return np.asarray(matrix)
+
+    m_r, m_c = -(-n_rows // f_r), -(-n_cols // f_c)
+    pooled = np.empty((m_r, m_c))
+    band = max(1, band_bytes // (8 * f_r * m_c * f_c))
+    reduce = {'max': np.nanmax, 'mean': np.nanmean,
+              'percentile': lambda blocks, axis: np.nanpercentile(
+                  blocks, q, axis=axis)}[method]
+
+    with warnings.catch_warnings():
+        # Blocks made only of NaN give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for start in range(0, m_r, band):
+            stop = min(m_r, start + band)
+            rows = np.asarray(matrix[start * f_r:stop * f_r], dtype=float)
+            blocks = np.full(((stop - start) * f_r, m_c * f_c), np.nan)
+            blocks[:rows.shape[0], :n_cols] = rows
+            pooled[start:stop] = reduce(
+                blocks.reshape(stop - start, f_r, m_c, f_c), axis=(1, 3))
+
+    return pooled
+
+
+def auto_resample_shape(ax, n_cells, dpi=None):
+    """(x, y) pixels of the axes `ax` at `dpi` (the figure dpi if None), but
+    never more than the `n_cells` of the matrix"""
+    fig = ax.figure
+    dpi = fig.dpi if dpi is None else dpi
+    position = ax.get_position()
+    size_inches = fig.get_size_inches() * (position.width, position.height)
+    return tuple(int(max(1, min(n, np.ceil(size * dpi))))
+                 for n, size in zip(n_cells, size_inches))
+
+
+def binned_imshow(ax, matrix, method='max', q=99., dpi=None, **imshow_kw):
+    """
+    ax.imshow of `matrix` after pooling it to the pixel grid of `ax` at `dpi`
+
+    Crop the matrix to the plotted limits first: the pooling is sized for the
+    whole matrix filling the axes. Without an `extent`, the one of the full
+    matrix is used, so the data coordinates are those of the bins either way
+    """
+    n_rows, n_cols = np.shape(matrix)
+    if 'extent' not in imshow_kw:
+        if imshow_kw.get('origin', 'upper') == 'lower':
+            imshow_kw['extent'] = [-0.5, n_cols - 0.5, -0.5, n_rows - 0.5]
+        else:
+            imshow_kw['extent'] = [-0.5, n_cols - 0.5, n_rows - 0.5, -0.5]
+
+    pixels = auto_resample_shape(ax, (n_cols, n_rows), dpi)[::-1]
+    return ax.imshow(pool_matrix(matrix, pixels, method, q), **imshow_kw)
@@ -0,0 +1,366 @@
+from __future__ import print_function
+
+import json
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Probe specifications for the *_generate_data.py scripts
+#
+# A probe selects a group of mesh cells (a line, a plane, a single point or the
+# average over a box) and stores the dynamic magnetisation of that group for
+# every time step. All the probes of a ProbeSet are sampled from the same
+# decoded frame, so every snapshot file is read only once, no matter how many
+# probes are requested.
+#
+# A specification is a list of dictionaries, e.g. in a JSON file:
+#
+#   [{"kind": "cells", "name": "midplane", "fixed": {"y": null}},
+#    {"kind": "line", "name": "centre_line", "axis": "x"},
+#    {"kind": "line", "name": "edge", "axis": "x", "position": {"y": 1e-9}},
+#    {"kind": "plane", "name": "top", "normal": "z"},
+#    {"kind": "point", "name": "centre", "position": [500e-9, 25e-9, 0.5e-9]},
+#    {"kind": "region", "name": "driven", "p1": [0, 0, 0],
+#     "p2": [10e-9, 50e-9, 1e-9]}]
+#
+# Positions are given in the units of the coordinates of the snapshot files.
+# -----------------------------------------------------------------------------
+
+AXES = {'x': 0, 'y': 1, 'z': 2}
+COMPONENTS = ('x', 'y', 'z')
+
+
+def _axis_index(axis):
+    if axis not in AXES:
+        raise ValueError('Unknown axis {}; use one of x, y, z'.format(axis))
+    return AXES[axis]
+
+
+def _nearest_level(values, position=None):
+    """
+    Return the coordinate level in `values` closest to `position`. If no
+    position is given, the level at the middle of the sample is used, which is
+    the same row the original scripts selected with
+    mask = coordinates[:, 1] == coordinates[:, 1][nx * int(ny * 0.5)]
+    """
+    levels = np.unique(values)
+    if position is None:
+        return levels[int(len(levels) * 0.5)]
+    return levels[np.argmin(np.abs(levels - position))]
+
+
+class Probe(object):
+    """
+    Base class of the probes. After `compile` is called with the (n, 3)
+    coordinates of the mesh cells, `indices` holds the integer indices of the
+    cells sampled by the probe and `shape` the shape of one sample (without
+    the magnetisation components).
+    """
+    kind = None
+
+    def __init__(self, name):
+        self.name = name
+        self.indices = None
+        self.shape = None
+
+    def compile(self, coordinates):
+        raise NotImplementedError
+
+    def sample(self, frame, out=None):
+        """
+        Gather the probe cells from a (n, 3) `frame`. The result has shape
+        self.shape + (3,) and is written into `out` when given
+        """
+        values = np.take(frame, self.indices, axis=0)
+        values = values.reshape(self.shape + (3,))
+        if out is None:
+            return values
+        out[...] = values
+        return out
+
+
+class LineProbe(Probe):
+    """
+    Cells along `axis`. The other two coordinates are fixed by `position`, a
+    dictionary such as {'y': 25e-9}; missing axes use the middle of the sample
+    """
+    kind = 'line'
+
+    def __init__(self, name, axis='x', position=None):
+        super(LineProbe, self).__init__(name)
+        self.axis = axis
+        self.position = position if position else {}
+
+    def compile(self, coordinates):
+        ax = _axis_index(self.axis)
+        mask = np.ones(len(coordinates), dtype=bool)
+        for other, other_ax in AXES.items():
+            if other_ax == ax:
+                continue
+            level = _nearest_level(coordinates[:, other_ax],
+                                   self.position.get(other))
+            mask &= coordinates[:, other_ax] == level
+
+        indices = np.flatnonzero(mask)
+        order = np.argsort(coordinates[indices, ax], kind='stable')
+        self.indices = indices[order]
+        self.shape = (len(self.indices),)
+        self.coordinates = coordinates[self.indices, ax]
+        return self
+
+
+class CellsProbe(Probe):
+    """
+    Every cell, in the order of the snapshot files, whose coordinate along each
+    axis of `fixed` is at the given level, e.g. {'y': None} for the y-midplane
+    (None is the middle of the sample). Without `fixed`, every cell of the
+    mesh. This is the selection the original scripts made with their masks.
+
+    The `axis` coordinates saved along the data are the distinct levels along
+    `axis` (as the OMF/OVF scripts saved them) or, with `distinct=False`, those
+    of every selected cell (as the Fidimag script saved them)
+    """
+    kind = 'cells'
+
+    def __init__(self, name, fixed=None, axis='x', distinct=True):
+        super(CellsProbe, self).__init__(name)
+        self.fixed = fixed if fixed else {}
+        self.axis = axis
+        self.distinct = distinct
+
+    def compile(self, coordinates):
+        mask = np.ones(len(coordinates), dtype=bool)
+        for axis, position in self.fixed.items():
+            ax = _axis_index(axis)
+            mask &= coordinates[:, ax] == _nearest_level(coordinates[:, ax],
+                                                         position)
+
+        self.indices = np.flatnonzero(mask)
+        self.shape = (len(self.indices),)
+        self.coordinates = coordinates[self.indices, _axis_index(self.axis)]
+        if self.distinct:
+            self.coordinates = np.unique(self.coordinates)
+        return self
+
+
+class PlaneProbe(Probe):
+    """
+    Cells of the plane normal to `normal` at `position` (middle of the sample
+    by default). Samples have shape (n_a, n_b) where a and b are the two
+    in-plane axes in xyz order
+    """
+    kind = 'plane'
+
+    def __init__(self, name, normal='z', position=None):
+        super(PlaneProbe, self).__init__(name)
+        self.normal = normal
+        self.position = position
+
+    def compile(self, coordinates):
+        ax = _axis_index(self.normal)
+        level = _nearest_level(coordinates[:, ax], self.position)
+        indices = np.flatnonzero(coordinates[:, ax] == level)
+
+        a, b = [i for i in range(3) if i != ax]
+        # Sort by a first and then by b, so the samples can be reshaped
+        order = np.lexsort((coordinates[indices, b], coordinates[indices, a]))
+        indices = indices[order]
+
+        n_a = len(np.unique(coordinates[indices, a]))
+        n_b = len(np.unique(coordinates[indices, b]))
+        if n_a * n_b != len(indices):
+            raise ValueError('Plane probe {} does not cover a rectangular '
+                             'grid of cells'.format(self.name))
+
+        self.indices = indices
+        self.shape = (n_a, n_b)
+        return self
+
+
+class PointProbe(Probe):
+    """
+    The single cell closest to `position` (x, y, z)
+    """
+    kind = 'point'
+
+    def __init__(self, name, position):
+        super(PointProbe, self).__init__(name)
+        self.position = np.asarray(position, dtype=float)
+
+    def compile(self, coordinates):
+        distance = np.sum((coordinates - self.position) ** 2, axis=1)
+        self.indices = np.array([np.argmin(distance)])
+        self.shape = ()
+        return self
+
+
+class RegionProbe(Probe):
+    """
+    Average of the magnetisation over the cells inside the box p1-p2
+    """
+    kind = 'region'
+
+    def __init__(self, name, p1, p2):
+        super(RegionProbe, self).__init__(name)
+        self.pmin = np.minimum(p1, p2)
+        self.pmax = np.maximum(p1, p2)
+
+    def compile(self, coordinates):
+        mask = np.all((coordinates >= self.pmin) & (coordinates <= self.pmax),
+                      axis=1)
+        self.indices = np.flatnonzero(mask)
+        if not len(self.indices):
+            raise ValueError('Region probe {} does not contain any '
+                             'cell'.format(self.name))
+        self.shape = ()
+        return self
+
+    def sample(self, frame, out=None):
+        values = np.take(frame, self.indices, axis=0).mean(axis=0)
+        if out is None:
+            return values
+        out[...] = values
+        return out
+
+
+PROBE_KINDS = {probe.kind: probe
+               for probe in (CellsProbe, LineProbe, PlaneProbe, PointProbe,
+                             RegionProbe)}
+
+
+def probes_from_spec(spec):
+    """
+    Create the probes from a list of dictionaries (see the top of this file)
+    """
+    probes = []
+    for i, entry in enumerate(spec):
+        entry = dict(entry)
+        kind = entry.pop('kind', None)
+        if kind not in PROBE_KINDS:
+            raise ValueError('Unknown probe kind {}; use one of: {}'.format(
+                kind, ', '.join(PROBE_KINDS)))
+        entry.setdefault('name', '{}{}'.format(kind, i))
+        probes.append(PROBE_KINDS[kind](**entry))
+    return probes
+
+
+def load_probe_spec(path):
+    with open(path) as f:
+        return probes_from_spec(json.load(f))
+
+
+def default_probes(backend='oommf'):
+    """
+    The cells the original data scripts of `backend` extracted, saved under
+    the same file names:
+        mumax: every cell of the mesh
+        oommf, fidimag: the y-midplane (every x and z at the middle y)
+    """
+    if backend == 'mumax':
+        return [CellsProbe('midline')]
+    if backend in ('fidimag', 'fidimag_sim'):
+        return [CellsProbe('midline', fixed={'y': None}, distinct=False)]
+    return [CellsProbe('midline', fixed={'y': None})]
+
+
+# -----------------------------------------------------------------------------
+
+
+class ProbeSet(object):
+    """
+    Collection of probes filled from one shared frame per snapshot.
+
+    Usage:
+        probes = ProbeSet(default_probes('oommf')).compile(coordinates)
+        probes.set_reference(m0)
+        probes.allocate(n_frames)
+        for i, f in enumerate(files):
+            frame = ...  # decode the snapshot into a (n, 3) array
+            probes.fill(i, frame)
+        probes.save(out_name)
+
+    The data of every probe is stored per component: self.data[name][c] has
+    shape (n_frames,) + probe.shape, with one row per time step
+    """
+
+    def __init__(self, probes):
+        names = [probe.name for probe in probes]
+        if len(set(names)) != len(names):
+            raise ValueError('Probe names must be unique: {}'.format(names))
+        self.probes = list(probes)
+        self.data = {}
+        self.reference = {}
+
+    def __iter__(self):
+        return iter(self.probes)
+
+    def compile(self, coordinates):
+        coordinates = np.asarray(coordinates, dtype=float)
+        for probe in self.probes:
+            probe.compile(coordinates)
+        return self
+
+    def allocate(self, n_frames, dtype=np.float64, open_array=None):
+        """
+        Create the arrays for `n_frames` time steps. `open_array(probe, comp,
+        shape, dtype)` can be given to provide the arrays, e.g. memory mapped
+        files, so the data is streamed to disk instead of kept in memory
+        """
+        if open_array is None:
+            def open_array(probe, comp, shape, dtype):
+                return np.zeros(shape, dtype=dtype)
+
+        self.data = {}
+        for probe in self.probes:
+            shape = (n_frames,) + probe.shape
+            self.data[probe.name] = tuple(open_array(probe, comp, shape, dtype)
+                                          for comp in COMPONENTS)
+
+    def set_reference(self, frame):
+        """
+        Static part (initial state) that is subtracted from every sample
+        """
+        self.reference = {probe.name: probe.sample(frame)
+                          for probe in self.probes}
+
+    def fill(self, i, frame):
+        for probe in self.probes:
+            values = probe.sample(frame)
+            if probe.name in self.reference:
+                values -= self.reference[probe.name]
+            for c, data in enumerate(self.data[probe.name]):
+                data[i] = values[..., c]
+
+    def file_name(self, probe, comp, out_name='', ext='.dat'):
+        """
+        The default `midline` probe keeps the file names the process_data.py
+        script reads: datafile_m{comp}{out_name}
+        """
+        if probe.kind in ('cells', 'line') and probe.name == 'midline':
+            return 'datafile_m{}{}{}'.format(comp, out_name, ext)
+        return 'probe-{}_m{}{}{}'.format(probe.name, comp, out_name, ext)
+
+    def coordinates_file_name(self, probe, out_name=''):
+        if probe.name == 'midline':
+            return 'mesh_{}-coordinates{}.dat'.format(probe.axis, out_name)
+        return 'probe-{}_{}-coordinates{}.dat'.format(probe.name, probe.axis,
+                                                      out_name)
+
+    def save(self, out_name='', coordinates_scale=1., fmt='dat'):
+        """
+        Save the data of every probe, as text (fmt='dat') or as binary NPY
+        files (fmt='npy'). Planes are always saved as NPY files. Arrays that
+        are already memory mapped files are only flushed
+        """
+        for probe in self.probes:
+            if probe.kind in ('cells', 'line'):
+                np.savetxt(self.coordinates_file_name(probe, out_name),
+                           probe.coordinates * coordinates_scale)
+
+            for comp, data in zip(COMPONENTS, self.data[probe.name]):
+                if isinstance(data, np.memmap):
+                    data.flush()
+                elif fmt == 'npy' or probe.kind == 'plane':
+                    np.save(self.file_name(probe, comp, out_name, '.npy'),
+                            data)
+                else:
+                    np.savetxt(self.file_name(probe, comp, out_name), data)
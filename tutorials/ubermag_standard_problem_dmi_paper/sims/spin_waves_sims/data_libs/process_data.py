@@ -8,19 +8,35 @@ import os
 from os import listdir
 import re
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from generate_data import load_data
+from dispersion_fft import (PRECISIONS, FFT_BACKENDS, get_backend,
+                            dispersion_spectrum, window_arrays,
+                            out_of_core_spectrum, scale_spectrum,
+                            crop_indices, segment_starts, band_spectrum,
+                            short_time_spectra)
+from pixel_binning import POOLING, binned_imshow
 
 # -----------------------------------------------------------------------------
 
 parser = argparse.ArgumentParser(description='Process data for SW simulations')
 
 parser.add_argument('--m_i',
-                    help='Magnetisation component: x, y or z',
-                    default='x')
+                    help='Magnetisation component: x, y or z. Several '
+                    'components can be given to process them in one run',
+                    nargs='+', default=['x'])
 
 parser.add_argument('--out_name',
                     help='Name of the data_mi and mesh coordinates file name '
-                    '(from the generate data file)',
-                    default='')
+                    '(from the generate data file). Several names can be '
+                    'given to process every dataset in one run',
+                    nargs='+', default=[''])
+
+parser.add_argument('--batch_workers',
+                    help='Number of spectra computed at the same time when '
+                    'several components or datasets are given. Default: one '
+                    'per input, up to the number of cores',
+                    type=int)
 
 parser.add_argument('--vminf',
                     help='Factor to scale the minimum value of the spectra',
@@ -44,6 +60,76 @@ parser.add_argument('--window',
                     default='hanning'
                     )
 
+parser.add_argument('--fft_mode',
+                    help='Fourier transform: fft2 (complex 2D FFT) or rfft '
+                    '(real input FFT along time; about half the memory and '
+                    'time, same spectrum)',
+                    choices=['fft2', 'rfft'], default='fft2')
+
+parser.add_argument('--precision',
+                    help='Floating point precision of the Fourier analysis',
+                    choices=sorted(PRECISIONS), default='float64')
+
+parser.add_argument('--fft_backend',
+                    help='FFT library: numpy, scipy (multithreaded) or pyfftw '
+                    '(multithreaded FFTW plans, if pyFFTW is installed)',
+                    choices=FFT_BACKENDS, default='numpy')
+
+parser.add_argument('--workers',
+                    help='Number of threads of the scipy and pyfftw FFT '
+                    'backends (-1: all the cores)',
+                    default=1, type=int)
+
+parser.add_argument('--fast_length',
+                    help='Zero pad the FFTs to the next fast length (e.g. for '
+                    'a prime number of time steps)',
+                    action='store_true')
+
+parser.add_argument('--pad_factor',
+                    help='Zero padding factors of the time and space axes, '
+                    'for finer f and k grids',
+                    nargs=2, type=float, default=[1., 1.])
+
+parser.add_argument('--crop_band',
+                    help='Only transform the frequencies and wave vectors '
+                    'inside the plot limits (--ylim, --xlim)',
+                    action='store_true')
+
+parser.add_argument('--out_of_core',
+                    help='Memory map the (NPY) data and compute the spectrum '
+                    'in blocks, through files on disk, for data matrices '
+                    'larger than the memory. The spectrum is saved as NPY',
+                    action='store_true')
+
+parser.add_argument('--block_mb',
+                    help='Size in MB of the blocks of the out of core FFT; '
+                    'sets the peak memory',
+                    default=256., type=float)
+
+parser.add_argument('--scratch_dir',
+                    help='Directory for the intermediate file of the out of '
+                    'core FFT',
+                    default='.')
+
+parser.add_argument('--segment_length',
+                    help='Time resolved dispersion: number of time steps of '
+                    'the (windowed) segments, with one spectrum per segment',
+                    type=int)
+
+parser.add_argument('--segment_overlap',
+                    help='Fraction of time steps shared by consecutive '
+                    'segments',
+                    default=0.5, type=float)
+
+parser.add_argument('--welch_average',
+                    help='Number of consecutive segments averaged into one '
+                    'spectrum (Welch). 0 averages all of them',
+                    default=1, type=int)
+
+parser.add_argument('--segment_batch',
+                    help='Number of segments read and transformed at a time',
+                    default=8, type=int)
+
 parser.add_argument('--xlim',
                     help='Optional limits for the x axis',
                     nargs=2, type=float)
@@ -54,128 +140,404 @@ parser.add_argument('--ylim',
 
 parser.add_argument('--colormap', help='Colormap', default='bone_r')
 
+parser.add_argument('--pixel_pooling',
+                    help='Pool the plotted spectrum down to the pixels of the '
+                    'plot before imshow: max (keeps the peaks), mean or '
+                    'percentile; none plots every bin',
+                    choices=('none',) + POOLING, default='max')
+
+parser.add_argument('--pixel_percentile',
+                    help='Percentile of --pixel_pooling percentile',
+                    type=float, default=99.)
+
+parser.add_argument('--pixel_dpi',
+                    help='Resolution the plots are pooled to (dots per inch)',
+                    type=float, default=300.)
+
 parser.add_argument('--scale', help='Spectra scale: log10, power2',
                     default='log10')
 
-parser.add_argument('--get_data', help='Specify a file name to save the data',
+parser.add_argument('--get_data', help='Specify a file name to save the data. '
+                    'In batches, the dataset name and component are appended',
                     )
 
 parser.add_argument('--pdf_name',
-                    help='Name of the PDF output. Default: out_name')
-
-# Parser arguments
-args = parser.parse_args()
-
-# -----------------------------------------------------------------------------
-
-if args.out_name:
-    out_name = '_' + args.out_name
-else:
-    out_name = ''
+                    help='Name of the PDF output. Default: out_name. In '
+                    'batches, the dataset name and component are appended')
 
 # -----------------------------------------------------------------------------
 
 mu0 = 4 * np.pi * 1e-7
 
-data = np.loadtxt('datafile_m' + args.m_i + out_name + '.dat')
-
-if not args.n_time_steps:
-    args.n_time_steps = len(data)
-
-times = np.arange(args.n_time_steps) * args.time_step
-x = np.loadtxt('mesh_x-coordinates' + out_name + '.dat')
-
-# Fourier analysis ------------------------------------------------------------
-
-# Apply windows to get a better Fourier spectrum
-# We can use: blackman, hanning, hamming, kaiser(ny, 5.5), bartlett
-window = args.window
-window_f = getattr(np, window)
-
-times_filter, x_filter = (window_f(len(times)),
-                          window_f(len(x))
-                          )
-# This one can be useful at some point:
-# times_filter, x_filter = (spectrum.window_lanczos(len(times)),
-#                           spectrum.window_lanczos(len(x))
-#                           )
-print('Data matrix shape: ', data.shape)
-
-w1, w2 = np.meshgrid(x_filter, times_filter)
-window = w1 * w2
-data = data * window
-
-# for i in np.arange(data.shape[0]):
-#     data[i] = data[i] * x_filter
-#
-# for i in np.arange(data.shape[1]):
-#     data[:, i] = data[:, i] * times_filter
-
-fft_data = abs(np.fft.fftshift(np.fft.fft2(data)))
-
-freqs = np.fft.fftfreq(len(times), d=(times[1] - times[0])) / (1e9)
-freqs = np.fft.fftshift(freqs)
-
-k = np.fft.fftfreq(len(x), d=(x[1] - x[0]))
-k = np.fft.fftshift(k) * 2 * np.pi  # in rad / nm
-
-if args.scale == 'log10':
-    fft_data = np.log10(fft_data ** 2)
-elif args.scale == 'power2':
-    fft_data = fft_data ** 2
-
-if args.get_data:
-    np.savetxt(args.get_data + '.dat', fft_data)
-    np.savetxt(args.get_data + '_freqs.dat', freqs)
-    np.savetxt(args.get_data + '_ks.dat', k)
-
-# -----------------------------------------------------------------------------
 
-import matplotlib.pyplot as plt
-plt.style.use(os.path.join(os.path.dirname(__file__),
-                           'lato_style.mplstyle')
-              )
-
-f = plt.figure()
-ax = f.add_subplot(111)
-# print('Limits: ', np.max(fft_data ** 2), np.min(fft_data ** 2))
-# print('Squared data limits: ', np.max(fft_data ** 2), np.min(fft_data ** 2))
-
-# Modify colorbar to get good plots
-cbmax = fft_data.max() / args.vmaxf
-cbmin = fft_data.min() / args.vminf
-print('Spectra limits: ', cbmin, cbmax)
-
-p = ax.imshow(fft_data,
-              # vmax=10, vmin=0,
-              vmin=cbmin, vmax=cbmax,
-              # cmap='viridis',
-              cmap=args.colormap,
-              # cmap=npf_cm.softrbw_mpl_r,
-              # extent=[np.min(k), np.max(k),
-              #         np.min(freqs), np.max(freqs)],
-              extent=[k[0], k[-1],
-                      freqs[0], freqs[-1]],
-              aspect='auto',
-              interpolation='none'
-              )
-plt.colorbar(p)
-
-if args.xlim:
-    plt.xlim([args.xlim[0], args.xlim[1]])
-else:
-    plt.xlim([-0.07, 0.07])
-
-if args.ylim:
-    plt.ylim([args.ylim[0], args.ylim[1]])
-
-plt.xlabel(r'$k$  [ rad/nm ]')
-plt.ylabel(r'$f$  [ GHz ]')
-
-if not args.pdf_name:
-    args.pdf_name = 'spectra' + out_name
-
-plt.savefig(args.pdf_name + '.pdf', bbox_inches='tight')
-# plt.savefig('spectra.jpg')
-
-plt.show()
+class SharedArrays(object):
+    """
+    Window functions and frequency/wave vector axes shared by every input of
+    a batch: they are computed once per shape (and per time step or mesh
+    spacing) and then reused, also from the worker threads
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self._windows = {}
+        self._freqs = {}
+        self._ks = {}
+
+    def windows(self, shape):
+        key = (shape, self.args.window, self.args.precision)
+        if key not in self._windows:
+            self._windows[key] = window_arrays(shape, self.args.window,
+                                               PRECISIONS[self.args.precision])
+        return self._windows[key]
+
+    def freqs(self, n_time_steps):
+        key = (n_time_steps, self.args.time_step)
+        if key not in self._freqs:
+            times = np.arange(n_time_steps) * self.args.time_step
+            freqs = np.fft.fftfreq(len(times), d=(times[1] - times[0])) / (1e9)
+            self._freqs[key] = np.fft.fftshift(freqs)
+        return self._freqs[key]
+
+    def ks(self, x):
+        key = (len(x), x[1] - x[0])
+        if key not in self._ks:
+            k = np.fft.fftfreq(len(x), d=(x[1] - x[0]))
+            self._ks[key] = np.fft.fftshift(k) * 2 * np.pi  # in rad / nm
+        return self._ks[key]
+
+
+class Job(object):
+    """
+    One (dataset, component) input. In a batch, the output names get the
+    dataset name and/or the component, when several of them are processed
+    """
+
+    def __init__(self, args, name, m_i):
+        self.m_i = m_i
+        self.out_name = '_' + name if name else ''
+
+        suffix = ''
+        if len(args.out_name) > 1:
+            suffix += self.out_name
+        if len(args.m_i) > 1:
+            suffix += '_m' + m_i
+
+        if args.pdf_name:
+            self.pdf_name = args.pdf_name + suffix
+        else:
+            self.pdf_name = 'spectra' + self.out_name + (
+                '_m' + m_i if len(args.m_i) > 1 else '')
+        self.get_data = args.get_data + suffix if args.get_data else None
+
+
+def compute_spectrum(args, job, shared, backend):
+    """
+    Load the data of `job`, and compute, scale and (optionally) save its
+    spectrum. Returns (spectrum, freqs, k)
+    """
+    out_name = job.out_name
+
+    # Text (.dat) or binary (.npy) files from the generate_data scripts
+    data_name = 'datafile_m' + job.m_i + out_name
+    # Segments are read one batch at a time, so NPY data is memory mapped
+    mmap = args.out_of_core or (args.segment_length and
+                                os.path.exists(data_name + '.npy'))
+    data = load_data(data_name, mmap_mode='r' if mmap else None)
+
+    n_time_steps = args.n_time_steps if args.n_time_steps else len(data)
+    x = np.loadtxt('mesh_x-coordinates' + out_name + '.dat')
+
+    if args.segment_length:
+        return compute_short_time_spectra(args, job, data, x, shared, backend)
+
+    # Fourier analysis --------------------------------------------------------
+
+    # Apply windows to get a better Fourier spectrum
+    # We can use: blackman, hanning, hamming, kaiser(ny, 5.5), bartlett
+    # The window is the outer product of the time and space windows; it is
+    # applied in place by broadcasting (see dispersion_fft.py)
+    # This one can be useful at some point:
+    # times_filter, x_filter = (spectrum.window_lanczos(len(times)),
+    #                           spectrum.window_lanczos(len(x))
+    #                           )
+    print('Data matrix shape: ', data.shape)
+
+    block_bytes = int(args.block_mb * 2 ** 20)
+    # Zero padded and/or band limited FFT (main rejects it with --out_of_core)
+    band = args.fast_length or args.pad_factor != [1., 1.] or args.crop_band
+    if args.out_of_core:
+        # Peak memory is set by --block_mb, not by the size of the data
+        if job.get_data:
+            spectrum_file = job.get_data + '.npy'
+        else:
+            spectrum_file = 'spectrum_m' + job.m_i + out_name + '.npy'
+        scratch_file = os.path.join(args.scratch_dir,
+                                    'scratch_m' + job.m_i + out_name + '.npy')
+        fft_data = out_of_core_spectrum(data, spectrum_file, scratch_file,
+                                        window=args.window,
+                                        precision=args.precision,
+                                        block_bytes=block_bytes,
+                                        backend=backend)
+    elif band:
+        fft_data, freqs, k = compute_band_spectrum(args, data, x, shared,
+                                                   backend)
+    else:
+        fft_data = dispersion_spectrum(data, window=args.window,
+                                       mode=args.fft_mode,
+                                       precision=args.precision,
+                                       windows=shared.windows(data.shape),
+                                       backend=backend)
+    if args.out_of_core or not band:
+        freqs = shared.freqs(n_time_steps)
+        k = shared.ks(x)
+    del data
+
+    # In place and in blocks, so memory mapped spectra are not loaded at once
+    scale_spectrum(fft_data, args.scale, block_bytes)
+
+    if job.get_data:
+        if args.out_of_core:
+            fft_data.flush()
+        else:
+            np.savetxt(job.get_data + '.dat', fft_data)
+        np.savetxt(job.get_data + '_freqs.dat', freqs)
+        np.savetxt(job.get_data + '_ks.dat', k)
+
+    return fft_data, freqs, k
+
+
+def compute_band_spectrum(args, data, x, shared, backend):
+    """
+    Spectrum zero padded (--pad_factor, --fast_length) and, with --crop_band,
+    only transformed inside the plot limits. The band is symmetric (+/- the
+    largest limit), as the plots show the shifted spectrum upside down.
+    Returns (spectrum, freqs, k) in GHz and rad / nm
+    """
+    f_range, k_range = None, None
+    if args.crop_band:
+        xlim = args.xlim if args.xlim else [-0.07, 0.07]
+        k_max = np.max(np.abs(xlim)) / (2 * np.pi)
+        k_range = (-k_max, k_max)
+        if args.ylim:
+            f_max = np.max(np.abs(args.ylim)) * 1e9
+            f_range = (-f_max, f_max)
+
+    fft_data, freqs, k = band_spectrum(data, dt=args.time_step, dx=x[1] - x[0],
+                                       window=args.window,
+                                       precision=args.precision,
+                                       pad_factor=args.pad_factor,
+                                       fast=args.fast_length,
+                                       f_range=f_range, k_range=k_range,
+                                       windows=shared.windows(data.shape),
+                                       backend=backend)
+    print('Spectrum shape: ', fft_data.shape)
+    return fft_data, freqs / 1e9, k * 2 * np.pi
+
+
+def compute_short_time_spectra(args, job, data, x, shared, backend):
+    """
+    Spectra of overlapping time segments of the data of `job` (e.g. to
+    separate the drive and pause regimes of drive_pause_drive). Returns
+    (spectra, freqs, k), with spectra of shape (n_segments, f, k); the time at
+    the centre of every spectrum is stored in job.segment_times
+    """
+    print('Data matrix shape: ', data.shape)
+
+    average = args.welch_average if args.welch_average > 0 else None
+
+    out = None
+    if args.out_of_core:
+        # The stack of spectra is written straight to disk
+        if job.get_data:
+            spectra_file = job.get_data + '.npy'
+        else:
+            spectra_file = ('segment_spectra_m' + job.m_i + job.out_name +
+                            '.npy')
+        n_starts = len(segment_starts(len(data), args.segment_length,
+                                      args.segment_overlap))
+        n_out = 1 if average is None else n_starts // average
+        out = np.lib.format.open_memmap(
+            spectra_file, mode='w+', dtype=PRECISIONS[args.precision],
+            shape=(n_out, args.segment_length, data.shape[1]))
+
+    spectra, starts = short_time_spectra(
+        data, args.segment_length, overlap=args.segment_overlap,
+        window=args.window, precision=args.precision, average=average,
+        batch_size=args.segment_batch, backend=backend, out=out)
+    del data
+
+    freqs = shared.freqs(args.segment_length)
+    k = shared.ks(x)
+    job.segment_times = (starts.mean(axis=1) +
+                         0.5 * args.segment_length) * args.time_step
+
+    block_bytes = int(args.block_mb * 2 ** 20)
+    for frame in spectra:
+        scale_spectrum(frame, args.scale, block_bytes)
+
+    if job.get_data:
+        if args.out_of_core:
+            spectra.flush()
+        else:
+            np.save(job.get_data + '.npy', spectra)
+        np.savetxt(job.get_data + '_freqs.dat', freqs)
+        np.savetxt(job.get_data + '_ks.dat', k)
+        np.savetxt(job.get_data + '_times.dat', job.segment_times)
+
+    return spectra, freqs, k
+
+
+def imshow(args, ax, matrix, **imshow_kw):
+    """ax.imshow, after pooling `matrix` to the pixels of `ax` unless
+    --pixel_pooling is none"""
+    if args.pixel_pooling == 'none':
+        return ax.imshow(matrix, **imshow_kw)
+    return binned_imshow(ax, matrix, method=args.pixel_pooling,
+                         q=args.pixel_percentile, dpi=args.pixel_dpi,
+                         **imshow_kw)
+
+
+def plot_spectrum(args, job, fft_data, freqs, k, plt):
+    """
+    Plot the spectrum of `job` into its own figure and save it as PDF
+    """
+    f = plt.figure()
+    ax = f.add_subplot(111)
+    # print('Limits: ', np.max(fft_data ** 2), np.min(fft_data ** 2))
+    # print('Squared data limits: ', np.max(fft_data ** 2), np.min(fft_data ** 2))
+
+    xlim = args.xlim if args.xlim else [-0.07, 0.07]
+
+    if args.out_of_core:
+        # Only the part of the spectrum inside the plot limits is loaded
+        k_range = crop_indices(k, xlim)
+        f_range = crop_indices(freqs, args.ylim) if args.ylim else slice(None)
+        fft_data = np.array(fft_data[f_range, k_range])
+        k, freqs = k[k_range], freqs[f_range]
+
+    # Modify colorbar to get good plots
+    cbmax = fft_data.max() / args.vmaxf
+    cbmin = fft_data.min() / args.vminf
+    print('Spectra limits: ', cbmin, cbmax)
+
+    if args.pixel_pooling != 'none' and not args.out_of_core:
+        # The pooling is sized for the plotted part of the spectrum only
+        k_range = crop_indices(k, xlim)
+        f_range = crop_indices(freqs, args.ylim) if args.ylim else slice(None)
+        fft_data = fft_data[f_range, k_range]
+        k, freqs = k[k_range], freqs[f_range]
+
+    p = imshow(args, ax, fft_data,
+               # vmax=10, vmin=0,
+               vmin=cbmin, vmax=cbmax,
+               # cmap='viridis',
+               cmap=args.colormap,
+               # cmap=npf_cm.softrbw_mpl_r,
+               # extent=[np.min(k), np.max(k),
+               #         np.min(freqs), np.max(freqs)],
+               extent=[k[0], k[-1],
+                       freqs[0], freqs[-1]],
+               aspect='auto',
+               interpolation='none'
+               )
+    f.colorbar(p)
+
+    ax.set_xlim([xlim[0], xlim[1]])
+
+    if args.ylim:
+        ax.set_ylim([args.ylim[0], args.ylim[1]])
+
+    ax.set_xlabel(r'$k$  [ rad/nm ]')
+    ax.set_ylabel(r'$f$  [ GHz ]')
+
+    f.savefig(job.pdf_name + '.pdf', bbox_inches='tight')
+    # plt.savefig('spectra.jpg')
+    return f
+
+
+def plot_short_time_spectra(args, job, spectra, freqs, k, plt):
+    """
+    One page per segment spectrum in the PDF of `job`, with the same colour
+    scale for every page so the regimes can be compared
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    xlim = args.xlim if args.xlim else [-0.07, 0.07]
+    k_range = crop_indices(k, xlim)
+    f_range = crop_indices(freqs, args.ylim) if args.ylim else slice(None)
+    cropped = np.array(spectra[:, f_range, k_range])
+    k, freqs = k[k_range], freqs[f_range]
+
+    finite = cropped[np.isfinite(cropped)]
+    cbmax = finite.max() / args.vmaxf
+    cbmin = finite.min() / args.vminf
+    print('Spectra limits: ', cbmin, cbmax)
+
+    with PdfPages(job.pdf_name + '.pdf') as pdf:
+        for frame, t in zip(cropped, job.segment_times):
+            f = plt.figure()
+            ax = f.add_subplot(111)
+            p = imshow(args, ax, frame, vmin=cbmin, vmax=cbmax,
+                       cmap=args.colormap,
+                       extent=[k[0], k[-1], freqs[0], freqs[-1]],
+                       aspect='auto', interpolation='none')
+            f.colorbar(p)
+            ax.set_xlim([xlim[0], xlim[1]])
+            if args.ylim:
+                ax.set_ylim([args.ylim[0], args.ylim[1]])
+            ax.set_xlabel(r'$k$  [ rad/nm ]')
+            ax.set_ylabel(r'$f$  [ GHz ]')
+            ax.set_title(r'$t$ = {:.3f} ns'.format(t * 1e9))
+            pdf.savefig(f, bbox_inches='tight')
+            plt.close(f)
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    if args.out_of_core and (args.fast_length or args.pad_factor != [1., 1.]
+                             or args.crop_band):
+        parser.error('--fast_length, --pad_factor and --crop_band can not '
+                     'be used with --out_of_core')
+
+    jobs = [Job(args, name, m_i)
+            for name in args.out_name for m_i in args.m_i]
+    shared = SharedArrays(args)
+    backend = get_backend(args.fft_backend, args.workers)
+
+    # The FFTs of a batch run in threads (the FFT libraries release the GIL);
+    # matplotlib is not thread safe, so the figures are made afterwards, in
+    # this thread
+    n_workers = args.batch_workers
+    if n_workers is None:
+        n_workers = min(len(jobs), os.cpu_count() or 1)
+
+    if len(jobs) == 1 or n_workers < 2:
+        spectra = [compute_spectrum(args, job, shared, backend)
+                   for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            spectra = list(executor.map(
+                lambda job: compute_spectrum(args, job, shared, backend),
+                jobs))
+
+    # -------------------------------------------------------------------------
+
+    import matplotlib.pyplot as plt
+    plt.style.use(os.path.join(os.path.dirname(__file__),
+                               'lato_style.mplstyle')
+                  )
+
+    for job, (fft_data, freqs, k) in zip(jobs, spectra):
+        if args.segment_length:
+            plot_short_time_spectra(args, job, fft_data, freqs, k, plt)
+            continue
+        f = plot_spectrum(args, job, fft_data, freqs, k, plt)
+        if len(jobs) > 1:
+            plt.close(f)
+
+    if len(jobs) == 1 and not args.segment_length:
+        plt.show()
+
+
+if __name__ == '__main__':
+    main()